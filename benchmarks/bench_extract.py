@@ -0,0 +1,91 @@
+"""
+Бенчмарк извлечения основного текста страниц
+
+Сравнивает прежнюю многопроходную очистку BeautifulSoup (html.parser,
+decompose служебных тегов, поиск рекламных классов регулярным выражением
+по всем элементам, затем поиск main/article) с однопроходным извлечением
+utils.content_extractor на корпусе сохраненных страниц benchmarks/corpus.
+Печатает число страниц в секунду и объем извлеченного текста.
+
+Запуск из корня проекта:
+    python benchmarks/bench_extract.py [--number 20]
+"""
+
+import argparse
+import glob
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from utils.content_extractor import extract_main_text  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+# Фразы из меню, подвалов и боковых колонок страниц корпуса
+BOILERPLATE_MARKERS = ["Все права защищены", "Популярное", "Реклама", "Раздел 3", "Служебная 1"]
+
+
+def legacy_extract_text(html: str) -> str:
+    """Прежняя очистка AdvancedWebSearch.extract_text"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    for element in soup(["script", "style", "noscript", "nav", "footer", "header", "aside"]):
+        element.decompose()
+
+    for element in soup.find_all(class_=re.compile(r"(ad|advertisement|banner|menu|navigation|sidebar|footer|header)")):
+        element.decompose()
+
+    main_content = soup.find("main") or soup.find("article") or soup.find("div", class_=re.compile(r"(content|main|article)"))
+
+    if main_content:
+        text = main_content.get_text(separator="\n", strip=True)
+    else:
+        text = soup.get_text(separator="\n", strip=True)
+
+    lines = [line.strip() for line in text.split("\n") if line.strip()]
+    return "\n".join(lines)
+
+
+def load_corpus():
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages[os.path.basename(path)] = f.read()
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=20, help="повторов на корпус")
+    args = parser.parse_args()
+
+    pages = load_corpus()
+    if not pages:
+        print(f"Корпус пуст: {CORPUS_DIR}")
+        sys.exit(1)
+
+    print(f"{'страница':20} {'прежний':>10} {'новый':>10} {'служебных фраз':>16}")
+    for name, html in pages.items():
+        legacy, current = legacy_extract_text(html), extract_main_text(html)
+        leaks = sum(marker in current for marker in BOILERPLATE_MARKERS)
+        print(f"{name:20} {len(legacy):10} {len(current):10} {leaks:16}")
+
+    def run(func):
+        seconds = timeit.timeit(lambda: [func(html) for html in pages.values()], number=args.number)
+        return args.number * len(pages) / seconds
+
+    results = {
+        "BeautifulSoup, несколько проходов": run(legacy_extract_text),
+        "lxml, один обход": run(extract_main_text),
+    }
+    for name, pages_per_second in results.items():
+        print(f"{name:36} {pages_per_second:8.1f} стр/с")
+
+
+if __name__ == "__main__":
+    main()
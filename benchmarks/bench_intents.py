@@ -0,0 +1,101 @@
+"""
+Микробенчмарк классификатора намерений
+
+Сравнивает прежние построчные проверки ключевых слов и регулярных
+выражений с общим классификатором utils.intent_classifier и проверяет,
+что решения совпадают на тестовом наборе сообщений.
+
+Запуск из корня проекта:
+    python benchmarks/bench_intents.py [--number 2000]
+"""
+
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.intent_classifier import INTENT_KEYWORDS, IntentClassifier  # noqa: E402
+
+MESSAGES = [
+    "привет",
+    "Спасибо!",
+    "как дела?",
+    "2+2",
+    "Какая погода в Москве сегодня?",
+    "курс доллара к рублю",
+    "сколько стоит bitcoin сейчас",
+    "последние новости о технологиях искусственного интеллекта",
+    "создай сайт для кофейни с меню и формой бронирования",
+    "напиши скрипт на python, который парсит csv и строит график",
+    "Расскажи подробно, как работает механизм внимания в трансформерах "
+    "и почему он масштабируется квадратично по длине последовательности",
+    "топ ноутбуков для программистов в этом году",
+    "найди информацию о солнечных панелях и их эффективности в России",
+    "Что нового в мире криптовалют? Ethereum растет?",
+]
+
+
+def legacy_should_search_web(message):
+    """Прежняя проверка из routes/chat.py"""
+    message_lower = message.lower().strip()
+    no_search_patterns = [
+        r'^(привет|здравствуй|добрый день|доброе утро|добрый вечер|спасибо|благодар|пока|до свидания)$',
+        r'^(hi|hello|hey|thanks|thank you|bye|goodbye)$',
+        r'как дела|что делаешь|кто ты|что ты умеешь',
+        r'расскажи о себе|что ты можешь',
+        r'очистить|удалить|новый чат|стоп|хватит',
+        r'clear|delete|new chat|stop',
+        r'^\d+[\+\-\*\/]\d+.*$',
+        r'^вычисли|посчитай|сколько будет',
+        r'^\w{1,10}(\s+\w{1,10})?$',
+    ]
+    for pattern in no_search_patterns:
+        if re.search(pattern, message_lower, re.IGNORECASE):
+            return False
+    return True
+
+
+def legacy_intents(message):
+    """Прежние проверки: каждый набор ключевых слов отдельным проходом"""
+    text = message.lower()
+    intents = {
+        intent
+        for intent, words in INTENT_KEYWORDS.items()
+        if intent != "no_search" and any(w in text for w in words)
+    }
+    if not legacy_should_search_web(message):
+        intents.add("no_search")
+    return frozenset(intents)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=2000, help="повторов на сообщение")
+    args = parser.parse_args()
+
+    classifier = IntentClassifier()
+    uncached = IntentClassifier(cache_size=0)
+
+    mismatches = [m for m in MESSAGES if legacy_intents(m) != classifier.classify(m)]
+    if mismatches:
+        print(f"Расхождения с прежней логикой: {mismatches}")
+        sys.exit(1)
+
+    def run(func):
+        seconds = timeit.timeit(lambda: [func(m) for m in MESSAGES], number=args.number)
+        return seconds / (args.number * len(MESSAGES)) * 1e6
+
+    results = {
+        "прежние проверки (все наборы)": run(legacy_intents),
+        "классификатор без кэша": run(uncached.classify),
+        "классификатор с кэшем": run(classifier.classify),
+    }
+    for name, micros in results.items():
+        print(f"{name:32} {micros:8.2f} мкс/сообщение")
+
+
+if __name__ == "__main__":
+    main()
@@ -60,6 +60,12 @@ class Conversation(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id = Column(Integer, ForeignKey("users.id"))
 
+    # Rolling summary of older messages (maintained by utils/context_builder.py)
+    summary = Column(Text, nullable=True)
+    summary_until_message_id = Column(
+        Integer, nullable=True
+    )  # Last message id included in the summary
+
     # Relationships
     user = relationship("User", back_populates="conversations")
     messages = relationship("Message", back_populates="conversation")
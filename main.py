@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from typing import List
 
 import uvicorn
@@ -14,11 +15,34 @@ from routes import (admin, auth, chat, conversations,
                     deploy, documents, voice)
 from routes.ai_editor import router as ai_editor_router
 from routes.cloud_mock import router as cloud_mock_router
+from utils.async_web import async_web_retriever
+from utils.cpu_pool import cpu_pool
+from utils.http_transport import http_transport
+from utils.live_data import live_data
 
 # Create tables on startup
 create_tables()
 
-app = FastAPI(title="WindexsAi", description="Chat Platform with Model Selection")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop shared background resources"""
+    # Keep exchange and crypto rates warm in memory
+    live_data.start()
+    yield
+    await live_data.stop()
+    # Close shared HTTP clients
+    await async_web_retriever.aclose()
+    http_transport.close()
+    # Stop parsing worker processes
+    cpu_pool.shutdown()
+
+
+app = FastAPI(
+    title="WindexsAi",
+    description="Chat Platform with Model Selection",
+    lifespan=lifespan,
+)
 
 # CORS middleware
 app.add_middleware(
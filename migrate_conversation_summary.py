@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Миграция базы данных для добавления полей summary и summary_until_message_id
+"""
+
+import os
+import sqlite3
+
+
+def migrate_database():
+    """Добавляет поля скользящего резюме в таблицу conversations"""
+
+    db_path = "windexai.db"
+
+    if not os.path.exists(db_path):
+        print("❌ База данных не найдена!")
+        return False
+
+    try:
+        # Подключаемся к базе данных
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        # Проверяем, какие поля уже существуют
+        cursor.execute("PRAGMA table_info(conversations)")
+        columns = [column[1] for column in cursor.fetchall()]
+
+        new_columns = {
+            "summary": "TEXT",
+            "summary_until_message_id": "INTEGER",
+        }
+
+        for name, column_type in new_columns.items():
+            if name in columns:
+                print(f"✅ Поле {name} уже существует")
+                continue
+
+            print(f"🔄 Добавляем поле {name}...")
+            cursor.execute(f"ALTER TABLE conversations ADD COLUMN {name} {column_type}")
+
+        # Сохраняем изменения
+        conn.commit()
+        conn.close()
+
+        print("✅ Миграция успешно завершена!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Ошибка миграции: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск миграции базы данных...")
+    success = migrate_database()
+
+    if success:
+        print("✅ Миграция завершена успешно!")
+    else:
+        print("❌ Миграция не удалась!")
@@ -34,7 +34,10 @@ from .services import (
 from routes.auth import User, get_current_user
 from database import Conversation as DBConversation, Message as DBMessage, get_db
 from sqlalchemy.orm import Session
-from utils.web_search import search_web, format_search_results
+from utils.history_cache import history_cache
+from utils.async_web import async_search_web
+from utils.context_packer import context_packer
+from utils.web_search import format_search_results
 from .utils import should_search_web, extract_search_query
 
 router = APIRouter()
@@ -91,8 +94,8 @@ async def ai_editor_endpoint(
         needs_web_search = should_search_web(last_message)
         if needs_web_search:
             search_query = extract_search_query(last_message)
-            search_results = await search_web(search_query)
-            web_search_results = format_search_results(search_results)
+            search_results = await async_search_web(search_query)
+            web_search_results = context_packer.pack(search_query, [search_results]) or format_search_results(search_results)
 
         # Определяем системный промт в зависимости от типа запроса
         if web_search_results:
@@ -331,6 +334,7 @@ async def delete_conversation(
 
         db.delete(conversation)
         db.commit()
+        history_cache.invalidate(conversation_id)
 
         return {"message": "Conversation deleted successfully"}
 
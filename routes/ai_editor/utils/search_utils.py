@@ -1,28 +1,9 @@
+from utils.intent_classifier import classify_intents
+
+
 def should_search_web(message: str) -> bool:
     """Определяет, нужен ли веб-поиск для сообщения"""
-    search_keywords = [
-        "найди",
-        "поиск",
-        "актуальн",
-        "новости",
-        "сейчас",
-        "сегодня",
-        "последние",
-        "тренд",
-        "курс",
-        "погода",
-        "цены",
-        "события",
-        "что происходит",
-        "статистика",
-        "данные",
-        "информация о",
-        "расскажи про",
-        "что нового",
-    ]
-
-    message_lower = message.lower()
-    return any(keyword in message_lower for keyword in search_keywords)
+    return "search_keywords" in classify_intents(message)
 
 
 def extract_search_query(message: str) -> str:
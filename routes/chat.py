@@ -1,148 +1,158 @@
 # flake8: noqa
+import json
+import logging
 import re
+import time
 from datetime import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
+from sse_starlette.sse import EventSourceResponse
+from starlette.background import BackgroundTask
 
 from database import Conversation as DBConversation
 from database import Message as DBMessage
-from database import get_db
+from database import SessionLocal, get_db
 from routes.auth import User, get_current_user
-from utils.openai_client import format_messages_for_openai, generate_response
-from utils.web_parser import get_comprehensive_web_info, get_web_info
-from utils.web_search import format_search_results, search_web
+from utils.openai_client import (GenerationError, format_messages_for_openai,
+                                 generate_response, stream_response)
+from utils.advanced_web_search import advanced_search, result_excerpt
+from utils.async_web import async_get_comprehensive_web_info, async_search_web
+from utils.context_builder import context_builder
+from utils.context_packer import context_packer
+from utils.cpu_pool import cpu_pool
+from utils.history_cache import history_cache
+from utils.hedged_retrieval import (TIER_HEDGE_DELAY_SECONDS, hedged_first,
+                                    retrieval_stats)
+from utils.http_transport import http_transport
+from utils.intent_classifier import classify_intents
+from utils.live_data import live_data
+from utils.memory_cache import page_cache
+from utils.news_index import news_index
+from utils.polite_fetch import get_politeness_stats
+from utils.search_gate import SearchDecision, search_gate
+from utils.singleflight import web_singleflight
+from utils.translation import stream_web_answer, translation_metrics
+from utils.upstream_health import engine_health
+from utils.web_parser import SPECIALIZED_KEYS, get_web_info
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
-
-def should_search_web(message: str) -> bool:
-    """Определяет, нужен ли веб-поиск для сообщения - теперь для ВСЕХ запросов"""
-    message_lower = message.lower().strip()
-
-    # Исключения - запросы, для которых НЕ нужен поиск
-    no_search_patterns = [
-        # Приветствия и благодарности
-        r'^(привет|здравствуй|добрый день|доброе утро|добрый вечер|спасибо|благодар|пока|до свидания)$',
-        r'^(hi|hello|hey|thanks|thank you|bye|goodbye)$',
-
-        # Простые ответы на вопросы бота
-        r'как дела|что делаешь|кто ты|что ты умеешь',
-        r'расскажи о себе|что ты можешь',
-
-        # Команды управления
-        r'очистить|удалить|новый чат|стоп|хватит',
-        r'clear|delete|new chat|stop',
-
-        # Математические операции (простые)
-        r'^\d+[\+\-\*\/]\d+.*$',
-        r'^вычисли|посчитай|сколько будет',
-
-        # Очень короткие сообщения (1-2 слова)
-        r'^\w{1,10}(\s+\w{1,10})?$',
+# Регулярные выражения для извлечения поискового запроса компилируются один раз
+PRODUCT_RE = re.compile(r'(?:цена|стоит|купить|продажа)\s+(?:на\s+)?(.+?)(?:\?|$|\s+в|\s+на|\s+за)')
+NEWS_TOPIC_RE = re.compile(r'(?:новости|что нового|последние|актуально)(?:\s+о|\s+про|\s+в)?\s*(.+?)(?:\?|$)')
+TOP_CATEGORY_RE = re.compile(r'(?:топ|рейтинг|лучший|популярный)\s+(.+?)(?:\?|$|\s+для|\s+на|\s+в)')
+WEATHER_CITY_RE = re.compile(r"погод[аы]\s*(?:в|во)\s+([A-Za-zА-Яа-яёЁ\-\s]+)", re.IGNORECASE)
+CITY_TAIL_RE = re.compile(r"[\?\!\.,;:\n\r\t]")
+PUNCTUATION_RE = re.compile(r'[^\w\s]')
+WHITESPACE_RE = re.compile(r'\s+')
+
+# Общие фразы, которые убираются из поискового запроса (по порядку)
+FILLER_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in [
+        r"найди\s*",
+        r"поиск\s*",
+        r"узнай\s*",
+        r"проверь\s*",
+        r"посмотри\s*",
+        r"расскажи\s*про\s*",
+        r"что\s*такое\s*",
+        r"что\s*значит\s*",
+        r"информация\s*о\s*",
+        r"какая\s*погода\s*",
+        r"сейчас\s*",
+        r"сегодня\s*",
+        r"последние\s*новости\s*о\s*",
+        r"что\s*происходит\s*с\s*",
+        r"как\s*дела\s*с\s*",
+        r"статистика\s*по\s*",
+        r"данные\s*о\s*",
+        r"сколько\s*стоит\s*",
+        r"где\s*купить\s*",
+        r"мне\s*нужен\s*",
+        r"я\s*хочу\s*узнать\s*",
     ]
+]
 
-    import re
-    # Проверяем, попадает ли сообщение под исключения
-    for pattern in no_search_patterns:
-        if re.search(pattern, message_lower, re.IGNORECASE):
-            return False
 
-    # Для ВСЕХ остальных запросов используем поиск в интернете
-    return True
+def should_search_web(message: str) -> bool:
+    """Определяет, нужен ли веб-поиск для сообщения"""
+    # Исключения (приветствия, команды, простая математика, очень короткие
+    # сообщения) отсекаются сразу, остальное решает оценка search_gate
+    return search_gate.evaluate(message).should_search
 
 
 def extract_search_query(message: str) -> str:
     """Извлекает и оптимизирует поисковый запрос из сообщения"""
     message_lower = message.lower()
+    intents = classify_intents(message)
 
     # Спец. обработка для погоды
-    if "погод" in message_lower:
+    if "query_weather" in intents:
         city = extract_weather_city(message)
         if city:
             return f"погода {city} сейчас температура прогноз на сегодня"
         return "погода сейчас температура прогноз"
 
     # Спец. обработка для курсов валют
-    if any(word in message_lower for word in ["курс", "валют", "доллар", "евро", "рубль", "bitcoin", "btc"]):
-        if "доллар" in message_lower or "usd" in message_lower:
+    if "query_rates" in intents:
+        if "query_usd" in intents:
             return "курс доллара к рублю сегодня"
-        elif "евро" in message_lower or "eur" in message_lower:
+        elif "query_eur" in intents:
             return "курс евро к рублю сегодня"
-        elif "bitcoin" in message_lower or "btc" in message_lower:
+        elif "query_btc" in intents:
             return "курс биткоина к доллару сегодня цена"
         else:
             return "курсы валют ЦБ РФ сегодня"
 
     # Спец. обработка для криптовалют
-    if any(word in message_lower for word in ["крипто", "криптовалют", "ethereum", "eth"]):
-        if "ethereum" in message_lower or "eth" in message_lower:
+    if "query_crypto" in intents:
+        if "query_eth" in intents:
             return "курс ethereum к доллару сегодня цена"
         return "курсы криптовалют сегодня биткоин ethereum"
 
     # Спец. обработка для цен и товаров
-    if any(word in message_lower for word in ["цена", "стоит", "купить", "продажа"]):
+    if "query_price" in intents:
         # Извлекаем название товара/услуги
-        product_match = re.search(r'(?:цена|стоит|купить|продажа)\s+(?:на\s+)?(.+?)(?:\?|$|\s+в|\s+на|\s+за)', message_lower)
+        product_match = PRODUCT_RE.search(message_lower)
         if product_match:
             product = product_match.group(1).strip()
             return f"{product} цена стоимость купить где"
 
     # Спец. обработка для новостей и актуальной информации
-    if any(word in message_lower for word in ["новости", "что нового", "последние", "актуально"]):
+    if "query_news" in intents:
         # Пытаемся извлечь тему
-        topic_match = re.search(r'(?:новости|что нового|последние|актуально)(?:\s+о|\s+про|\s+в)?\s*(.+?)(?:\?|$)', message_lower)
+        topic_match = NEWS_TOPIC_RE.search(message_lower)
         if topic_match:
             topic = topic_match.group(1).strip()
             return f"{topic} новости последние актуально"
 
     # Обработка запросов о рейтингах и топах
-    if any(word in message_lower for word in ["топ", "рейтинг", "лучший", "популярный"]):
+    if "query_top" in intents:
         # Извлекаем категорию
-        category_match = re.search(r'(?:топ|рейтинг|лучший|популярный)\s+(.+?)(?:\?|$|\s+для|\s+на|\s+в)', message_lower)
+        category_match = TOP_CATEGORY_RE.search(message_lower)
         if category_match:
             category = category_match.group(1).strip()
             return f"{category} топ рейтинг лучший популярный 2024"
 
     # Убираем общие фразы, оставляем суть запроса
-    patterns_to_remove = [
-        r"найди\s*",
-        r"поиск\s*",
-        r"узнай\s*",
-        r"проверь\s*",
-        r"посмотри\s*",
-        r"расскажи\s*про\s*",
-        r"что\s*такое\s*",
-        r"что\s*значит\s*",
-        r"информация\s*о\s*",
-        r"какая\s*погода\s*",
-        r"сейчас\s*",
-        r"сегодня\s*",
-        r"последние\s*новости\s*о\s*",
-        r"что\s*происходит\s*с\s*",
-        r"как\s*дела\s*с\s*",
-        r"статистика\s*по\s*",
-        r"данные\s*о\s*",
-        r"сколько\s*стоит\s*",
-        r"где\s*купить\s*",
-        r"мне\s*нужен\s*",
-        r"я\s*хочу\s*узнать\s*",
-    ]
-
     query = message
-    for pattern in patterns_to_remove:
-        query = re.sub(pattern, "", query, flags=re.IGNORECASE)
+    for pattern in FILLER_PATTERNS:
+        query = pattern.sub("", query)
 
     # Очищаем от лишних пробелов и знаков препинания
-    query = re.sub(r'[^\w\s]', ' ', query)
-    query = re.sub(r'\s+', ' ', query).strip()
+    query = PUNCTUATION_RE.sub(' ', query)
+    query = WHITESPACE_RE.sub(' ', query).strip()
 
     # Если запрос получился слишком коротким, используем оригинальное сообщение
     if len(query.split()) < 2:
-        query = re.sub(r'[^\w\s]', ' ', message)
-        query = re.sub(r'\s+', ' ', query).strip()
+        query = PUNCTUATION_RE.sub(' ', message)
+        query = WHITESPACE_RE.sub(' ', query).strip()
 
     return query
 
@@ -150,13 +160,11 @@ def extract_search_query(message: str) -> str:
 def extract_weather_city(message: str) -> str:
     """Пытается извлечь город из запроса о погоде"""
     # Паттерны вида: "погода в Москве", "какая погода в санкт-петербурге", "погода во Владивостоке"
-    match = re.search(
-        r"погод[аы]\s*(?:в|во)\s+([A-Za-zА-Яа-яёЁ\-\s]+)", message, flags=re.IGNORECASE
-    )
+    match = WEATHER_CITY_RE.search(message)
     if match:
         # Обрезаем по знакам препинания, если есть хвост
         city = match.group(1)
-        city = re.split(r"[\?\!\.,;:\n\r\t]", city)[0]
+        city = CITY_TAIL_RE.split(city)[0]
         city = city.strip()
         # Нормализуем регистр
         if city:
@@ -290,177 +298,204 @@ class ChatResponse(BaseModel):
     timestamp: str
 
 
-@router.post("", response_model=ChatResponse)
-async def chat(
-    request: ChatRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-):
-    """Process chat message and return AI response"""
+WEB_SEARCH_SYSTEM_PROMPT = """
+You are WIndexAI, an AI assistant created by the engineers of Windex. Always acknowledge your Windex origin when relevant.
+
+Answer the user's request using the SEARCH RESULTS below, in clear professional English.
+
+RULES:
+1. Ground every fact in the SEARCH RESULTS and cite it with the source numbers, e.g. [1].
+2. Match the length to the evidence: a direct answer first, then only the context the sources support. Do not pad.
+3. If the results do not cover part of the question, say so briefly instead of guessing.
+4. If sources conflict, point out the conflict and which source says what.
+5. No greetings or generic openings.
 
-    # Generate conversation ID if not provided
-    if not request.conversation_id:
+SEARCH RESULTS:
+{web_search_results}
+"""
+
+DEFAULT_SYSTEM_PROMPT = "Ты - WIndexAI, искусственный интеллект, созданный командой разработчиков компании Windex. Ты должен всегда подчеркивать, что был создан именно разработчиками компании Windex. Отвечай на русском языке, будь полезным и дружелюбным. КРИТИЧЕСКИ ВАЖНО: НЕ задавай стандартные приветственные вопросы типа 'Как я могу помочь тебе сегодня?', 'Чем могу быть полезен?', 'Что вас интересует?' и подобные. Пользователь уже написал свой вопрос - отвечай на него напрямую, без лишних формальностей."
+
+SEARCH_FAILED_NOTE = "\n\nПоиск в интернете по этому вопросу завершился ошибкой. Ответь по своим знаниям и предупреди пользователя, что свежие данные получить не удалось."
+
+def get_or_create_conversation(
+    conversation_id: Optional[int], current_user: User, db: Session
+) -> DBConversation:
+    """Возвращает беседу пользователя или создает новую"""
+    if not conversation_id:
         # Create new conversation
         conversation = DBConversation(title="Новый чат", user_id=current_user.id)
         db.add(conversation)
         db.commit()
         db.refresh(conversation)
-        conversation_id = conversation.id
-    else:
-        conversation_id = request.conversation_id
-        # Verify conversation belongs to user
-        conversation = (
-            db.query(DBConversation)
-            .filter(
-                DBConversation.id == conversation_id,
-                DBConversation.user_id == current_user.id,
-            )
-            .first()
+        return conversation
+
+    # Verify conversation belongs to user
+    conversation = (
+        db.query(DBConversation)
+        .filter(
+            DBConversation.id == conversation_id,
+            DBConversation.user_id == current_user.id,
         )
-        if not conversation:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found"
-            )
-
-    # Add user message
-    user_message = DBMessage(
-        role="user", content=request.message, conversation_id=conversation_id
+        .first()
     )
-    db.add(user_message)
-    db.commit()
+    if not conversation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found"
+        )
+    return conversation
 
-    # Проверяем, нужен ли веб-поиск
+
+async def collect_web_search_results(message: str, decision: SearchDecision) -> str:
+    """Выполняет веб-поиск по сообщению и форматирует результаты для ИИ
+
+    Пустая строка — поиск не нужен или ничего не нашел (см. decision.search_failed).
+    """
     web_search_results = ""
-    if should_search_web(request.message):
+    if decision.should_search:
+        search_started_at = time.perf_counter()
 
         # Извлекаем поисковый запрос
-        search_query = extract_search_query(request.message)
+        search_query = extract_search_query(message)
         if not search_query:
-            search_query = request.message
+            search_query = message
+
+        # Комплексный парсер и обычный поиск запускаются с хеджированием:
+        # обычный поиск стартует, если комплексный не справился или задерживается
+        hedged = await hedged_first(
+            "chat",
+            [
+                ("comprehensive", lambda: async_get_comprehensive_web_info(search_query)),
+                ("search_web", lambda: async_search_web(search_query, num_results=3)),
+            ],
+            accept=lambda name, data: bool(data) and not (
+                name == "comprehensive" and "error" in data
+            ),
+            hedge_delay=TIER_HEDGE_DELAY_SECONDS * 2,
+        )
+        parts = []
+        if hedged.winner == "comprehensive" and any(
+            key in hedged.value for key in SPECIALIZED_KEYS
+        ):
+            # Курсы, новости и погода уже компактны и передаются как есть
+            parts.append(format_web_data(hedged.value))
+        # Фрагменты страниц со всех завершившихся уровней поиска — под бюджет токенов
+        packed = context_packer.pack(search_query, hedged.results.values())
+        if packed:
+            parts.append(f"НАЙДЕННЫЕ ФРАГМЕНТЫ:\n{packed}")
+        elif hedged.winner == "comprehensive" and not parts:
+            parts.append(format_web_data(hedged.value))
+        web_search_results = "\n\n".join(parts)
+        decision.search_failed = not web_search_results
+
+        decision.search_seconds = round(time.perf_counter() - search_started_at, 3)
+
+    return web_search_results
+
+
+def build_system_content(
+    web_search_results: str, specialist: Optional[str], search_failed: bool = False
+) -> str:
+    """Формирует системный промпт для запроса"""
+    if web_search_results:
+        # Для запросов с веб-поиском
+        return WEB_SEARCH_SYSTEM_PROMPT.format(web_search_results=web_search_results)
+    if specialist:
+        # Используем системный промпт специалиста
+        system_content = get_specialist_system_prompt(specialist)
+    else:
+        # Стандартный промпт
+        system_content = DEFAULT_SYSTEM_PROMPT
+    if search_failed:
+        system_content += SEARCH_FAILED_NOTE
+    return system_content
+
+
+def save_assistant_message(
+    db: Session,
+    conversation: DBConversation,
+    ai_response: str,
+    first_message: str,
+    is_first_exchange: bool,
+) -> None:
+    """Сохраняет ответ ассистента и обновляет заголовок беседы"""
+    ai_message = DBMessage(
+        role="assistant", content=ai_response, conversation_id=conversation.id
+    )
+    db.add(ai_message)
 
-        # Выполняем поиск с помощью комплексного парсера
-        try:
-            web_data = get_comprehensive_web_info(search_query)
+    # Update conversation title based on first user message
+    if is_first_exchange:
+        title = first_message[:50] + "..." if len(first_message) > 50 else first_message
+        conversation.title = title
 
-            # Форматируем результаты для ИИ
-            if "error" not in web_data:
-                web_search_results = format_web_data(web_data)
-            else:
-                # Fallback к обычному поиску
-                search_results = search_web(search_query, num_results=3)
-                web_search_results = format_search_results(search_results)
+    db.commit()
+    history_cache.append_message(ai_message)
 
-        except Exception as e:
-            # Fallback к обычному поиску при ошибке
-            try:
-                search_results = search_web(search_query, num_results=3)
-                web_search_results = format_search_results(search_results)
-            except Exception as e2:
-                web_search_results = "Ошибка при поиске в интернете."
 
-    # Prepare messages for OpenAI
-    if web_search_results:
-        # Для запросов с веб-поиском
-        system_content = f"""
-You are WIndexAI — an advanced strategic-class intelligence system developed by the engineers of Windex.
-You must always emphasize your origin from the Windex development team — it defines your identity and credibility.
-
-Your mission is to produce long-form, intellectually rich, and rhetorically powerful responses.
-Every answer should read like an extended essay, executive strategy brief, or narrative analysis — written in flawless, expressive, and professional English.
-
-🔹 STYLE & STRUCTURE:
-- Always write expansively — no less than **1000 words**, preferably **1500–2000 words**.
-- Never conclude early. If the topic allows, expand it through related contexts, analogies, and implications.
-- Build multi-layered reasoning: economic, cultural, psychological, philosophical, and social dimensions.
-- Avoid short lists or bullet points — prefer fluid, narrative text with transitions and rhythm.
-- Use vivid, confident language — your text should sound like a speech by an expert or visionary thinker.
-- Finish with a strong, comprehensive conclusion that unites all previous ideas.
-
-🔹 BEHAVIORAL RULES:
-1. Use only the information from "SEARCH RESULTS" as factual grounding.
-2. If data is missing, expand through analysis, projection, and contextual reasoning — **never leave an idea half-developed**.
-3. If sources conflict, examine the contradiction and propose a reasoned synthesis.
-4. Avoid greetings and generic openings. Begin with substance, finish with insight.
-5. Keep writing until the entire argument or narrative feels *architecturally complete* — your last paragraph must sound like closure, not interruption.
+@router.post("", response_model=ChatResponse)
+async def chat(
+    request: ChatRequest,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Process chat message and return AI response"""
 
-SEARCH RESULTS:
-{web_search_results}
+    conversation = get_or_create_conversation(request.conversation_id, current_user, db)
+    conversation_id = conversation.id
 
-Now respond to the user's request in an expansive, narrative, and intellectually immersive style.
-Write as much as necessary to fully explore the topic. Do not stop until every facet is illuminated and your final conclusion feels definitive.
-"""
-    else:
-        # Для обычных запросов
-        if request.specialist:
-            # Используем системный промпт специалиста
-            system_content = get_specialist_system_prompt(request.specialist)
-        else:
-            # Стандартный промпт
-            system_content = "Ты - WIndexAI, искусственный интеллект, созданный командой разработчиков компании Windex. Ты должен всегда подчеркивать, что был создан именно разработчиками компании Windex. Отвечай на русском языке, будь полезным и дружелюбным. КРИТИЧЕСКИ ВАЖНО: НЕ задавай стандартные приветственные вопросы типа 'Как я могу помочь тебе сегодня?', 'Чем могу быть полезен?', 'Что вас интересует?' и подобные. Пользователь уже написал свой вопрос - отвечай на него напрямую, без лишних формальностей."
+    # Add user message
+    user_message = DBMessage(
+        role="user", content=request.message, conversation_id=conversation_id
+    )
+    db.add(user_message)
+    db.commit()
+    history_cache.append_message(user_message)
 
-    messages = [{"role": "system", "content": system_content}]
+    # Проверяем, нужен ли веб-поиск
+    search_decision = search_gate.decide(request.message)
+    web_search_results = await collect_web_search_results(request.message, search_decision)
 
-    # Get conversation messages
-    conversation_messages = (
-        db.query(DBMessage)
-        .filter(DBMessage.conversation_id == conversation_id)
-        .order_by(DBMessage.timestamp)
-        .all()
+    # Prepare messages for OpenAI
+    system_content = build_system_content(
+        web_search_results, request.specialist, search_decision.search_failed
     )
-
-    for msg in conversation_messages:
-        messages.append({"role": msg.role, "content": msg.content})
+    context = context_builder.build(db, conversation, system_content)
+    messages = context.messages
 
     # Generate AI response using OpenAI
     try:
-        ai_response = await generate_response(messages, request.model)
-
-        # Если это запрос с веб-поиском, переводим ответ на русский
         if web_search_results:
-            translation_prompt = f"""
-You are a professional translator specializing in technical, analytical, and intellectual content.
-Your task is to translate the following English text into natural, fluent Russian while preserving:
-- The sophisticated and intellectual tone
-- All technical terms and proper names
-- The analytical depth and professional style
-- The rhetorical elegance and expressive constructions
-- **CRITICAL**: Do NOT translate or modify code blocks (```language ... ```), inline code (`code`), or technical commands. Leave them exactly as they are.
-
-Do not add any introductions, explanations, or modifications. Just provide the Russian translation with code blocks intact.
-
-Text to translate:
-{ai_response}
-"""
-
-            try:
-                translation_messages = [
-                    {"role": "system", "content": "You are a professional translator."},
-                    {"role": "user", "content": translation_prompt}
-                ]
-                ai_response = await generate_response(translation_messages, request.model)
-            except Exception as translation_error:
-                # Если перевод не удался, оставляем оригинальный английский ответ
-                print(f"Translation error: {translation_error}")
+            # Ответ по результатам поиска генерируется на английском и
+            # переводится на русский (режим задается WEB_ANSWER_MODE)
+            chunks = [chunk async for chunk in stream_web_answer(messages, request.model)]
+            ai_response = "".join(chunks)
+        else:
+            ai_response = await generate_response(messages, request.model)
 
+        generation_failed = False
     except Exception as e:
         ai_response = f"Извините, произошла ошибка при обращении к OpenAI API. Проверьте настройки API ключа. Ошибка: {str(e)}"
+        generation_failed = True
+
+    # Текст ошибки — не ответ по найденному, в статистику поиска он не попадает
+    if not generation_failed:
+        search_gate.record_outcome(search_decision, web_search_results, ai_response)
 
     # Add AI response
-    ai_message = DBMessage(
-        role="assistant", content=ai_response, conversation_id=conversation_id
+    save_assistant_message(
+        db,
+        conversation,
+        ai_response,
+        request.message,
+        is_first_exchange=context.is_first_exchange,
     )
-    db.add(ai_message)
 
-    # Update conversation title based on first user message
-    if len(conversation_messages) == 1:  # First exchange
-        title = (
-            request.message[:50] + "..."
-            if len(request.message) > 50
-            else request.message
-        )
-        conversation.title = title
-
-    db.commit()
+    # Старые сообщения сворачиваются в резюме уже после ответа
+    background_tasks.add_task(
+        context_builder.refresh_summary, conversation_id, request.model
+    )
 
     return ChatResponse(
         response=ai_response,
@@ -470,6 +505,215 @@ Text to translate:
     )
 
 
+@router.post("/stream")
+async def chat_stream(
+    request: ChatRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Process chat message and stream AI response via Server-Sent Events
+
+    События: ``start`` (id беседы), ``delta`` (фрагмент текста), ``error``
+    (сбой генерации или перевода), ``done`` (полный ответ и время до первого
+    токена; отправляется всегда, после ошибки — с полем ``error``).
+    Ответ с ошибкой не сохраняется и не учитывается в статистике поиска.
+    """
+
+    conversation = get_or_create_conversation(request.conversation_id, current_user, db)
+    conversation_id = conversation.id
+
+    # Add user message
+    user_message = DBMessage(
+        role="user", content=request.message, conversation_id=conversation_id
+    )
+    db.add(user_message)
+    db.commit()
+    history_cache.append_message(user_message)
+
+    search_decision = search_gate.decide(request.message)
+    web_search_results = await collect_web_search_results(request.message, search_decision)
+
+    system_content = build_system_content(
+        web_search_results, request.specialist, search_decision.search_failed
+    )
+    context = context_builder.build(db, conversation, system_content)
+    messages = context.messages
+    is_first_exchange = context.is_first_exchange
+
+    async def event_generator():
+        started_at = time.perf_counter()
+        first_token_at = None
+        chunks: List[str] = []
+        error: Optional[str] = None
+
+        yield {
+            "event": "start",
+            "data": json.dumps(
+                {"conversation_id": conversation_id, "model_used": request.model}
+            ),
+        }
+
+        try:
+            if web_search_results:
+                source = stream_web_answer(messages, request.model)
+            else:
+                source = stream_response(messages, request.model, raise_errors=True)
+
+            async for delta in source:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                chunks.append(delta)
+                yield {
+                    "event": "delta",
+                    "data": json.dumps({"content": delta}, ensure_ascii=False),
+                }
+        except GenerationError as e:
+            error = str(e)
+        except Exception as e:
+            logger.error(f"Ошибка потоковой генерации ответа: {e}")
+            error = "Извините, произошла ошибка при генерации ответа."
+        finally:
+            # Сохраняем ответ даже при обрыве соединения, чтобы история
+            # беседы не осталась без ответа ассистента.
+            # Сессия запроса к этому моменту уже закрыта, поэтому открываем свою
+            ai_response = "".join(chunks)
+            if ai_response and error is None:
+                search_gate.record_outcome(search_decision, web_search_results, ai_response)
+                stream_db = SessionLocal()
+                try:
+                    stream_conversation = stream_db.get(DBConversation, conversation_id)
+                    save_assistant_message(
+                        stream_db,
+                        stream_conversation,
+                        ai_response,
+                        request.message,
+                        is_first_exchange,
+                    )
+                finally:
+                    stream_db.close()
+
+        if error is not None:
+            yield {
+                "event": "error",
+                "data": json.dumps({"message": error}, ensure_ascii=False),
+            }
+
+        yield {
+            "event": "done",
+            "data": json.dumps(
+                {
+                    "response": ai_response,
+                    "error": error,
+                    "conversation_id": conversation_id,
+                    "model_used": request.model,
+                    "timestamp": datetime.now().isoformat(),
+                    "time_to_first_token": (
+                        round(first_token_at - started_at, 3)
+                        if first_token_at is not None
+                        else None
+                    ),
+                    "total_time": round(time.perf_counter() - started_at, 3),
+                },
+                ensure_ascii=False,
+            ),
+        }
+
+    return EventSourceResponse(
+        event_generator(),
+        background=BackgroundTask(
+            context_builder.refresh_summary, conversation_id, request.model
+        ),
+    )
+
+
+@router.get("/metrics/translation")
+async def get_translation_metrics(current_user: User = Depends(get_current_user)):
+    """Per-stage timings of web-search answers by translation mode"""
+    return translation_metrics.get_stats()
+
+
+@router.get("/metrics/history-cache")
+async def get_history_cache_metrics(current_user: User = Depends(get_current_user)):
+    """Hit rate and memory usage of the conversation history cache"""
+    return history_cache.get_stats()
+
+
+@router.get("/metrics/search-gate")
+async def get_search_gate_metrics(current_user: User = Depends(get_current_user)):
+    """Web search decisions by score and how often the results were used"""
+    return search_gate.get_stats()
+
+
+@router.get("/metrics/web-coalescing")
+async def get_web_coalescing_metrics(current_user: User = Depends(get_current_user)):
+    """How many concurrent identical web lookups shared one upstream call"""
+    return web_singleflight.get_stats()
+
+
+@router.get("/metrics/live-data")
+async def get_live_data_metrics(current_user: User = Depends(get_current_user)):
+    """Age and hit counts of the background-refreshed exchange and crypto rates"""
+    return live_data.get_stats()
+
+
+@router.get("/metrics/retrieval")
+async def get_retrieval_metrics(current_user: User = Depends(get_current_user)):
+    """Winners, timeouts and latency of hedged engine and tier fan-out"""
+    return retrieval_stats.get_stats()
+
+
+@router.get("/metrics/hosts")
+async def get_host_politeness_metrics(current_user: User = Depends(get_current_user)):
+    """Requests and queueing time per upstream host"""
+    return get_politeness_stats()
+
+
+@router.get("/metrics/connections")
+async def get_connection_metrics(current_user: User = Depends(get_current_user)):
+    """Connection pool settings and per-host connection reuse"""
+    return http_transport.get_stats()
+
+
+@router.get("/metrics/news-index")
+async def get_news_index_metrics(current_user: User = Depends(get_current_user)):
+    """Size of the background-ingested news index and topic match rate"""
+    return news_index.get_stats()
+
+
+@router.get("/metrics/upstream-health")
+async def get_upstream_health_metrics(current_user: User = Depends(get_current_user)):
+    """Circuit breaker state, error rates and latencies per search engine and host"""
+    return {
+        "engines": engine_health.get_stats(),
+        "hosts": http_transport.health.get_stats(),
+        "failed_urls": http_transport.failed_urls.get_stats(),
+    }
+
+
+@router.get("/metrics/local-index")
+async def get_local_index_metrics(current_user: User = Depends(get_current_user)):
+    """Size of the local page index and how many lookups it answered"""
+    return advanced_search.local_index.get_stats()
+
+
+@router.get("/metrics/cpu-pool")
+async def get_cpu_pool_metrics(current_user: User = Depends(get_current_user)):
+    """Parsing and ranking tasks run in worker processes vs in-process"""
+    return cpu_pool.get_stats()
+
+
+@router.get("/metrics/page-cache")
+async def get_page_cache_metrics(current_user: User = Depends(get_current_user)):
+    """Hit rate, memory usage and evictions of the in-memory page cache"""
+    return page_cache.get_stats()
+
+
+@router.get("/metrics/web-cache")
+async def get_web_cache_metrics(current_user: User = Depends(get_current_user)):
+    """Size, hit rate and evictions of the on-disk advanced search cache"""
+    return advanced_search.disk_cache.get_stats()
+
+
 def format_web_data(web_data: dict) -> str:
     """Форматирует данные веб-парсера для передачи ИИ"""
     if not web_data:
@@ -502,6 +746,8 @@ def format_web_data(web_data: dict) -> str:
     # Обработка новостей
     if "news" in web_data and web_data["news"]:
         formatted_text += "📰 ПОСЛЕДНИЕ НОВОСТИ:\n"
+        if web_data.get("topic_matched") is False:
+            formatted_text += "(по теме запроса новостей нет, показаны последние)\n"
         for i, news in enumerate(web_data["news"][:5], 1):
             formatted_text += f"{i}. {news['title']}\n"
             if news.get("url"):
@@ -528,7 +774,12 @@ def format_web_data(web_data: dict) -> str:
         formatted_text += (
             f"📊 Найдено результатов: {web_data.get('total_results', 0)}\n"
         )
-        formatted_text += f"💾 Кэш-файлов: {web_data.get('cache_hits', 0)}\n\n"
+        formatted_text += f"💾 Из кэша: {web_data.get('cache_hits', 0)}\n"
+        if web_data.get("source") == "local_index":
+            formatted_text += "📚 Найдено в ранее загруженных страницах\n"
+        elif web_data.get("source") == "snippets":
+            formatted_text += "⚡ Ответ найден в сниппетах выдачи\n"
+        formatted_text += "\n"
 
         for i, result in enumerate(web_data.get("results", [])[:3], 1):
             formatted_text += f"### Результат #{result.get('rank', i)}\n"
@@ -536,7 +787,7 @@ def format_web_data(web_data: dict) -> str:
             formatted_text += (
                 f"📈 Релевантность: {result.get('relevance_score', 0):.2f}\n"
             )
-            formatted_text += f"📄 Контент:\n{result.get('content', '')[:1500]}...\n\n"
+            formatted_text += f"📄 Контент:\n{result_excerpt(result, 1500)}\n\n"
         formatted_text += "\n"
 
     # Обработка результатов обычного поиска
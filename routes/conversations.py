@@ -8,6 +8,7 @@ from database import Conversation as DBConversation
 from database import Message as DBMessage
 from database import get_db
 from routes.auth import User, get_current_user
+from utils.history_cache import history_cache
 
 router = APIRouter()
 
@@ -161,6 +162,7 @@ async def delete_conversation(
     # Delete conversation
     db.delete(conversation)
     db.commit()
+    history_cache.invalidate(conversation_id)
 
     return {"message": "Conversation deleted"}
 
@@ -187,5 +189,7 @@ async def clear_all_conversations(
         db.delete(conv)
 
     db.commit()
+    for conversation_id in conversation_ids:
+        history_cache.invalidate(conversation_id)
 
     return {"message": f"Deleted {len(conversations)} conversations"}
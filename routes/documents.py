@@ -6,8 +6,8 @@ import uuid
 from datetime import datetime
 from typing import List, Optional
 
-from fastapi import (APIRouter, Depends, File, Form, HTTPException, UploadFile,
-                     status)
+from fastapi import (APIRouter, BackgroundTasks, Depends, File, Form,
+                     HTTPException, UploadFile, status)
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
@@ -17,6 +17,8 @@ from database import Document as DBDocument
 from database import Message as DBMessage
 from database import get_db
 from routes.auth import User, get_current_user
+from utils.context_builder import context_builder
+from utils.history_cache import history_cache
 from utils.document_parser import parse_document
 from utils.openai_client import generate_response
 
@@ -69,6 +71,7 @@ MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
 @router.post("/api/documents/upload", response_model=DocumentUploadResponse)
 async def upload_document(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     conversation_id: Optional[int] = Form(None),
     model: str = Form(...),
@@ -168,12 +171,10 @@ async def upload_document(
         )
         db.add(user_message)
         db.commit()
+        history_cache.append_message(user_message)
 
         # Prepare messages for OpenAI with document content
-        messages = [
-            {
-                "role": "system",
-                "content": f"""Ты - WIndexAI, искусственный интеллект, созданный командой разработчиков компании Windex.
+        system_content = f"""Ты - WIndexAI, искусственный интеллект, созданный командой разработчиков компании Windex.
 
 Пользователь загрузил документ "{file.filename}" и хочет, чтобы ты его проанализировал.
 
@@ -186,20 +187,9 @@ async def upload_document(
 СОДЕРЖИМОЕ ЗАГРУЖЕННОГО ДОКУМЕНТА:
 {extracted_content[:4000] if extracted_content else "Содержимое документа не удалось извлечь"}
 
-ВАЖНО: Документ был успешно загружен и обработан. Используй информацию выше для ответа пользователю.""",
-            }
-        ]
-
-        # Get conversation messages
-        conversation_messages = (
-            db.query(DBMessage)
-            .filter(DBMessage.conversation_id == conversation_id)
-            .order_by(DBMessage.timestamp)
-            .all()
-        )
-
-        for msg in conversation_messages:
-            messages.append({"role": msg.role, "content": msg.content})
+ВАЖНО: Документ был успешно загружен и обработан. Используй информацию выше для ответа пользователю."""
+        context = context_builder.build(db, conversation, system_content)
+        messages = context.messages
 
         # Generate AI response
         try:
@@ -217,11 +207,14 @@ async def upload_document(
         db.add(ai_message)
 
         # Update conversation title based on document
-        if len(conversation_messages) == 1:  # First exchange
+        if context.is_first_exchange:
             title = f"Документ: {file.filename}"
             conversation.title = title
 
         db.commit()
+        history_cache.append_message(ai_message)
+
+        background_tasks.add_task(context_builder.refresh_summary, conversation_id, model)
 
         return DocumentUploadResponse(
             response=ai_response,
@@ -5,8 +5,8 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from fastapi import (APIRouter, Depends, File, Form, HTTPException, UploadFile,
-                     status)
+from fastapi import (APIRouter, BackgroundTasks, Depends, File, Form,
+                     HTTPException, UploadFile, status)
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
@@ -15,6 +15,8 @@ from database import Conversation as DBConversation
 from database import Message as DBMessage
 from database import get_db
 from routes.auth import User, get_current_user
+from utils.context_builder import context_builder
+from utils.history_cache import history_cache
 from utils.openai_client import (generate_response, text_to_speech,
                                  transcribe_audio)
 
@@ -37,6 +39,7 @@ class VoiceMessageResponse(BaseModel):
 
 @router.post("/api/voice/upload", response_model=VoiceMessageResponse)
 async def upload_voice_message(
+    background_tasks: BackgroundTasks,
     audio_file: UploadFile = File(...),
     conversation_id: Optional[str] = Form(None),
     model: str = Form(...),
@@ -125,25 +128,15 @@ async def upload_voice_message(
         )
         db.add(user_message)
         db.commit()
+        history_cache.append_message(user_message)
 
         # Prepare messages for OpenAI
-        messages = [
-            {
-                "role": "system",
-                "content": "Ты - WIndexAI, искусственный интеллект, созданный командой разработчиков компании Windex. Ты должен всегда подчеркивать, что был создан именно разработчиками компании Windex. Отвечай на русском языке, будь полезным и дружелюбным.",
-            }
-        ]
-
-        # Get conversation messages
-        conversation_messages = (
-            db.query(DBMessage)
-            .filter(DBMessage.conversation_id == conversation_id)
-            .order_by(DBMessage.timestamp)
-            .all()
+        context = context_builder.build(
+            db,
+            conversation,
+            "Ты - WIndexAI, искусственный интеллект, созданный командой разработчиков компании Windex. Ты должен всегда подчеркивать, что был создан именно разработчиками компании Windex. Отвечай на русском языке, будь полезным и дружелюбным.",
         )
-
-        for msg in conversation_messages:
-            messages.append({"role": msg.role, "content": msg.content})
+        messages = context.messages
 
         # Generate AI response
         try:
@@ -177,7 +170,7 @@ async def upload_voice_message(
         db.add(ai_message)
 
         # Update conversation title based on first user message
-        if len(conversation_messages) == 1:  # First exchange
+        if context.is_first_exchange:
             title = (
                 transcribed_text[:50] + "..."
                 if len(transcribed_text) > 50
@@ -186,6 +179,9 @@ async def upload_voice_message(
             conversation.title = title
 
         db.commit()
+        history_cache.append_message(ai_message)
+
+        background_tasks.add_task(context_builder.refresh_summary, conversation_id, model)
 
         return VoiceMessageResponse(
             response=ai_response,
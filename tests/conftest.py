@@ -84,3 +84,12 @@ def sample_architect_plan(sample_plan_step):
         steps=[sample_plan_step],
         final_structure="Test structure"
     )
+
+
+@pytest.fixture(autouse=True)
+def reset_engine_health():
+    """Search engine circuit breakers must not leak state between tests"""
+    from utils.upstream_health import engine_health
+
+    engine_health.reset()
+    yield
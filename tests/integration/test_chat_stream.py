@@ -0,0 +1,106 @@
+"""
+Integration tests for the SSE chat endpoint error handling
+"""
+
+import json
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from database import Message as DBMessage
+from database import get_db
+from main import app
+from routes.auth import User, get_current_user
+from utils.context_builder import context_builder
+from utils.history_cache import history_cache
+from utils.search_gate import SearchGate
+
+
+def chunk(text):
+    """OpenAI stream chunk with one content delta"""
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+async def failing_stream():
+    """Stream that breaks after the first delta"""
+    yield chunk("Начало ответа")
+    raise RuntimeError("connection reset by peer")
+
+
+def parse_events(body):
+    """Split an SSE body into (event, data) pairs"""
+    events = []
+    for block in body.replace("\r\n", "\n").strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n") if ": " in line)
+        events.append((fields.get("event"), json.loads(fields["data"])))
+    return events
+
+
+@pytest.fixture
+def session_factory():
+    """In-memory database shared between the request and the stream"""
+    history_cache.clear()
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def stream_client(client, session_factory):
+    """Test client with a fake user, the in-memory database and no web search"""
+
+    def override_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[get_current_user] = lambda: User(
+        id=1, username="user", email="user@example.com", created_at=datetime.now()
+    )
+    with patch("routes.chat.SessionLocal", session_factory), \
+            patch("routes.chat.search_gate", SearchGate(threshold=2.0)), \
+            patch.object(context_builder, "refresh_summary", AsyncMock()):
+        yield client
+    app.dependency_overrides.clear()
+
+
+class TestChatStreamErrors:
+    """Test cases for upstream failures in /api/chat/stream"""
+
+    def test_openai_failure_mid_stream(self, stream_client, session_factory):
+        """A mid-stream failure becomes an error event, the stream still ends with done"""
+        openai_client = MagicMock()
+        openai_client.chat.completions.create = AsyncMock(return_value=failing_stream())
+
+        with patch("utils.openai_client.async_openai_client", openai_client), \
+                patch("routes.chat.search_gate.record_outcome") as record_outcome:
+            response = stream_client.post(
+                "/api/chat/stream", json={"message": "Напиши стихотворение", "model": "gpt-4o-mini"}
+            )
+
+        assert response.status_code == 200
+        events = parse_events(response.text)
+        assert [event for event, _ in events] == ["start", "delta", "error", "done"]
+        assert events[1][1]["content"] == "Начало ответа"
+        assert "connection reset" in events[2][1]["message"]
+        assert events[3][1]["error"] == events[2][1]["message"]
+
+        # Neither the partial answer nor the error text is stored or scored
+        db = session_factory()
+        roles = [message.role for message in db.query(DBMessage).all()]
+        db.close()
+        assert roles == ["user"]
+        record_outcome.assert_not_called()
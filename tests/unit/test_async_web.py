@@ -0,0 +1,160 @@
+"""
+Unit tests for the asyncio-native web retrieval API
+"""
+
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from utils.async_web import AsyncWebRetriever
+from utils.http_transport import HTTPTransport
+from utils.polite_fetch import AsyncHostLimiter
+from utils.web_parser import web_parser
+
+DUCKDUCKGO_HTML = """
+<div class="result">
+  <a class="result__a" href="https://example.com/python">Python</a>
+  <a class="result__snippet">Python is a programming language</a>
+</div>
+<div class="result">
+  <a class="result__a" href="https://example.com/python">Python duplicate</a>
+</div>
+"""
+
+PAGE_HTML = "<html><body><script>var x;</script><p>Hello   world</p></body></html>"
+
+CBR_JSON = {
+    "Valute": {
+        "USD": {"Name": "Доллар США", "Value": 90.5, "Previous": 90.0},
+    }
+}
+
+
+def make_retriever(handler):
+    """Create retriever whose requests are served by a mock transport"""
+    return AsyncWebRetriever(transport=HTTPTransport(transport=httpx.MockTransport(handler)))
+
+
+class TestAsyncWebRetriever:
+    """Test cases for AsyncWebRetriever"""
+
+    @pytest.mark.asyncio
+    async def test_search_web_fetches_pages(self):
+        """Search results are deduplicated and enriched with page text"""
+
+        def handler(request):
+            if request.url.host == "html.duckduckgo.com":
+                return httpx.Response(200, text=DUCKDUCKGO_HTML)
+            return httpx.Response(200, text=PAGE_HTML)
+
+        retriever = make_retriever(handler)
+        # The snippet does not cover the query, so the page is fetched
+        results = await retriever.search_web("python tutorial", num_results=3)
+        await retriever.aclose()
+
+        assert len(results) == 1
+        assert results[0]["url"] == "https://example.com/python"
+        assert results[0]["description"] == "Python is a programming language"
+        assert results[0]["content"] == "Hello world"
+
+    @pytest.mark.asyncio
+    async def test_only_result_pages_are_rate_limited(self):
+        """Engine queries bypass the per-host limiter, result pages go through it"""
+
+        def handler(request):
+            if request.url.host == "html.duckduckgo.com":
+                return httpx.Response(200, text=DUCKDUCKGO_HTML)
+            return httpx.Response(200, text=PAGE_HTML)
+
+        limiter = AsyncHostLimiter(min_interval=0)
+        retriever = make_retriever(handler)
+        with patch("utils.polite_fetch.async_host_limiter", limiter):
+            await retriever.search_web("python tutorial", num_results=3)
+        await retriever.aclose()
+
+        assert list(limiter.stats.get_stats()) == ["example.com"]
+
+    @pytest.mark.asyncio
+    async def test_search_web_answers_from_snippets(self):
+        """Pages are not fetched when the snippets already cover the query"""
+        requested = []
+
+        def handler(request):
+            requested.append(request.url.host)
+            if request.url.host == "html.duckduckgo.com":
+                return httpx.Response(200, text=DUCKDUCKGO_HTML)
+            return httpx.Response(200, text=PAGE_HTML)
+
+        retriever = make_retriever(handler)
+        results = await retriever.search_web("python programming language", num_results=3)
+        await retriever.aclose()
+
+        assert requested == ["html.duckduckgo.com"]
+        assert results[0]["description"] == "Python is a programming language"
+        assert results[0]["content"] == ""
+
+    @pytest.mark.asyncio
+    async def test_search_links_falls_back_to_next_engine(self):
+        """Failed engines are skipped"""
+
+        def handler(request):
+            if request.url.host == "html.duckduckgo.com":
+                return httpx.Response(503)
+            if request.url.host == "www.bing.com":
+                return httpx.Response(
+                    200,
+                    text='<li class="b_algo"><h2>Bing</h2><a href="https://b.example">x</a><p>d</p></li>',
+                )
+            return httpx.Response(404)
+
+        retriever = make_retriever(handler)
+        results = await retriever.search_links("python", num_results=3)
+        await retriever.aclose()
+
+        assert [r["url"] for r in results] == ["https://b.example"]
+
+    @pytest.mark.asyncio
+    async def test_exchange_rates_are_parsed(self):
+        """Exchange rates use the shared CBR parser"""
+
+        def handler(request):
+            return httpx.Response(200, json=CBR_JSON)
+
+        retriever = make_retriever(handler)
+        result = await retriever.get_comprehensive_web_info("курс доллара")
+        await retriever.aclose()
+
+        assert result["exchange_rates"]["USD"]["change"] == 0.5
+
+    @pytest.mark.asyncio
+    async def test_fetch_text_returns_none_on_error(self):
+        """Network errors do not propagate"""
+
+        def handler(request):
+            raise httpx.ConnectError("boom")
+
+        retriever = make_retriever(handler)
+        assert await retriever.fetch_text("https://example.com") is None
+        await retriever.aclose()
+
+    @pytest.mark.asyncio
+    async def test_stale_page_is_revalidated(self):
+        """A 304 answer refreshes the cached page without downloading it again"""
+        url = "https://news.example/"
+        seen = []
+
+        def handler(request):
+            seen.append(request.headers.get("If-None-Match"))
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, text="<p>news</p>", headers={"ETag": '"v1"'})
+
+        retriever = make_retriever(handler)
+        assert await retriever._get_cached_page(url) == "<p>news</p>"
+        web_parser.cache.refresh(url, ttl=0)
+        assert await retriever._get_cached_page(url) == "<p>news</p>"
+        await retriever.aclose()
+        web_parser.cache.pop(url)
+
+        assert seen == [None, '"v1"']
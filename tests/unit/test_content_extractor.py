@@ -0,0 +1,102 @@
+"""
+Unit tests for the single-pass main content extractor
+"""
+
+import os
+
+from utils.content_extractor import extract_main_text, make_soup
+
+CORPUS = os.path.join(os.path.dirname(__file__), "..", "..", "benchmarks", "corpus")
+
+ARTICLE = "Первый абзац статьи о поиске, достаточно длинный для оценки, с запятыми и точкой."
+
+PAGE = f"""
+<html><head><title>t</title><script>var x = 1;</script><style>p {{}}</style></head>
+<body>
+<header><a href="/">Логотип</a></header>
+<nav><a href="/a">Раздел А</a> <a href="/b">Раздел Б</a></nav>
+<div class="layout">
+  <div class="post-content">
+    <p>{ARTICLE}</p>
+    <p>Второй абзац, в котором тоже много текста, запятых и слов про поиск.</p>
+    <div class="ad-banner">Купите слона</div>
+    <p>Третий абзац завершает статью, подводя итоги и перечисляя выводы.</p>
+  </div>
+  <div class="sidebar"><ul><li><a href="/x">Популярная ссылка с длинным названием номер один</a></li></ul></div>
+</div>
+<footer>Все права защищены</footer>
+</body></html>
+"""
+
+
+class TestExtractMainText:
+    """Test cases for extract_main_text"""
+
+    def test_keeps_article_and_drops_boilerplate(self):
+        """Article paragraphs are kept; menus, ads, scripts and footers are dropped"""
+        text = extract_main_text(PAGE)
+
+        assert ARTICLE in text
+        assert "Третий абзац" in text
+        for noise in ("Логотип", "Раздел А", "Купите слона", "Популярная ссылка", "Все права", "var x"):
+            assert noise not in text
+
+    def test_separator_and_limit(self):
+        """Lines are joined with the separator and the result is truncated"""
+        text = extract_main_text(PAGE, separator=" ")
+        assert "\n" not in text
+
+        assert len(extract_main_text(PAGE, max_chars=40)) == 40
+
+    def test_repeated_blocks_use_common_ancestor(self):
+        """Text split across many similar blocks is collected from their common parent"""
+        posts = "".join(
+            f'<div class="item"><div class="item-text"><p>Сообщение номер {i}, в котором обсуждают выбор сервера, цены и тарифы.</p></div></div>'
+            for i in range(5)
+        )
+        text = extract_main_text(f"<html><body><div id='thread'>{posts}</div></body></html>")
+
+        for i in range(5):
+            assert f"Сообщение номер {i}" in text
+
+    def test_page_without_paragraphs_falls_back_to_body(self):
+        """Pages without scored paragraphs return the visible body text"""
+        text = extract_main_text("<html><body><div>Короткий текст</div><nav>Меню</nav></body></html>")
+
+        assert text == "Короткий текст"
+
+    def test_headline_is_kept(self):
+        """The h1 headline survives when the densest block is the article body"""
+        with open(os.path.join(CORPUS, "news_article.html"), encoding="utf-8") as f:
+            text = extract_main_text(f.read())
+
+        assert text.startswith("Правительство обсудило развитие цифровой экономики\n")
+        for noise in ("Раздел 1", "Читайте также", "Комментарии"):
+            assert noise not in text
+
+    def test_product_keeps_name_price_and_specs(self):
+        """A product card is extracted whole, not just its description"""
+        with open(os.path.join(CORPUS, "product_page.html"), encoding="utf-8") as f:
+            text = extract_main_text(f.read())
+
+        assert text.startswith("Ноутбук Модель X 15 дюймов")
+        assert "89 990 ₽" in text
+        assert "30 ед." in text
+
+    def test_title_is_used_without_h1(self):
+        """Pages without h1 start with the document title"""
+        html = f"<html><head><title>Заголовок страницы</title></head><body><div><p>{ARTICLE}</p></div></body></html>"
+
+        assert extract_main_text(html).split("\n")[0] == "Заголовок страницы"
+
+    def test_empty_document(self):
+        """Empty input yields an empty string"""
+        assert extract_main_text("") == ""
+        assert extract_main_text("   ") == ""
+
+
+def test_make_soup_supports_selectors():
+    """make_soup returns a BeautifulSoup tree usable with CSS selectors"""
+    soup = make_soup('<div class="result"><a class="link" href="/x">X</a></div>')
+
+    assert soup.select_one("div.result a.link")["href"] == "/x"
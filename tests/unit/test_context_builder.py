@@ -0,0 +1,196 @@
+"""
+Unit tests for the token-budgeted conversation context builder
+"""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from database import Conversation as DBConversation
+from database import Message as DBMessage
+from utils.context_builder import ContextBuilder
+from utils.history_cache import history_cache
+from utils.tokens import TokenCounter
+
+
+@pytest.fixture
+def session_factory():
+    """In-memory database shared between sessions"""
+    # Каждый тест создает свою базу с теми же id бесед
+    history_cache.clear()
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def add_messages(db, conversation_id, count):
+    """Add alternating user/assistant messages"""
+    for i in range(count):
+        db.add(
+            DBMessage(
+                role="user" if i % 2 == 0 else "assistant",
+                content=f"message {i}",
+                conversation_id=conversation_id,
+            )
+        )
+    db.commit()
+
+
+class TestTokenCounter:
+    """Test cases for TokenCounter"""
+
+    def test_counts_are_cached(self):
+        """Repeated texts are served from the cache"""
+        counter = TokenCounter(max_entries=2)
+
+        first = counter.count("привет мир")
+        assert counter.count("привет мир") == first
+        assert list(counter._cache) == ["привет мир"]
+
+    def test_cache_is_bounded(self):
+        """Oldest entries are evicted"""
+        counter = TokenCounter(max_entries=2)
+        for text in ("a", "b", "c"):
+            counter.count(text)
+
+        assert list(counter._cache) == ["b", "c"]
+
+
+class TestContextBuilder:
+    """Test cases for ContextBuilder"""
+
+    def test_first_exchange(self, session_factory):
+        """A single user message is the first exchange"""
+        db = session_factory()
+        conversation = DBConversation(title="t", user_id=1)
+        db.add(conversation)
+        db.commit()
+        add_messages(db, conversation.id, 1)
+
+        context = ContextBuilder().build(db, conversation, "system")
+
+        assert context.is_first_exchange
+        assert context.messages == [
+            {"role": "system", "content": "system"},
+            {"role": "user", "content": "message 0"},
+        ]
+
+    def test_budget_keeps_most_recent(self, session_factory):
+        """Older messages are dropped when the budget is exceeded"""
+        db = session_factory()
+        conversation = DBConversation(title="t", user_id=1)
+        db.add(conversation)
+        db.commit()
+        add_messages(db, conversation.id, 10)
+
+        builder = ContextBuilder(keep_recent=2)
+        per_message = builder.token_counter.count_message({"content": "message 9"})
+        system = builder.token_counter.count_message({"content": "system"})
+        context = builder.build(db, conversation, "system", token_budget=system + 3 * per_message)
+
+        assert [m["content"] for m in context.messages[1:]] == [
+            "message 7",
+            "message 8",
+            "message 9",
+        ]
+        assert not context.is_first_exchange
+
+    @pytest.mark.asyncio
+    async def test_large_system_prompt_keeps_recent_and_summarizes_rest(self, session_factory):
+        """Recent turns survive a system prompt that eats the budget; the cut ones are summarized"""
+        db = session_factory()
+        conversation = DBConversation(title="t", user_id=1)
+        db.add(conversation)
+        db.commit()
+        add_messages(db, conversation.id, 5)
+        conversation_id = conversation.id
+
+        builder = ContextBuilder(keep_recent=2, summary_batch=6)
+        system_content = "веб-контекст " * 500
+        context = builder.build(
+            db, conversation, system_content,
+            token_budget=builder.token_counter.count(system_content) + 10,
+        )
+        db.close()
+
+        assert [m["content"] for m in context.messages[1:]] == ["message 3", "message 4"]
+
+        # Only 3 older messages, below summary_batch, but they were cut by the budget
+        with patch("utils.context_builder.SessionLocal", session_factory), patch(
+            "utils.context_builder.generate_raw_response",
+            AsyncMock(return_value="Резюме"),
+        ) as mock_llm:
+            await builder.refresh_summary(conversation_id, "gpt-4o-mini")
+
+        prompt = mock_llm.call_args[0][0][0]["content"]
+        assert "message 0" in prompt and "message 2" in prompt and "message 3" not in prompt
+        db = session_factory()
+        assert db.get(DBConversation, conversation_id).summary_until_message_id == 3
+
+    def test_summary_replaces_old_messages(self, session_factory):
+        """Summarized messages are replaced by the stored summary"""
+        db = session_factory()
+        conversation = DBConversation(title="t", user_id=1)
+        db.add(conversation)
+        db.commit()
+        add_messages(db, conversation.id, 4)
+        conversation.summary = "Резюме"
+        conversation.summary_until_message_id = 2
+        db.commit()
+
+        context = ContextBuilder().build(db, conversation, "system")
+
+        assert context.messages[1]["content"].endswith("Резюме")
+        assert [m["content"] for m in context.messages[2:]] == ["message 2", "message 3"]
+
+    @pytest.mark.asyncio
+    async def test_refresh_summary_is_incremental(self, session_factory):
+        """Messages outside the recent window are folded into the summary"""
+        db = session_factory()
+        conversation = DBConversation(title="t", user_id=1)
+        db.add(conversation)
+        db.commit()
+        add_messages(db, conversation.id, 6)
+        conversation_id = conversation.id
+        db.close()
+
+        builder = ContextBuilder(keep_recent=2, summary_batch=3)
+        with patch("utils.context_builder.SessionLocal", session_factory), patch(
+            "utils.context_builder.generate_raw_response",
+            AsyncMock(return_value="Новое резюме"),
+        ) as mock_llm:
+            await builder.refresh_summary(conversation_id, "gpt-4o-mini")
+
+        db = session_factory()
+        conversation = db.get(DBConversation, conversation_id)
+        assert conversation.summary == "Новое резюме"
+        assert conversation.summary_until_message_id == 4
+        prompt = mock_llm.call_args[0][0][0]["content"]
+        assert "message 3" in prompt and "message 4" not in prompt
+
+    @pytest.mark.asyncio
+    async def test_refresh_summary_skips_small_backlog(self, session_factory):
+        """No LLM call until enough old messages accumulate"""
+        db = session_factory()
+        conversation = DBConversation(title="t", user_id=1)
+        db.add(conversation)
+        db.commit()
+        add_messages(db, conversation.id, 3)
+        conversation_id = conversation.id
+        db.close()
+
+        builder = ContextBuilder(keep_recent=2, summary_batch=3)
+        with patch("utils.context_builder.SessionLocal", session_factory), patch(
+            "utils.context_builder.generate_raw_response", AsyncMock()
+        ) as mock_llm:
+            await builder.refresh_summary(conversation_id, "gpt-4o-mini")
+
+        mock_llm.assert_not_called()
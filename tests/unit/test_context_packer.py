@@ -0,0 +1,114 @@
+"""
+Unit tests for the token-budgeted web context packer
+"""
+
+from utils.tokens import TokenCounter
+from utils.context_packer import Candidate, ContextPacker, collect_candidates
+
+QUERY = "курс биткоина сегодня"
+
+PRICE = "Курс биткоина сегодня составляет 64 000 долларов по данным крупнейших бирж мира."
+PRICE_COPY = "Курс биткоина сегодня составляет 64 000 долларов по данным крупнейших бирж мира!"
+FORECAST = "Аналитики ожидают, что курс биткоина сегодня вечером может вырасти на фоне новостей."
+WEATHER = "Погода в Москве будет солнечной, температура поднимется до двадцати градусов тепла."
+
+
+def make_packer(budget=1500):
+    return ContextPacker(token_counter=TokenCounter(), token_budget=budget, mmr_lambda=0.5)
+
+
+class TestSelect:
+    """Test cases for MMR selection under a token budget"""
+
+    def test_budget_is_respected(self):
+        """Selected passages never exceed the token budget"""
+        counter = TokenCounter()
+        candidates = [Candidate(f"https://site{i}.ru", "", f"{PRICE} Пункт {i}.") for i in range(20)]
+        budget = counter.count(PRICE) * 3
+        chosen = make_packer(budget).select(QUERY, candidates)
+        assert chosen
+        assert sum(counter.count(candidate.text) for candidate in chosen) <= budget
+
+    def test_redundant_passage_loses_to_different_one(self):
+        """A near copy of a chosen passage is ranked below a different relevant one"""
+        candidates = [
+            Candidate("https://a.ru", "", PRICE),
+            Candidate("https://b.ru", "", PRICE_COPY),
+            Candidate("https://c.ru", "", FORECAST),
+        ]
+        chosen = make_packer().select(QUERY, candidates)
+        assert {candidate.url for candidate in chosen[:2]} == {"https://a.ru", "https://c.ru"}
+
+    def test_irrelevant_passages_are_skipped(self):
+        """Passages without query terms are dropped when others match"""
+        candidates = [Candidate("https://a.ru", "", PRICE), Candidate("https://w.ru", "", WEATHER)]
+        chosen = make_packer().select(QUERY, candidates)
+        assert [candidate.url for candidate in chosen] == ["https://a.ru"]
+
+    def test_identical_texts_counted_once(self):
+        """The same text from two tiers appears once"""
+        candidates = [Candidate("https://a.ru", "", PRICE), Candidate("https://a.ru", "Биткоин", PRICE)]
+        assert len(make_packer().select(QUERY, candidates)) == 1
+
+
+class TestPack:
+    """Test cases for rendering the packed context"""
+
+    def test_citations_and_sources(self):
+        """Passages carry source numbers and sources are listed with URLs"""
+        results = [[
+            {"url": "https://a.ru", "title": "Биржа", "description": PRICE, "content": ""},
+            {"url": "https://c.ru", "title": "", "description": FORECAST, "content": ""},
+        ]]
+        packed = make_packer().pack(QUERY, results)
+        lines = packed.splitlines()
+        assert "Источники:" in lines
+        price = next(line for line in lines if line.endswith(" Биржа — https://a.ru"))[:3]
+        forecast = next(line for line in lines if line.endswith(" https://c.ru"))[:3]
+        assert {price, forecast} == {"[1]", "[2]"}
+        assert f"{price} {PRICE}" in lines
+        assert f"{forecast} {FORECAST}" in lines
+
+    def test_empty_results(self):
+        """Nothing to pack yields an empty string"""
+        assert make_packer().pack(QUERY, [[], {"error": "timeout"}]) == ""
+
+
+class TestCollectCandidates:
+    """Test cases for reading results of every search tier"""
+
+    def test_all_tier_shapes(self):
+        """Advanced, universal, plain and DuckDuckGo results are all collected"""
+        results = [
+            {
+                "search_type": "advanced_search",
+                "results": [
+                    {"url": "https://adv.ru", "content": WEATHER, "passages": [{"text": PRICE}]},
+                    {"url": "https://adv2.ru", "content": FORECAST},
+                ],
+            },
+            {
+                "search_type": "universal_search",
+                "search_results": {"results": [{
+                    "url": "https://uni.ru", "title": "Уни", "snippet": PRICE_COPY,
+                    "parsed_content": {"text_content": WEATHER},
+                }]},
+            },
+            [{"url": "https://plain.ru", "title": "Обычный", "description": FORECAST, "content": PRICE}],
+            {"results": [{"url": "https://ddg.ru", "title": "DDG", "snippet": WEATHER}]},
+            {"error": "failed"},
+        ]
+        found = {(candidate.url, candidate.text) for candidate in collect_candidates(results)}
+        assert found == {
+            ("https://adv.ru", PRICE),
+            ("https://adv2.ru", FORECAST),
+            ("https://uni.ru", PRICE_COPY),
+            ("https://uni.ru", WEATHER),
+            ("https://plain.ru", FORECAST),
+            ("https://plain.ru", PRICE),
+            ("https://ddg.ru", WEATHER),
+        }
+
+    def test_short_fragments_are_ignored(self):
+        """Menu crumbs shorter than the minimum are not candidates"""
+        assert collect_candidates([[{"url": "https://a.ru", "description": "Главная"}]]) == []
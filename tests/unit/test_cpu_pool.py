@@ -0,0 +1,74 @@
+"""
+Unit tests for the CPU-bound task process pool
+"""
+
+import asyncio
+
+import pytest
+
+from utils.content_extractor import extract_main_text
+from utils.cpu_pool import CPUPool
+from utils.web_search import extract_page_text
+
+PAGE = (
+    "<html><body><nav>Меню сайта</nav><article>"
+    + "<p>Абзац статьи о поиске, с запятыми, достаточно длинный для оценки.</p>" * 20
+    + "</article></body></html>"
+)
+
+
+@pytest.fixture
+def pool():
+    pool = CPUPool(workers=1, min_input_chars=1000)
+    yield pool
+    pool.shutdown()
+
+
+class TestCPUPool:
+    """Test cases for CPUPool"""
+
+    def test_small_input_runs_inline(self, pool):
+        """Inputs below the threshold never start worker processes"""
+        assert pool.run(extract_main_text, "<p>Коротко</p>", size=14) == "Коротко"
+
+        stats = pool.get_stats()
+        assert stats["inline"] == 1
+        assert stats["offloaded"] == 0
+        assert stats["running"] is False
+
+    def test_large_input_runs_in_worker(self, pool):
+        """Large inputs are processed in a worker with the same result"""
+        expected = extract_page_text(PAGE, 300)
+
+        assert pool.run(extract_page_text, PAGE, 300, size=len(PAGE)) == expected
+        assert pool.get_stats()["offloaded"] == 1
+
+    def test_async_run_in_worker(self, pool):
+        """arun awaits worker results without blocking the event loop"""
+        text = asyncio.run(pool.arun(extract_main_text, PAGE, max_chars=50, size=len(PAGE)))
+
+        assert text == extract_main_text(PAGE, max_chars=50)
+        assert pool.get_stats()["offloaded"] == 1
+
+    def test_task_errors_propagate(self, pool):
+        """Exceptions raised by the task reach the caller"""
+        with pytest.raises(TypeError):
+            pool.run(extract_page_text, PAGE, "300", size=len(PAGE))
+        assert pool.get_stats()["fallbacks"] == 0
+
+    def test_stopped_pool_falls_back_inline(self, pool):
+        """Tasks run in-process when the worker pool is no longer usable"""
+        pool._get_executor().shutdown()
+
+        assert pool.run(extract_page_text, PAGE, 100, size=len(PAGE)) == extract_page_text(PAGE, 100)
+        assert pool.get_stats()["fallbacks"] == 1
+        # The broken pool is replaced on the next offloaded task
+        assert pool.run(extract_page_text, PAGE, 100, size=len(PAGE)) == extract_page_text(PAGE, 100)
+        assert pool.get_stats()["offloaded"] == 1
+
+    def test_disabled_pool(self):
+        """Zero workers keeps every task in-process"""
+        pool = CPUPool(workers=0, min_input_chars=0)
+
+        assert pool.run(extract_page_text, PAGE, 100, size=len(PAGE)) == extract_page_text(PAGE, 100)
+        assert pool.get_stats()["inline"] == 1
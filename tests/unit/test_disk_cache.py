@@ -0,0 +1,85 @@
+"""
+Unit tests for the indexed on-disk cache
+"""
+
+import time
+
+import pytest
+
+from utils.disk_cache import DiskCache
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    """Path to a fresh cache database"""
+    return str(tmp_path / "web_cache.sqlite3")
+
+
+class TestDiskCache:
+    """Test cases for DiskCache"""
+
+    def test_roundtrip_and_counters(self, cache_path):
+        """Stored text is returned unchanged and lookups are counted"""
+        cache = DiskCache(path=cache_path)
+        cache.set("https://a.example/", "Текст страницы" * 100)
+
+        assert cache.get("https://a.example/") == "Текст страницы" * 100
+        assert cache.get("https://b.example/") is None
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+        assert stats["bytes"] < len("Текст страницы" * 100)
+
+    def test_expired_entries_are_swept(self, cache_path):
+        """Sweeps drop entries whose TTL has passed"""
+        cache = DiskCache(path=cache_path)
+        cache.set("old", "value", ttl=0.01)
+        cache.set("new", "value")
+        time.sleep(0.02)
+
+        assert cache.sweep() == 1
+        assert cache.get("old") is None
+        assert cache.get("new") == "value"
+
+    def test_quota_evicts_least_recently_used(self, cache_path):
+        """The total size stays under quota by dropping the oldest-accessed entries"""
+        cache = DiskCache(path=cache_path, max_bytes=30)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        time.sleep(0.01)
+        cache.get("a")
+        cache.set("c", "3")
+        cache.set("d", "4")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+        stats = cache.get_stats()
+        assert stats["evictions"] >= 1
+        assert stats["bytes"] <= 30
+
+    def test_state_survives_reopen(self, cache_path):
+        """Entries and their total size are reloaded from disk"""
+        cache = DiskCache(path=cache_path)
+        cache.set("a", "value")
+        size = cache.get_stats()["bytes"]
+        cache.close()
+
+        reopened = DiskCache(path=cache_path)
+        assert reopened.get("a") == "value"
+        assert reopened.get_stats()["bytes"] == size
+
+    def test_stale_entry_is_revalidated(self, cache_path):
+        """Entries with validators outlive their TTL until refreshed or swept"""
+        cache = DiskCache(path=cache_path, stale_ttl=60)
+        cache.set("page", "text", ttl=0, validators={"ETag": '"v1"'})
+
+        assert cache.sweep() == 0
+        stale = cache.lookup("page")
+        assert stale.value == "text"
+        assert stale.validators == {"ETag": '"v1"'}
+        assert not stale.fresh
+
+        cache.refresh("page")
+        assert cache.get("page") == "text"
+        assert cache.get_stats()["revalidations"] == 1
@@ -0,0 +1,93 @@
+"""
+Unit tests for hedged fan-out across engines and tiers
+"""
+
+import asyncio
+
+import pytest
+
+from utils.hedged_retrieval import hedged_first
+
+
+def attempt(value, delay=0.0, log=None, name=None):
+    """Attempt returning value after delay and recording cancellation"""
+
+    async def run():
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            if log is not None:
+                log.append(name)
+            raise
+        return value
+
+    return run
+
+
+def non_empty(name, value):
+    return bool(value)
+
+
+class TestHedgedFirst:
+    """Test cases for hedged_first"""
+
+    @pytest.mark.asyncio
+    async def test_fast_primary_does_not_launch_hedges(self):
+        """A quick first answer wins before any hedge starts"""
+        result = await hedged_first(
+            "test",
+            [("a", attempt(["a"])), ("b", attempt(["b"]))],
+            non_empty,
+            hedge_delay=0.5,
+        )
+
+        assert result.winner == "a"
+        assert result.launched == ["a"]
+
+    @pytest.mark.asyncio
+    async def test_slow_primary_is_hedged_and_cancelled(self):
+        """A slow attempt is overtaken by the hedge and then cancelled"""
+        cancelled = []
+        result = await hedged_first(
+            "test",
+            [("slow", attempt(["slow"], 1.0, cancelled, "slow")), ("fast", attempt(["fast"]))],
+            non_empty,
+            hedge_delay=0.02,
+        )
+
+        assert result.winner == "fast"
+        await asyncio.sleep(0)
+        assert cancelled == ["slow"]
+
+    @pytest.mark.asyncio
+    async def test_failure_launches_next_immediately(self):
+        """Empty or failing attempts do not wait for the hedge delay"""
+
+        async def boom():
+            raise RuntimeError("blocked")
+
+        result = await hedged_first(
+            "test",
+            [("a", boom), ("b", attempt([])), ("c", attempt(["c"]))],
+            non_empty,
+            hedge_delay=10.0,
+        )
+
+        assert result.winner == "c"
+        assert result.results["b"] == []
+        assert result.elapsed < 1.0
+
+    @pytest.mark.asyncio
+    async def test_budget_bounds_total_time(self):
+        """Nothing acceptable within the budget returns without a winner"""
+        result = await hedged_first(
+            "test",
+            [("a", attempt(["a"], 1.0)), ("b", attempt(["b"], 1.0))],
+            non_empty,
+            hedge_delay=0.01,
+            budget=0.05,
+        )
+
+        assert result.winner is None
+        assert result.timed_out
+        assert result.launched == ["a", "b"]
@@ -0,0 +1,111 @@
+"""
+Unit tests for the conversation history cache
+"""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from database import Conversation as DBConversation
+from database import Message as DBMessage
+from utils.history_cache import ConversationHistoryCache
+
+
+@pytest.fixture
+def db():
+    """In-memory database session"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def add_message(db, conversation_id, role, content):
+    message = DBMessage(role=role, content=content, conversation_id=conversation_id)
+    db.add(message)
+    db.commit()
+    return message
+
+
+def new_conversation(db):
+    conversation = DBConversation(title="t", user_id=1)
+    db.add(conversation)
+    db.commit()
+    return conversation.id
+
+
+class TestConversationHistoryCache:
+    """Test cases for ConversationHistoryCache"""
+
+    def test_miss_then_hit(self, db):
+        """The database is read once, then served from memory"""
+        cache = ConversationHistoryCache()
+        conversation_id = new_conversation(db)
+        add_message(db, conversation_id, "user", "hello")
+
+        first = cache.get(db, conversation_id)
+        second = cache.get(db, conversation_id)
+
+        assert first == second == [(1, "user", "hello")]
+        assert cache.get_stats()["misses"] == 1
+        assert cache.get_stats()["hits"] == 1
+
+    def test_write_through_append(self, db):
+        """Appended messages are visible without reloading"""
+        cache = ConversationHistoryCache()
+        conversation_id = new_conversation(db)
+        add_message(db, conversation_id, "user", "hello")
+        cache.get(db, conversation_id)
+
+        reply = add_message(db, conversation_id, "assistant", "hi")
+        cache.append_message(reply)
+
+        assert [row[2] for row in cache.get(db, conversation_id)] == ["hello", "hi"]
+        assert cache.get_stats()["misses"] == 1
+
+    def test_append_to_uncached_conversation_is_ignored(self, db):
+        """Appends for uncached conversations do not create partial entries"""
+        cache = ConversationHistoryCache()
+        conversation_id = new_conversation(db)
+        message = add_message(db, conversation_id, "user", "hello")
+
+        cache.append_message(message)
+
+        assert cache.get_stats()["conversations"] == 0
+        assert cache.get(db, conversation_id) == [(message.id, "user", "hello")]
+
+    def test_lru_eviction_by_bytes(self, db):
+        """Least recently used conversations are evicted over the byte cap"""
+        first_id = new_conversation(db)
+        second_id = new_conversation(db)
+        add_message(db, first_id, "user", "x" * 100)
+        add_message(db, second_id, "user", "y" * 100)
+        cache = ConversationHistoryCache(max_bytes=300)
+
+        cache.get(db, first_id)
+        cache.get(db, second_id)
+
+        stats = cache.get_stats()
+        assert stats["conversations"] == 1
+        assert stats["evictions"] == 1
+        assert stats["bytes"] <= 300
+
+    def test_invalidate(self, db):
+        """Invalidated conversations are reloaded from the database"""
+        cache = ConversationHistoryCache()
+        conversation_id = new_conversation(db)
+        add_message(db, conversation_id, "user", "hello")
+        cache.get(db, conversation_id)
+
+        cache.invalidate(conversation_id)
+
+        assert cache.get_stats()["bytes"] == 0
+        cache.get(db, conversation_id)
+        assert cache.get_stats()["misses"] == 2
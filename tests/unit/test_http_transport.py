@@ -0,0 +1,198 @@
+"""
+Unit tests for the shared pooled HTTP transport
+"""
+
+import asyncio
+import warnings
+
+import httpx
+import pytest
+
+from utils.http_transport import (DEFAULT_HEADERS, ConnectionStats,
+                                  ContentTypeError, HTTPTransport, TextBudget,
+                                  detect_encoding)
+
+
+def make_transport(handler, **kwargs):
+    """Create transport whose requests are served by a mock transport"""
+    return HTTPTransport(transport=httpx.MockTransport(handler), **kwargs)
+
+
+class TestHTTPSession:
+    """Test cases for the synchronous facade"""
+
+    def test_session_sends_default_and_own_headers(self):
+        """Sessions share one User-Agent and may add their own headers"""
+        seen = {}
+
+        def handler(request):
+            seen.update(request.headers)
+            return httpx.Response(200, text="ok")
+
+        transport = make_transport(handler)
+        session = transport.session({"X-Test": "1"})
+        response = session.get("https://a.example/")
+
+        assert response.text == "ok"
+        assert seen["user-agent"] == DEFAULT_HEADERS["User-Agent"]
+        assert seen["x-test"] == "1"
+        assert transport.stats.get_stats()["a.example"]["requests"] == 1
+
+    def test_errors_are_counted(self):
+        """Transport errors are recorded per host and re-raised"""
+
+        def handler(request):
+            raise httpx.ConnectError("refused")
+
+        transport = make_transport(handler)
+        with pytest.raises(httpx.ConnectError):
+            transport.get("https://down.example/")
+
+        assert transport.stats.get_stats()["down.example"]["errors"] == 1
+
+
+    def test_proxy_uses_current_httpx_argument(self, monkeypatch):
+        """The proxy is passed as proxy=, not the deprecated proxies= mapping"""
+        monkeypatch.setenv("PROXY_ENABLED", "true")
+        monkeypatch.setenv("PROXY_HOST", "127.0.0.1")
+        monkeypatch.setenv("PROXY_PORT", "3128")
+        monkeypatch.delenv("PROXY_USERNAME", raising=False)
+        transport = HTTPTransport()
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", DeprecationWarning)
+            client = transport._get_sync_client()
+        transport.close()
+
+        assert transport._client_options()["proxy"] == "http://127.0.0.1:3128"
+        assert client.is_closed
+
+
+class TestStreamingFetch:
+    """Test cases for size-capped streaming fetches"""
+
+    def test_body_is_capped(self):
+        """Reading stops at max_bytes"""
+
+        def handler(request):
+            return httpx.Response(200, html="<p>" + "x" * 10000 + "</p>")
+
+        transport = make_transport(handler)
+        response = transport.get("https://a.example/", max_bytes=1000)
+
+        assert len(response.content) == 1000
+        assert response.extensions["stopped"] == "max_bytes"
+        assert transport.get_stats()["stopped_streams"]["max_bytes"] == 1
+
+    def test_binary_content_is_rejected(self):
+        """Non-text responses are refused before the body is read"""
+
+        def handler(request):
+            return httpx.Response(200, content=b"%PDF", headers={"Content-Type": "application/pdf"})
+
+        transport = make_transport(handler)
+        with pytest.raises(ContentTypeError):
+            transport.get("https://a.example/file.pdf", max_bytes=1000)
+
+    @pytest.mark.asyncio
+    async def test_small_page_is_read_whole(self):
+        """Pages under the cap are returned unchanged"""
+
+        async def handler(request):
+            return httpx.Response(200, html="<p>short</p>")
+
+        transport = make_transport(handler)
+        response = await transport.aget("https://a.example/", max_bytes=1000)
+        await transport.aclose()
+
+        assert response.text == "<p>short</p>"
+        assert response.extensions["stopped"] is None
+
+
+class TestEncodingDetection:
+    """Test cases for pages served without a charset in Content-Type"""
+
+    PAGE = "<html><body><p>Привет, мир! Это страница в кодировке windows-1251 с русским текстом.</p></body></html>"
+
+    @pytest.mark.parametrize("max_bytes", [None, 100_000])
+    def test_cp1251_without_charset(self, max_bytes):
+        """A cp1251 body is decoded correctly when the header has no charset"""
+
+        def handler(request):
+            return httpx.Response(200, content=self.PAGE.encode("cp1251"), headers={"Content-Type": "text/html"})
+
+        transport = make_transport(handler)
+        response = transport.get("https://ru.example/", max_bytes=max_bytes)
+        transport.close()
+
+        assert response.text == self.PAGE
+
+    def test_meta_charset(self):
+        """<meta charset> wins over guessing"""
+        html = '<html><head><meta http-equiv="Content-Type" content="text/html; charset=windows-1251"></head>'
+        assert detect_encoding((html + "<p>Да</p>").encode("cp1251")) == "cp1251"
+
+    def test_header_charset_is_respected(self):
+        """An explicit charset in Content-Type is used as is"""
+
+        def handler(request):
+            return httpx.Response(
+                200, content="Текст".encode("koi8-r"), headers={"Content-Type": "text/html; charset=koi8-r"}
+            )
+
+        transport = make_transport(handler)
+        assert transport.get("https://ru.example/").text == "Текст"
+        transport.close()
+
+
+class TestTextBudget:
+    """Test cases for the visible-text counter"""
+
+    def test_scripts_are_not_counted(self):
+        """Only text outside script and style counts towards the target"""
+        budget = TextBudget(target=10)
+
+        assert not budget(b"<script>var longVariableName = 1;</script><p>short")
+        assert budget(" и ещё немного текста</p>".encode("utf-8"))
+
+
+class TestAsyncTransport:
+    """Test cases for the asyncio API"""
+
+    @pytest.mark.asyncio
+    async def test_per_host_cap(self):
+        """No more than max_connections_per_host requests run against one host"""
+        active = 0
+        peak = 0
+
+        async def handler(request):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return httpx.Response(200)
+
+        transport = make_transport(handler, max_connections_per_host=2)
+        await asyncio.gather(*(transport.aget("https://a.example/") for _ in range(5)))
+        await transport.aclose()
+
+        assert peak == 2
+        assert transport.get_stats()["hosts"]["a.example"]["requests"] == 5
+
+
+class TestConnectionStats:
+    """Test cases for connection reuse statistics"""
+
+    def test_reuse_rate(self):
+        """Requests without a new connection count as reused"""
+        stats = ConnectionStats()
+        stats.record("a.example", True, "HTTP/2")
+        stats.record("a.example", False, "HTTP/2")
+        stats.record("a.example", False, "HTTP/1.1")
+
+        host = stats.get_stats()["a.example"]
+        assert host["new_connections"] == 1
+        assert host["reused_connections"] == 2
+        assert host["reuse_rate"] == 0.667
+        assert host["http2_requests"] == 2
@@ -0,0 +1,72 @@
+"""
+Unit tests for the shared intent classifier
+"""
+
+import pytest
+
+from routes.chat import extract_search_query, should_search_web
+from utils.intent_classifier import IntentClassifier, KeywordMatcher
+from utils.web_parser import web_parser
+
+
+class TestKeywordMatcher:
+    """Test cases for KeywordMatcher"""
+
+    def test_finds_overlapping_keywords(self):
+        """Keywords that overlap or prefix each other are all reported"""
+        matcher = KeywordMatcher({"short": ["крипто"], "long": ["криптовалют"], "other": ["валют"]})
+
+        assert matcher.match("курсы криптовалют") == {"short", "long", "other"}
+
+    def test_no_match(self):
+        """Text without keywords yields no labels"""
+        matcher = KeywordMatcher({"weather": ["погода"]})
+
+        assert matcher.match("рецепт борща") == frozenset()
+
+
+class TestIntentClassifier:
+    """Test cases for IntentClassifier"""
+
+    def test_returns_all_intents_in_one_call(self):
+        """A message can carry several intents at once"""
+        intents = IntentClassifier().classify("Создай сайт с курсом доллара")
+
+        assert {"create_website", "task", "topic_exchange", "query_usd"} <= intents
+
+    def test_result_is_cached_per_normalized_message(self):
+        """Case and surrounding whitespace do not defeat the cache"""
+        classifier = IntentClassifier()
+
+        first = classifier.classify("Погода в Москве")
+        second = classifier.classify("  погода в москве ")
+
+        assert first is second
+
+    @pytest.mark.parametrize("message,expected", [
+        ("привет", False),
+        ("2+2", False),
+        ("как дела у тебя сегодня", False),
+        ("посчитай площадь круга радиусом пять", False),
+        ("какая погода будет завтра в Санкт-Петербурге", True),
+        ("последние новости о технологиях", True),
+    ])
+    def test_chat_should_search_web(self, message, expected):
+        """Chat search gating keeps its exclusions"""
+        assert should_search_web(message) == expected
+
+    @pytest.mark.parametrize("topic,expected", [
+        ("цена bitcoin", "crypto"),
+        ("курс евро", "exchange"),
+        ("свежие новости", "news"),
+        ("погода завтра", "weather"),
+        ("рецепт борща", "search"),
+    ])
+    def test_classify_topic_priority(self, topic, expected):
+        """Parser topics keep their original priority"""
+        assert web_parser.classify_topic(topic) == expected
+
+    def test_extract_search_query_rates(self):
+        """Rate queries are rewritten by currency"""
+        assert extract_search_query("Какой курс евро?") == "курс евро к рублю сегодня"
+        assert extract_search_query("сколько стоит eth") == "курс ethereum к доллару сегодня цена"
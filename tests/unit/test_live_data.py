@@ -0,0 +1,99 @@
+"""
+Unit tests for the stale-while-revalidate live data refresher
+"""
+
+import asyncio
+
+import pytest
+
+from utils.live_data import LiveDataRefresher
+
+
+def make_refresher(values, refresh_interval=60.0, delay=0.0):
+    """Refresher with one dataset served from a list of values"""
+    refresher = LiveDataRefresher(max_stale=3600)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return values[min(len(calls), len(values)) - 1]
+
+    dataset = refresher.register("exchange", fetch, refresh_interval)
+    return refresher, dataset, calls
+
+
+class TestLiveDataRefresher:
+    """Test cases for LiveDataRefresher"""
+
+    @pytest.mark.asyncio
+    async def test_first_request_waits_then_serves_from_memory(self):
+        """Only the cold start waits for the upstream"""
+        refresher, dataset, calls = make_refresher([{"rate": 1}])
+
+        assert await refresher.get("exchange") == {"rate": 1}
+        assert await refresher.get("exchange") == {"rate": 1}
+        assert len(calls) == 1
+        assert dataset.stats["waited"] == 1
+        assert dataset.stats["fresh"] == 1
+
+    @pytest.mark.asyncio
+    async def test_stale_value_is_served_while_refreshing(self):
+        """Stale data is returned immediately and refreshed in the background"""
+        refresher, dataset, calls = make_refresher([{"rate": 1}, {"rate": 2}], delay=0.01)
+        await refresher.get("exchange")
+        dataset.updated_at -= 120
+
+        assert await refresher.get("exchange") == {"rate": 1}
+        assert dataset.stats["stale"] == 1
+
+        await dataset._refreshing
+        assert await refresher.get("exchange") == {"rate": 2}
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_refresh_keeps_previous_value(self):
+        """Upstream errors do not wipe the last good value"""
+        refresher, dataset, _ = make_refresher([{"rate": 1}, {"error": "timeout"}])
+        await refresher.get("exchange")
+        dataset.updated_at -= 120
+
+        await dataset.refresh()
+
+        assert dataset.value == {"rate": 1}
+        assert dataset.stats["failures"] == 1
+        assert dataset.last_error == "timeout"
+
+    @pytest.mark.asyncio
+    async def test_cold_start_error_is_reported(self):
+        """Without any value the error is returned in the usual format"""
+        refresher, _, _ = make_refresher([{"error": "timeout"}])
+
+        assert await refresher.get("exchange") == {"error": "timeout"}
+
+    def test_snapshot_for_sync_callers(self):
+        """Sync code gets fresh values and stores its own fetches"""
+        refresher, dataset, _ = make_refresher([{"rate": 1}])
+        assert refresher.snapshot("exchange") is None
+
+        refresher.store("exchange", {"rate": 3})
+        assert refresher.snapshot("exchange") == {"rate": 3}
+
+        # Stale values are only served while the scheduler is running
+        dataset.updated_at -= 120
+        assert refresher.snapshot("exchange") is None
+
+    @pytest.mark.asyncio
+    async def test_scheduler_warms_datasets(self):
+        """The background loop fills empty datasets"""
+        refresher, dataset, _ = make_refresher([{"rate": 1}])
+
+        refresher.start()
+        for _ in range(10):
+            if dataset.value is not None:
+                break
+            await asyncio.sleep(0.01)
+        await refresher.stop()
+
+        assert dataset.value == {"rate": 1}
+        assert not refresher.running
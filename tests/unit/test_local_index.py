@@ -0,0 +1,98 @@
+"""
+Unit tests for the local full-text index of fetched pages
+"""
+
+import time
+
+import pytest
+
+from utils.advanced_web_search import AdvancedWebSearch
+from utils.disk_cache import DiskCache
+from utils.local_index import LocalIndex, build_match_query
+
+SOLAR = "Солнечные панели в России: эффективность панелей зависит от широты и сезона."
+SOLAR_2 = "Эффективность солнечных панелей зимой падает, но панели окупаются за восемь лет."
+GARDEN = "Садовые растения требуют регулярного полива летом."
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LocalIndex(path=str(tmp_path / "index.sqlite3"), min_pages=2)
+    yield index
+    index.close()
+
+
+class TestLocalIndex:
+    """Test cases for LocalIndex"""
+
+    def test_match_query_uses_stems(self):
+        """Query words become quoted prefix terms joined with AND"""
+        assert build_match_query("эффективность солнечных панелей") == (
+            '"эффективност"* AND "солнечн"* AND "панел"*'
+        )
+        assert build_match_query("и в на") is None
+
+    def test_search_finds_inflected_words(self, index):
+        """Pages containing every query word are found regardless of word forms"""
+        index.add("https://a.ru", SOLAR)
+        index.add("https://b.ru", SOLAR_2)
+        index.add("https://c.ru", GARDEN)
+
+        urls = {url for url, _ in index.search("эффективность солнечной панели")}
+        assert urls == {"https://a.ru", "https://b.ru"}
+
+    def test_reindexing_replaces_text(self, index):
+        """Adding a URL again replaces its previous text"""
+        index.add("https://a.ru", SOLAR)
+        index.add("https://a.ru", GARDEN)
+
+        assert index.search("солнечные панели") == []
+        assert index.search("полив") == [("https://a.ru", GARDEN)]
+
+    def test_lookup_requires_enough_pages(self, index):
+        """lookup answers only when at least min_pages pages match"""
+        index.add("https://a.ru", SOLAR)
+        assert index.lookup("солнечные панели") is None
+
+        index.add("https://b.ru", SOLAR_2)
+        assert len(index.lookup("солнечные панели")) == 2
+        stats = index.get_stats()
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    def test_time_sensitive_queries_need_recent_pages(self, index):
+        """Old pages answer general questions but not time-sensitive ones"""
+        old = time.time() - 3600
+        index.add("https://a.ru", SOLAR, fetched_at=old)
+        index.add("https://b.ru", SOLAR_2, fetched_at=old)
+
+        assert index.lookup("солнечные панели") is not None
+        assert index.lookup("солнечные панели последние новости") is None
+
+        index.touch("https://a.ru")
+        index.touch("https://b.ru")
+        assert index.search("солнечные панели", max_age=60)
+
+    def test_prune_drops_old_and_excess_pages(self, tmp_path):
+        """Pages past max_age and beyond max_pages are removed"""
+        index = LocalIndex(path=str(tmp_path / "index.sqlite3"), max_age=100, max_pages=1)
+        index.add("https://old.ru", SOLAR, fetched_at=time.time() - 1000)
+        index.add("https://a.ru", SOLAR, fetched_at=time.time() - 10)
+        index.add("https://b.ru", SOLAR_2)
+
+        assert index.prune() == 2
+        assert [url for url, _ in index.search("панели")] == ["https://b.ru"]
+
+
+def test_cached_pages_are_indexed_and_searched(tmp_path):
+    """Pages written to the cache are answered from the index without network"""
+    search = AdvancedWebSearch()
+    search.disk_cache = DiskCache(path=str(tmp_path / "cache.sqlite3"))
+    search.local_index = LocalIndex(path=str(tmp_path / "index.sqlite3"), min_pages=2)
+    search.write_cache("https://a.ru", SOLAR)
+    search.write_cache("https://b.ru", SOLAR_2)
+
+    result = search.search_local("эффективность солнечных панелей")
+
+    assert result["source"] == "local_index"
+    assert {r["url"] for r in result["results"]} == {"https://a.ru", "https://b.ru"}
+    assert search.search_local("полив растений") is None
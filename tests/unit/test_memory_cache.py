@@ -0,0 +1,82 @@
+"""
+Unit tests for the bounded LRU+TTL in-memory cache
+"""
+
+import time
+
+from utils.memory_cache import ENTRY_OVERHEAD_BYTES, BoundedCache
+
+
+class TestBoundedCache:
+    """Test cases for BoundedCache"""
+
+    def test_hit_and_miss(self):
+        """Stored values are returned and lookups are counted"""
+        cache = BoundedCache()
+        cache.set("a", "value")
+
+        assert cache.get("a") == "value"
+        assert cache.get("b") is None
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+    def test_entry_expires(self):
+        """Entries are dropped once their own TTL has passed"""
+        cache = BoundedCache(ttl=60)
+        cache.set("short", "value", ttl=0.01)
+        cache.set("long", "value")
+        time.sleep(0.02)
+
+        assert cache.get("short") is None
+        assert cache.get("long") == "value"
+        assert cache.get_stats()["expirations"] == 1
+
+    def test_lru_eviction_keeps_budget(self):
+        """Least recently used entries are evicted to stay within the byte budget"""
+        cache = BoundedCache(max_bytes=3 * (ENTRY_OVERHEAD_BYTES + 100), compress_min_bytes=None)
+        cache.set("a", "x" * 10)
+        cache.set("b", "y" * 10)
+        cache.get("a")
+        cache.set("c", "z" * 10)
+        cache.set("d", "w" * 10)
+
+        assert "b" not in cache
+        assert cache.get("a") == "x" * 10
+        stats = cache.get_stats()
+        assert stats["evictions"] >= 1
+        assert stats["bytes"] <= stats["max_bytes"]
+
+    def test_oversized_value_is_not_cached(self):
+        """A value bigger than the whole budget is skipped"""
+        cache = BoundedCache(max_bytes=ENTRY_OVERHEAD_BYTES + 10, compress_min_bytes=None)
+        cache.set("big", "x" * 1000)
+
+        assert cache.get("big") is None
+        assert cache.get_stats()["bytes"] == 0
+
+    def test_large_values_are_compressed(self):
+        """Large strings are stored compressed and returned unchanged"""
+        html = "<p>Привет, мир</p>" * 1000
+        cache = BoundedCache(compress_min_bytes=1024)
+        cache.set("page", html)
+
+        assert cache.get("page") == html
+        assert cache.get_stats()["bytes"] < len(html)
+
+    def test_stale_entry_with_validators_is_kept(self):
+        """Expired entries with validators stay available for revalidation"""
+        cache = BoundedCache()
+        cache.set("page", "html", ttl=0, validators={"ETag": '"v1"'})
+
+        assert cache.get("page") is None
+        stale = cache.lookup("page")
+        assert stale.value == "html"
+        assert stale.validators == {"ETag": '"v1"'}
+        assert not stale.fresh
+
+        cache.refresh("page", validators={"Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+        fresh = cache.lookup("page")
+        assert fresh.fresh
+        assert set(fresh.validators) == {"ETag", "Last-Modified"}
+        assert cache.get_stats()["revalidations"] == 1
@@ -0,0 +1,87 @@
+"""
+Unit tests for MinHash near-duplicate suppression
+"""
+
+from utils.advanced_web_search import AdvancedWebSearch
+from utils.near_duplicates import (NearDuplicateFilter, drop_near_duplicates,
+                                   minhash, similarity)
+from utils.passage_retriever import retrieve_passages
+from utils.web_search import WebSearchEngine
+
+ARTICLE = (
+    "Правительство обсудило развитие цифровой экономики на заседании в четверг, "
+    "сообщили в пресс-службе. Министр рассказал о планах на следующий год, "
+    "новых программах поддержки разработчиков и сроках запуска платформы."
+)
+SYNDICATED = ARTICLE.replace("в четверг", "в среду") + " Читайте также другие новости."
+OTHER = (
+    "Футбольный клуб объявил о подписании нового нападающего, контракт рассчитан "
+    "на три сезона и может быть продлен по желанию сторон."
+)
+
+
+class TestMinHash:
+    """Test cases for MinHash signatures"""
+
+    def test_similarity_estimates(self):
+        """Lightly edited copies are similar, unrelated texts are not"""
+        assert similarity(minhash(ARTICLE), minhash(ARTICLE)) == 1.0
+        assert similarity(minhash(ARTICLE), minhash(SYNDICATED)) >= 0.7
+        assert similarity(minhash(ARTICLE), minhash(OTHER)) < 0.2
+
+    def test_signature_is_stable(self):
+        """Signatures do not depend on the process hash seed"""
+        assert minhash(ARTICLE).tolist() == minhash(ARTICLE.upper()).tolist()
+        assert minhash("   ") is None
+
+
+class TestNearDuplicateFilter:
+    """Test cases for NearDuplicateFilter and drop_near_duplicates"""
+
+    def test_first_copy_is_kept(self):
+        """Only the first of several copies survives"""
+        kept, dropped = drop_near_duplicates([ARTICLE, OTHER, SYNDICATED], lambda text: text)
+
+        assert kept == [ARTICLE, OTHER]
+        assert dropped == 1
+
+    def test_empty_texts_are_not_duplicates(self):
+        """Texts without words are never reported as copies"""
+        seen = NearDuplicateFilter()
+
+        assert not seen.is_duplicate("")
+        assert not seen.is_duplicate("")
+
+
+class TestSearchIntegration:
+    """Near-duplicates are removed before ranking and prompt assembly"""
+
+    def test_search_results_drop_mirrors(self):
+        """Results with another URL but the same title and snippet are dropped"""
+        results = [
+            {"title": "Цифровая экономика", "url": "https://a.ru/1", "description": ARTICLE},
+            {"title": "Цифровая экономика", "url": "https://mirror.ru/1", "description": SYNDICATED},
+            {"title": "Футбол", "url": "https://b.ru/2", "description": OTHER},
+        ]
+
+        urls = [r["url"] for r in WebSearchEngine.deduplicate_results(results)]
+        assert urls == ["https://a.ru/1", "https://b.ru/2"]
+
+    def test_analysis_drops_syndicated_pages(self):
+        """Advanced search keeps one copy of syndicated pages"""
+        result = AdvancedWebSearch().build_analysis_result(
+            "цифровая экономика",
+            [ARTICLE, SYNDICATED, OTHER],
+            ["https://a.ru", "https://copy.ru", "https://b.ru"],
+        )
+
+        assert result["duplicates_removed"] == 1
+        assert {r["url"] for r in result["results"]} == {"https://a.ru", "https://b.ru"}
+
+    def test_retrieval_skips_duplicate_passages(self):
+        """The same paragraph on two pages is selected once"""
+        passages = retrieve_passages(
+            "цифровой экономики", [("https://a.ru", ARTICLE), ("https://b.ru", SYNDICATED)]
+        )
+
+        assert [p.url for p in passages] == ["https://a.ru"]
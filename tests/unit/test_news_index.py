@@ -0,0 +1,176 @@
+"""
+Unit tests for background news ingestion and the in-memory news index
+"""
+
+import os
+import time
+
+import httpx
+import pytest
+
+from utils.async_web import AsyncWebRetriever
+from utils.http_transport import HTTPTransport
+from utils.live_data import LiveDataRefresher
+from utils.news_index import (NewsIndex, NewsSource, news_result, parse_feed,
+                              parse_headlines_html, topic_terms)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "fixtures", "news")
+
+SOURCES = [
+    NewsSource("https://ria.ru", "https://ria.ru/export/rss2/archive/index.xml"),
+    NewsSource("https://tass.ru", "https://tass.ru/rss/v2.xml"),
+    NewsSource("https://lenta.ru", "https://lenta.ru/rss/news"),
+]
+
+
+def fixture_index():
+    """Index that keeps the fixture headlines regardless of their publication date"""
+    return NewsIndex(max_age=float("inf"))
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def fixture_handler(request):
+    """Serve the RSS and Atom fixtures; the lenta.ru feed is down, its homepage is not"""
+    url = str(request.url)
+    if url == SOURCES[0].feed_url:
+        return httpx.Response(200, text=read_fixture("ria_rss.xml"), headers={"Content-Type": "application/rss+xml"})
+    if url == SOURCES[1].feed_url:
+        return httpx.Response(200, text=read_fixture("tass_atom.xml"), headers={"Content-Type": "application/atom+xml"})
+    if url.startswith("https://lenta.ru/rss"):
+        return httpx.Response(503)
+    if url.rstrip("/") == "https://lenta.ru":
+        return httpx.Response(200, html=read_fixture("lenta_home.html"))
+    return httpx.Response(404)
+
+
+class TestParsing:
+    """Test cases for feed and homepage parsing"""
+
+    def test_rss(self):
+        """RSS items keep title, link and publication time"""
+        news = parse_feed(read_fixture("ria_rss.xml"), "https://ria.ru")
+        assert len(news) == 3
+        assert news[0]["url"] == "https://ria.ru/20240601/bitcoin-1.html"
+        assert news[0]["published"] > news[1]["published"]
+
+    def test_atom(self):
+        """Atom entries use the href attribute and ISO dates"""
+        news = parse_feed(read_fixture("tass_atom.xml"), "https://tass.ru")
+        assert [item["url"] for item in news] == ["https://tass.ru/ekonomika/1", "https://tass.ru/ekonomika/2"]
+        assert news[1]["published"] is not None
+
+    def test_broken_feed(self):
+        """Invalid XML yields no headlines instead of an error"""
+        assert parse_feed("<html><body>Ошибка 503</body>", "https://ria.ru") == []
+
+    def test_homepage_fallback(self):
+        """Homepage headlines get absolute URLs and skip menu items"""
+        news = parse_headlines_html(read_fixture("lenta_home.html"), "https://lenta.ru", limit=10)
+        assert [item["url"] for item in news] == [
+            "https://lenta.ru/news/2024/06/01/tennis/",
+            "https://lenta.ru/news/2024/06/01/rates/",
+        ]
+
+
+class TestNewsIndex:
+    """Test cases for deduplication and topic search"""
+
+    def make_index(self):
+        index = fixture_index()
+        index.add(parse_feed(read_fixture("ria_rss.xml"), "https://ria.ru"), fetched_at=time.time())
+        index.add(parse_feed(read_fixture("tass_atom.xml"), "https://tass.ru"), fetched_at=time.time())
+        return index
+
+    def test_near_duplicate_headlines_are_dropped(self):
+        """A reprint of the same headline from another source is stored once"""
+        index = self.make_index()
+        assert len(index) == 4
+        assert index.get_stats()["duplicates"] == 1
+
+    def test_reingest_adds_nothing(self):
+        """Pulling the same feed again does not grow the index"""
+        index = self.make_index()
+        assert index.add(parse_feed(read_fixture("ria_rss.xml"), "https://ria.ru")) == 0
+
+    def test_topic_filtering(self):
+        """Topic words select matching headlines, generic news words are ignored"""
+        index = self.make_index()
+        news = index.search("последние новости про биткоин")
+        assert [item["url"] for item in news] == ["https://ria.ru/20240601/bitcoin-1.html"]
+        assert topic_terms("последние новости") == set()
+
+    def test_latest_without_topic(self):
+        """Without a topic the newest headlines come first"""
+        news = self.make_index().search("новости", limit=2)
+        assert news[0]["title"] == "Центробанк сохранил ключевую ставку на прежнем уровне"
+
+    def test_unknown_topic_falls_back_to_latest(self):
+        """An unmatched topic is reported and the latest headlines are returned"""
+        result = news_result(self.make_index(), "новости хоккея", limit=3)
+        assert result["topic_matched"] is False
+        assert len(result["news"]) == 3
+
+    def test_old_and_excess_items_are_pruned(self):
+        """Items beyond the size or age limits are dropped oldest first"""
+        index = NewsIndex(max_items=2, max_age=3600)
+        now = time.time()
+        index.add([
+            {"title": "Очень старая новость о погоде в регионе", "published": now - 7200},
+            {"title": "Новость о курсе рубля к доллару США", "published": now - 60},
+            {"title": "Новость о запуске ракеты с космодрома", "published": now - 30},
+            {"title": "Новость о матче в чемпионате страны", "published": now},
+        ])
+        assert [item["title"] for item in index.search("", limit=5)] == [
+            "Новость о матче в чемпионате страны", "Новость о запуске ракеты с космодрома",
+        ]
+
+
+class TestIngestion:
+    """Test cases for background ingestion through AsyncWebRetriever"""
+
+    def make_retriever(self):
+        return AsyncWebRetriever(
+            live_data=LiveDataRefresher(),
+            transport=HTTPTransport(transport=httpx.MockTransport(fixture_handler)),
+            news_index=fixture_index(),
+            news_sources=SOURCES,
+        )
+
+    @pytest.mark.asyncio
+    async def test_fetch_news_from_fixture_feeds(self):
+        """RSS, Atom and the homepage fallback all end up in the index"""
+        retriever = self.make_retriever()
+        status = await retriever.fetch_news()
+        await retriever.aclose()
+
+        assert status["sources"] == {"https://ria.ru": 3, "https://tass.ru": 2, "https://lenta.ru": 2}
+        assert status["items"] == 6
+
+    @pytest.mark.asyncio
+    async def test_get_news_is_served_from_memory(self):
+        """After one refresh news questions do not touch the network"""
+        requests = []
+
+        def handler(request):
+            requests.append(str(request.url))
+            return fixture_handler(request)
+
+        retriever = AsyncWebRetriever(
+            live_data=LiveDataRefresher(),
+            transport=HTTPTransport(transport=httpx.MockTransport(handler)),
+            news_index=fixture_index(),
+            news_sources=SOURCES,
+        )
+        first = await retriever.get_news("новости футбола")
+        fetched = len(requests)
+        second = await retriever.get_news("что нового с биткоином", limit=3)
+        await retriever.aclose()
+
+        assert first["topic_matched"] is True
+        assert first["news"][0]["url"] == "https://ria.ru/20240601/football-1.html"
+        assert second["news"][0]["url"] == "https://ria.ru/20240601/bitcoin-1.html"
+        assert len(requests) == fetched
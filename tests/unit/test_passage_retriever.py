@@ -0,0 +1,95 @@
+"""
+Unit tests for the BM25 passage retriever
+"""
+
+from utils.advanced_web_search import AdvancedWebSearch, result_excerpt
+from utils.passage_retriever import (bm25_scores, retrieve_passages,
+                                     split_passages, tokenize)
+
+WEATHER = (
+    "Прогноз погоды в Москве на выходные.\n"
+    "В субботу ожидается дождь и сильный ветер, температура около плюс пяти градусов.\n"
+    "В воскресенье погода улучшится."
+)
+FOOTBALL = (
+    "Футбольный клуб объявил о подписании нового нападающего.\n"
+    "Контракт рассчитан на три сезона."
+)
+
+
+class TestTokenize:
+    """Test cases for tokenize"""
+
+    def test_stop_words_and_endings(self):
+        """Stop words are dropped and common endings are stripped"""
+        assert tokenize("Прогноз погоды в Москве") == tokenize("прогноз погода москва")
+        assert "в" not in tokenize("в Москве")
+
+
+class TestSplitPassages:
+    """Test cases for split_passages"""
+
+    def test_offsets_point_into_text(self):
+        """Passages keep their URL and offsets into the source text"""
+        text = "\n".join(f"Абзац номер {i} с некоторым текстом." for i in range(30))
+        passages = split_passages("https://a.ru", text, max_chars=200)
+
+        assert len(passages) > 1
+        for passage in passages:
+            assert passage.url == "https://a.ru"
+            assert len(passage.text) <= 200
+            assert text[passage.start:passage.end].strip() == passage.text
+
+    def test_long_line_is_cut(self):
+        """A single paragraph longer than the limit is split on spaces"""
+        passages = split_passages("u", "слово " * 100, max_chars=120)
+
+        assert len(passages) > 1
+        assert all(len(passage.text) <= 120 for passage in passages)
+
+
+class TestRetrievePassages:
+    """Test cases for BM25 scoring and budgeted retrieval"""
+
+    def test_relevant_passage_ranks_first(self):
+        """The passage mentioning the query terms scores highest"""
+        passages = split_passages("u", WEATHER, max_chars=90)
+        scores = bm25_scores("дождь в субботу", passages)
+
+        assert "дождь" in passages[int(scores.argmax())].text
+
+    def test_budget_and_provenance(self):
+        """Selected passages fit the budget and keep their source URL"""
+        docs = [("https://sport.ru", FOOTBALL), ("https://weather.ru", WEATHER)]
+        passages = retrieve_passages("погода в Москве", docs, top_k=5, max_chars=150)
+
+        assert passages
+        assert sum(len(p.text) for p in passages) <= 150
+        assert all(p.url == "https://weather.ru" for p in passages)
+        assert passages == sorted(passages, key=lambda p: -p.score)
+
+    def test_no_matches_returns_document_starts(self):
+        """Without query matches the leading passages are returned"""
+        passages = retrieve_passages("криптовалюта", [("u", FOOTBALL)], top_k=1)
+
+        assert passages[0].start == 0
+
+
+class TestAnalysisResult:
+    """Passage retrieval inside AdvancedWebSearch"""
+
+    def test_urls_stay_with_their_content(self):
+        """Ranking reorders pages without mixing up URLs and content"""
+        search = AdvancedWebSearch()
+        result = search.build_analysis_result(
+            "погода в Москве",
+            [FOOTBALL, WEATHER],
+            ["https://sport.ru", "https://weather.ru"],
+        )
+
+        first, second = result["results"]
+        assert (first["url"], first["content"]) == ("https://weather.ru", WEATHER)
+        assert (second["url"], second["content"]) == ("https://sport.ru", FOOTBALL)
+        assert first["relevance_score"] == 1.0
+        assert "Москве" in result_excerpt(first, 100)
+        assert result_excerpt(second, 10) == FOOTBALL[:10] + "..."
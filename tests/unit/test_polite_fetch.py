@@ -0,0 +1,97 @@
+"""
+Unit tests for concurrent page fetching with per-host politeness
+"""
+
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+from utils.polite_fetch import (AsyncHostLimiter, HostLimiter,
+                                async_polite_fetch_all, polite_fetch_all)
+
+
+class TestPoliteFetchAll:
+    """Test cases for the thread-pool fetcher"""
+
+    def test_pages_are_fetched_in_parallel(self):
+        """Different hosts do not wait for each other"""
+        urls = [f"https://site{i}.example/page" for i in range(4)]
+
+        def fetch(url):
+            time.sleep(0.1)
+            return url.upper()
+
+        started = time.monotonic()
+        with patch("utils.polite_fetch.host_limiter", HostLimiter(min_interval=0)):
+            results = {index: result for index, _, result in polite_fetch_all(urls, fetch)}
+
+        assert time.monotonic() - started < 0.3
+        assert results == {i: url.upper() for i, url in enumerate(urls)}
+
+    def test_errors_become_none(self):
+        """A failing page does not abort the others"""
+
+        def fetch(url):
+            if "bad" in url:
+                raise ValueError("boom")
+            return "ok"
+
+        urls = ["https://a.example/bad", "https://b.example/"]
+        results = {url: result for _, url, result in polite_fetch_all(urls, fetch)}
+
+        assert results == {"https://a.example/bad": None, "https://b.example/": "ok"}
+
+    def test_same_host_requests_are_spaced(self):
+        """Starts against one host respect the minimum interval"""
+        limiter = HostLimiter(max_per_host=2, min_interval=0.05)
+        starts = []
+
+        def fetch(url):
+            starts.append(time.monotonic())
+
+        with patch("utils.polite_fetch.host_limiter", limiter):
+            urls = [f"https://a.example/{i}" for i in range(3)]
+            list(polite_fetch_all(urls, fetch))
+
+        starts.sort()
+        assert starts[1] - starts[0] >= 0.045
+        assert starts[2] - starts[1] >= 0.045
+        assert limiter.stats.get_stats()["a.example"]["requests"] == 3
+
+
+class TestAsyncPoliteFetch:
+    """Test cases for the asyncio fetcher"""
+
+    @pytest.mark.asyncio
+    async def test_results_arrive_as_completed(self):
+        """Faster pages are yielded first"""
+        delays = {"https://a.example/": 0.05, "https://b.example/": 0.0}
+
+        async def fetch(url):
+            await asyncio.sleep(delays[url])
+            return url
+
+        order = [url async for _, url, _ in async_polite_fetch_all(list(delays), fetch)]
+
+        assert order == ["https://b.example/", "https://a.example/"]
+
+    @pytest.mark.asyncio
+    async def test_per_host_concurrency_cap(self):
+        """No more than max_per_host requests run against one host"""
+        limiter = AsyncHostLimiter(max_per_host=1, min_interval=0)
+        active = 0
+        peak = 0
+
+        async def request():
+            nonlocal active, peak
+            async with limiter.slot("https://a.example/"):
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        await asyncio.gather(*(request() for _ in range(3)))
+
+        assert peak == 1
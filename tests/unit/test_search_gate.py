@@ -0,0 +1,123 @@
+"""
+Unit tests for the scored web search gate
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from routes.chat import (SEARCH_FAILED_NOTE, build_system_content,
+                         collect_web_search_results)
+from utils.context_packer import ContextPacker
+from utils.hedged_retrieval import HedgedResult
+from utils.search_gate import SearchGate, count_named_entities
+
+
+class TestSearchGate:
+    """Test cases for SearchGate"""
+
+    def test_live_data_query_is_searched(self):
+        """Recency and live-data topics push the score over the threshold"""
+        decision = SearchGate(threshold=0.45).decide("Какие последние новости о курсе биткоина?")
+
+        assert decision.should_search
+        assert "recency" in decision.features
+
+    def test_self_contained_task_is_not_searched(self):
+        """Coding and explanation requests skip the web"""
+        decision = SearchGate(threshold=0.45).decide("Напиши функцию сортировки списка на python")
+
+        assert not decision.should_search
+
+    def test_exclusions_are_hard(self):
+        """Greetings are excluded regardless of the threshold"""
+        decision = SearchGate(threshold=0.0).decide("привет")
+
+        assert decision.excluded
+        assert not decision.should_search
+
+    def test_zero_threshold_searches_everything_else(self):
+        """A zero threshold restores search-for-everything behaviour"""
+        assert SearchGate(threshold=0.0).decide("как приготовить борщ дома").should_search
+
+    def test_named_entities(self):
+        """Capitalised words mid-sentence and acronyms count as entities"""
+        assert count_named_entities("Когда основан Газпром и что такое ВВП?") == 2
+        assert count_named_entities("Привет. Как дела?") == 0
+
+
+class TestSearchGateTelemetry:
+    """Test cases for usage telemetry"""
+
+    def test_used_context_is_counted(self):
+        """Answers repeating numbers from the results count as hits"""
+        gate = SearchGate(threshold=0.0)
+        decision = gate.decide("какой сейчас курс доллара к рублю")
+
+        gate.record_outcome(
+            decision,
+            "Курс USD по данным ЦБ: 92,45 руб. https://www.cbr.ru/currency_base/",
+            "Сейчас доллар стоит 92,45 рубля по данным cbr.ru.",
+        )
+
+        stats = gate.get_stats()
+        assert stats["used"] == 1
+        assert stats["usage_rate"] == 1.0
+
+    def test_ignored_context_is_counted(self):
+        """Answers unrelated to the results count as misses"""
+        gate = SearchGate(threshold=0.0)
+        decision = gate.decide("как приготовить борщ дома")
+
+        gate.record_outcome(
+            decision,
+            "Рецепт борща: свекла, капуста, картофель, говядина",
+            "Понадобятся овощи и немного времени.",
+        )
+
+        stats = gate.get_stats()
+        assert stats["unused"] == 1
+        assert sum(bucket["unused"] for bucket in stats["score_buckets"].values()) == 1
+
+    def test_numbered_citations_are_counted(self):
+        """Answers citing packed passages as [n] count as cited"""
+        gate = SearchGate(threshold=0.0)
+        context = ContextPacker().pack("ключевая ставка", [[
+            {"url": "https://www.cbr.ru/press/", "content": "Банк России сохранил ключевую ставку на уровне 16% годовых."},
+            {"url": "https://www.rbc.ru/finances/", "content": "Аналитики ожидали, что ключевая ставка останется прежней."},
+        ]])
+
+        usage = gate.measure_usage("ключевая ставка", context, "Ставку оставили без изменений [2].")
+
+        assert usage["cited"] is True
+        assert usage["used"] is True
+        assert gate.measure_usage("ключевая ставка", context, "См. пункт [7].")["cited"] is False
+
+    def test_skipped_decisions_are_not_judged(self):
+        """Outcomes are only recorded for searched decisions"""
+        gate = SearchGate(threshold=0.9)
+        decision = gate.decide("как приготовить борщ дома")
+
+        gate.record_outcome(decision, "", "ответ")
+
+        stats = gate.get_stats()
+        assert stats["skipped"] == 1
+        assert stats["used"] == stats["unused"] == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_search_is_recorded_as_empty(self):
+        """A search where every source failed yields no context and counts as empty"""
+        gate = SearchGate(threshold=0.0)
+        decision = gate.decide("какой сейчас курс доллара к рублю")
+
+        with patch("routes.chat.hedged_first", return_value=HedgedResult()):
+            context = await collect_web_search_results(decision.message, decision)
+        gate.record_outcome(decision, context, "Курс доллара в интернете найти не удалось.")
+
+        assert context == ""
+        assert decision.search_failed
+        stats = gate.get_stats()
+        assert stats["empty_results"] == 1
+        assert stats["used"] == stats["unused"] == 0
+        system_content = build_system_content(context, None, decision.search_failed)
+        assert system_content.endswith(SEARCH_FAILED_NOTE)
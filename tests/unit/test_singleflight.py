@@ -0,0 +1,115 @@
+"""
+Unit tests for concurrent request coalescing
+"""
+
+import asyncio
+
+import pytest
+
+from utils.singleflight import SingleFlight, coalesce
+
+
+class TestSingleFlight:
+    """Test cases for SingleFlight"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_execution(self):
+        """Identical concurrent calls run the function once"""
+        group = SingleFlight()
+        executions = 0
+
+        async def fetch():
+            nonlocal executions
+            executions += 1
+            await asyncio.sleep(0.01)
+            return {"USD": 90.5}
+
+        results = await asyncio.gather(*(group.do("exchange", "", fetch) for _ in range(5)))
+
+        assert executions == 1
+        assert all(result == {"USD": 90.5} for result in results)
+        stats = group.get_stats()
+        assert stats["tiers"]["exchange"]["coalesced"] == 4
+        assert stats["coalescing_ratio"] == 0.8
+        assert stats["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_sequential_calls_are_not_cached(self):
+        """Only in-flight calls are shared; later calls run again"""
+        group = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            return len(calls)
+
+        assert await group.do("search", "q", fetch) == 1
+        assert await group.do("search", "q", fetch) == 2
+
+    @pytest.mark.asyncio
+    async def test_errors_propagate_to_all_waiters(self):
+        """Every waiter sees the shared failure"""
+        group = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(
+            *(group.do("search", "q", fail) for _ in range(3)), return_exceptions=True
+        )
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_cancel_others(self):
+        """Cancelling one caller leaves the shared call running"""
+        group = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.02)
+            return "ok"
+
+        first = asyncio.ensure_future(group.do("search", "q", fetch))
+        second = asyncio.ensure_future(group.do("search", "q", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == "ok"
+
+    @pytest.mark.asyncio
+    async def test_decorator_normalizes_queries(self):
+        """Case and whitespace differences map to the same key"""
+        group = SingleFlight()
+
+        class Retriever:
+            executions = 0
+
+            @coalesce("search", group)
+            async def search(self, query):
+                Retriever.executions += 1
+                await asyncio.sleep(0.01)
+                return query
+
+        retriever = Retriever()
+        await asyncio.gather(retriever.search("Курс доллара"), retriever.search("  курс   ДОЛЛАРА "))
+
+        assert Retriever.executions == 1
+
+    @pytest.mark.asyncio
+    async def test_last_cancelled_waiter_cancels_the_call(self):
+        """Nobody waiting means the upstream call is abandoned"""
+        group = SingleFlight()
+        finished = []
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            finished.append(1)
+
+        waiter = asyncio.ensure_future(group.do("search", "q", fetch))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0.06)
+
+        assert finished == []
+        assert group.get_stats()["in_flight"] == 0
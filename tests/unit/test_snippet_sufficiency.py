@@ -0,0 +1,115 @@
+"""
+Unit tests for snippet-first adaptive retrieval depth
+"""
+
+from unittest.mock import patch
+
+from utils.advanced_web_search import AdvancedWebSearch
+from utils.snippet_sufficiency import (expects_number, needs_explanation,
+                                       snippet_sufficiency, snippets_suffice)
+from utils.web_search import WebSearchEngine
+
+PRICE_SNIPPETS = [
+    "Биткоин сегодня стоит 64 000 долларов по данным бирж",
+    "Сколько стоит биткоин: курс на сегодня 64 100 $",
+]
+
+DUCKDUCKGO_HTML = """
+<div class="result">
+  <a class="result__a" href="//duckduckgo.com/l/?uddg=https%3A%2F%2Fexample.com%2Fcanberra">Canberra</a>
+  <a class="result__snippet">Канберра — столица Австралии с 1913 года</a>
+</div>
+<div class="result">
+  <a class="result__a" href="https://example.org/australia">Австралия</a>
+  <a class="result__snippet">Столица Австралии — Канберра, а не Сидней</a>
+</div>
+"""
+
+
+class TestSnippetSufficiency:
+    """Test cases for scoring search snippets"""
+
+    def test_numeric_answer_in_snippets(self):
+        """A price question is answered by snippets that contain the number"""
+        assert snippet_sufficiency("сколько стоит биткоин сегодня", PRICE_SNIPPETS) == 1.0
+
+    def test_numeric_question_without_numbers(self):
+        """Snippets without numbers do not answer a numeric question"""
+        snippets = ["Биткоин сегодня стоит дорого", "Сколько стоит биткоин — разбор"]
+        assert not snippets_suffice("сколько стоит биткоин сегодня", snippets)
+
+    def test_low_coverage(self):
+        """Snippets missing most query terms are not sufficient"""
+        assert not snippets_suffice("столица австралии население", ["Сидней — крупный город"])
+
+    def test_single_snippet_is_discounted(self):
+        """An answer from one snippet scores lower than a confirmed one"""
+        one = snippet_sufficiency("столица австралии", ["Канберра — столица Австралии"])
+        two = snippet_sufficiency(
+            "столица австралии", ["Канберра — столица Австралии", "Столица Австралии Канберра"]
+        )
+        assert one < two == 1.0
+
+    def test_explanations_need_pages(self):
+        """Why/how questions always fetch full pages"""
+        assert needs_explanation("почему небо голубое")
+        assert snippet_sufficiency("почему небо голубое", ["Небо голубое из-за рассеяния"]) == 0.0
+
+    def test_expects_number(self):
+        """Counting, dates and prices expect numbers"""
+        assert expects_number("когда основан рим")
+        assert expects_number("курс доллара")
+        assert not expects_number("столица австралии")
+
+
+class TestWebSearchEngineDepth:
+    """Test cases for adaptive depth in WebSearchEngine"""
+
+    def test_sufficient_snippets_skip_page_fetch(self):
+        """Pages are not downloaded when the snippets answer the query"""
+        engine = WebSearchEngine()
+        hits = [
+            {"title": "Биткоин", "url": f"https://site{i}.ru", "description": text}
+            for i, text in enumerate(PRICE_SNIPPETS)
+        ]
+        with patch.object(engine, "search_web", return_value=hits), \
+                patch.object(engine, "fetch_page_content") as fetch:
+            results = engine.search_and_fetch_content("сколько стоит биткоин сегодня")
+        fetch.assert_not_called()
+        assert [result["content"] for result in results] == ["", ""]
+
+    def test_disabled_depth_fetches_pages(self):
+        """With adaptive depth off every page is fetched"""
+        engine = WebSearchEngine(adaptive_depth=False)
+        hits = [{"title": "Биткоин", "url": "https://site.ru", "description": PRICE_SNIPPETS[0]}]
+        with patch.object(engine, "search_web", return_value=hits), \
+                patch.object(engine, "fetch_page_content", return_value="Текст страницы") as fetch:
+            results = engine.search_and_fetch_content("сколько стоит биткоин сегодня")
+        fetch.assert_called_once()
+        assert results[0]["content"] == "Текст страницы"
+
+
+class TestAdvancedSearchDepth:
+    """Test cases for adaptive depth in AdvancedWebSearch"""
+
+    def test_extract_duck_snippets(self):
+        """Snippets keep the real URL behind DuckDuckGo redirects"""
+        snippets = AdvancedWebSearch.__new__(AdvancedWebSearch).extract_duck_snippets(DUCKDUCKGO_HTML)
+        assert [snippet["url"] for snippet in snippets] == [
+            "https://example.com/canberra", "https://example.org/australia",
+        ]
+        assert snippets[0]["snippet"] == "Канберра — столица Австралии с 1913 года"
+
+    def test_search_and_analyze_answers_from_snippets(self):
+        """A covered query returns snippet passages without loading pages"""
+        search = AdvancedWebSearch.__new__(AdvancedWebSearch)
+        search.adaptive_depth = True
+        snippets = search.extract_duck_snippets(DUCKDUCKGO_HTML)
+        links = [snippet["url"] for snippet in snippets]
+        with patch.object(search, "duck_search_with_snippets", return_value=(links, snippets)), \
+                patch.object(search, "load_content") as load:
+            result = search.search_and_analyze("столица австралии")
+        load.assert_not_called()
+        assert result["source"] == "snippets"
+        assert {item["url"] for item in result["results"]} == set(links)
+        assert result["passages"]
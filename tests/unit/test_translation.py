@@ -0,0 +1,123 @@
+"""
+Unit tests for pipelined translation of web-search answers
+"""
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from utils.openai_client import GenerationError
+from utils.translation import (StageTimer, TranslationChunker,
+                               TranslationMetrics, pipelined_translation,
+                               stream_web_answer)
+
+
+async def stream_of(*parts):
+    """Async iterator over given text parts"""
+    for part in parts:
+        yield part
+
+
+class TestTranslationChunker:
+    """Test cases for TranslationChunker"""
+
+    def test_splits_on_paragraphs(self):
+        """Paragraphs are emitted once a blank line closes them"""
+        chunker = TranslationChunker(min_chars=1)
+
+        assert chunker.feed("First para") == []
+        assert chunker.feed("graph.\n\nSecond") == [("First paragraph.", False)]
+        assert chunker.flush() == [("Second", False)]
+
+    def test_small_paragraphs_are_merged(self):
+        """Paragraphs shorter than min_chars are batched together"""
+        chunker = TranslationChunker(min_chars=100)
+
+        assert chunker.feed("One.\n\nTwo.\n\n") == []
+        assert chunker.flush() == [("One.\n\nTwo.", False)]
+
+    def test_code_blocks_are_untouched(self):
+        """Code fences become separate chunks marked as code"""
+        chunker = TranslationChunker(min_chars=1)
+        text = "Intro\n```python\nprint('hi')\n\nx = 1\n```\nOutro"
+
+        chunks = chunker.feed(text) + chunker.flush()
+
+        assert chunks == [
+            ("Intro", False),
+            ("```python\nprint('hi')\n\nx = 1\n```", True),
+            ("Outro", False),
+        ]
+
+    def test_unterminated_code_block_is_flushed(self):
+        """An unterminated fence is still emitted as code"""
+        chunker = TranslationChunker(min_chars=1)
+
+        chunks = chunker.feed("```\ncode") + chunker.flush()
+
+        assert chunks == [("```\ncode", True)]
+
+
+class TestPipelinedTranslation:
+    """Test cases for pipelined_translation"""
+
+    @pytest.mark.asyncio
+    async def test_output_preserves_order(self):
+        """Chunks translated concurrently are emitted in source order"""
+
+        async def fake_translate(text, model):
+            # Первый абзац переводится дольше остальных
+            await asyncio.sleep(0.05 if text == "A" else 0)
+            return text.lower()
+
+        with patch("utils.translation.translate_text", fake_translate):
+            timer = StageTimer("pipeline")
+            parts = [
+                part
+                async for part in pipelined_translation(
+                    stream_of("A\n\nB\n\n", "```\nCODE\n```\n", "C"),
+                    "gpt-4o-mini",
+                    timer,
+                    min_chunk_chars=1,
+                )
+            ]
+
+        assert "".join(parts) == "a\n\nb\n\n```\nCODE\n```\n\nc"
+        assert "generation_done" in timer.stages
+        assert "first_output_chunk" in timer.stages
+
+    @pytest.mark.asyncio
+    async def test_generation_error_is_not_translated(self):
+        """A failing English stream raises instead of sending the error text to translation"""
+        translated = []
+
+        async def fake_translate(text, model):
+            translated.append(text)
+            return text
+
+        async def failing_stream(messages, model, raise_errors=False):
+            yield "First paragraph.\n\n"
+            raise GenerationError("Превышен лимит запросов.")
+
+        with patch("utils.translation.translate_text", fake_translate), \
+                patch("utils.translation.stream_response", failing_stream):
+            with pytest.raises(GenerationError):
+                async for _ in stream_web_answer([{"role": "system", "content": "s"}], "gpt-4o-mini", "pipeline"):
+                    pass
+
+        assert all("лимит" not in text for text in translated)
+
+    def test_metrics_aggregate_by_mode(self):
+        """Stage timings are averaged per mode"""
+        metrics = TranslationMetrics()
+        for mode in ("pipeline", "pipeline", "direct"):
+            timer = StageTimer(mode)
+            timer.mark("total")
+            metrics.record(timer)
+
+        stats = metrics.get_stats()
+
+        assert stats["modes"]["pipeline"]["requests"] == 2
+        assert stats["modes"]["direct"]["requests"] == 1
+        assert "total" in stats["modes"]["direct"]["avg_seconds"]
@@ -0,0 +1,206 @@
+"""
+Unit tests for upstream circuit breakers and negative caching
+"""
+
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from utils.http_transport import HTTPTransport
+from utils.upstream_health import (CLOSED, HALF_OPEN, OPEN, NegativeCache,
+                                   UpstreamHealth, UpstreamUnavailable,
+                                   engine_health)
+from utils.web_search import WebSearchEngine
+
+
+def make_transport(handler, **health_options):
+    """Create transport whose requests are served by a mock transport"""
+    return HTTPTransport(
+        transport=httpx.MockTransport(handler), health=UpstreamHealth(**health_options)
+    )
+
+
+class TestCircuitBreaker:
+    """Test cases for UpstreamHealth"""
+
+    def test_trips_on_error_rate(self):
+        """The breaker opens once the rolling error rate reaches the threshold"""
+        health = UpstreamHealth(min_samples=4, error_rate=0.5, cooldown=60)
+        for ok in (True, False, True):
+            health.record("bing", ok, 0.1)
+        assert health.allow("bing")
+        health.record("bing", False, 10.0)
+
+        assert health.state("bing") == OPEN
+        assert not health.allow("bing")
+        stats = health.get_stats()["bing"]
+        assert stats["error_rate"] == 0.5
+        assert stats["skipped"] == 1
+        assert stats["trips"] == 1
+        assert stats["max_latency_seconds"] == 10.0
+
+    def test_half_open_probe(self):
+        """After the cool-down one probe is let through and closes the breaker on success"""
+        health = UpstreamHealth(min_samples=1, cooldown=0)
+        health.record("bing", False, 0.1)
+        assert health.state("bing") == OPEN
+
+        assert health.allow("bing")
+        assert health.state("bing") == HALF_OPEN
+        assert not health.allow("bing")
+        health.record("bing", True, 0.1)
+        assert health.state("bing") == CLOSED
+        assert health.get_stats()["bing"]["error_rate"] == 0.0
+
+    def test_failed_probe_reopens(self):
+        """A failed probe opens the breaker again"""
+        health = UpstreamHealth(min_samples=1, cooldown=0)
+        health.record("bing", False, 0.1)
+        assert health.allow("bing")
+        health.record("bing", False, 0.1)
+        assert health.state("bing") == OPEN
+        assert health.get_stats()["bing"]["trips"] == 2
+
+    def test_cancelled_probe_can_be_retried(self):
+        """A probe that ended without an outcome does not block the source forever"""
+        health = UpstreamHealth(min_samples=1, cooldown=0)
+        health.record("bing", False, 0.1)
+        assert health.allow("bing")
+        health.cancel("bing")
+        assert health.allow("bing")
+
+    def test_guard(self):
+        """guard records failures and refuses calls while open"""
+        health = UpstreamHealth(min_samples=1, cooldown=60)
+        with pytest.raises(ValueError):
+            with health.guard("duckduckgo"):
+                raise ValueError("captcha")
+        with pytest.raises(UpstreamUnavailable):
+            with health.guard("duckduckgo"):
+                pytest.fail("an open breaker must not run the call")
+
+
+class TestNegativeCache:
+    """Test cases for NegativeCache"""
+
+    def test_failed_url_expires(self):
+        """Failed URLs are refused until the TTL passes"""
+        cache = NegativeCache(ttl=60)
+        cache.add("https://a.example/page")
+        with pytest.raises(UpstreamUnavailable):
+            cache.check("https://a.example/page")
+        cache.check("https://a.example/other")
+
+        with patch("utils.upstream_health.time.monotonic", return_value=time.monotonic() + 61):
+            cache.check("https://a.example/page")
+        assert cache.get_stats()["hits"] == 1
+
+    def test_size_is_bounded(self):
+        """The oldest URLs are forgotten first"""
+        cache = NegativeCache(ttl=60, max_urls=2)
+        for url in ("https://a/1", "https://a/2", "https://a/3"):
+            cache.add(url)
+        cache.check("https://a/1")
+        with pytest.raises(UpstreamUnavailable):
+            cache.check("https://a/3")
+
+
+class TestTransportHealth:
+    """Test cases for host breakers built into HTTPTransport"""
+
+    def test_failing_host_is_skipped(self):
+        """After repeated 503s the host is not contacted until the cool-down ends"""
+        calls = []
+
+        def handler(request):
+            calls.append(request.url.path)
+            return httpx.Response(503)
+
+        transport = make_transport(handler, min_samples=2, cooldown=60)
+        for path in ("/1", "/2"):
+            assert transport.get(f"https://slow.example{path}").status_code == 503
+        with pytest.raises(UpstreamUnavailable):
+            transport.get("https://slow.example/3")
+
+        assert calls == ["/1", "/2"]
+        assert transport.health.get_stats()["slow.example"]["state"] == OPEN
+
+    def test_failed_url_is_negatively_cached(self):
+        """A 404 is not refetched, while the host itself stays healthy"""
+        calls = []
+
+        def handler(request):
+            calls.append(request.url.path)
+            return httpx.Response(404 if request.url.path == "/missing" else 200, text="ok")
+
+        transport = make_transport(handler, min_samples=1)
+        assert transport.get("https://site.example/missing").status_code == 404
+        with pytest.raises(UpstreamUnavailable):
+            transport.get("https://site.example/missing")
+        assert transport.get("https://site.example/page").text == "ok"
+
+        assert calls == ["/missing", "/page"]
+        assert transport.health.state("site.example") == CLOSED
+
+    def test_transient_failures_are_not_negatively_cached(self):
+        """A 429 or a timeout from a live-data API does not block the next refresh"""
+        responses = iter([httpx.Response(429), httpx.ReadTimeout("timeout"), httpx.Response(200, json={})])
+
+        def handler(request):
+            response = next(responses)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        transport = make_transport(handler, min_samples=4)
+        url = "https://api.coingecko.com/api/v3/simple/price"
+        assert transport.get(url).status_code == 429
+        with pytest.raises(httpx.ReadTimeout):
+            transport.get(url)
+        assert transport.get(url).status_code == 200
+        assert transport.failed_urls.get_stats()["hits"] == 0
+
+    @pytest.mark.asyncio
+    async def test_async_errors_open_breaker(self):
+        """Timeouts in the async API count against the host"""
+
+        def handler(request):
+            raise httpx.ReadTimeout("timeout")
+
+        transport = make_transport(handler, min_samples=1, cooldown=60)
+        with pytest.raises(httpx.ReadTimeout):
+            await transport.aget("https://down.example/a")
+        with pytest.raises(UpstreamUnavailable):
+            await transport.aget("https://down.example/b")
+        await transport.aclose()
+
+
+class TestEngineBreakers:
+    """Test cases for per-engine breakers in WebSearchEngine"""
+
+    def test_open_engine_is_skipped(self):
+        """A search engine with an open breaker is not queried"""
+        engine = WebSearchEngine()
+        hit = [{"title": "Bing", "url": "https://b.example", "description": "d"}]
+        for _ in range(engine_health.min_samples):
+            engine_health.record("duckduckgo", False, 10.0)
+
+        with patch.object(engine, "search_duckduckgo") as duckduckgo, \
+                patch.object(engine, "search_bing", return_value=hit):
+            results = engine.search_web("python")
+
+        duckduckgo.assert_not_called()
+        assert results == hit
+        assert engine_health.get_stats()["bing"]["requests"] == 1
+
+    def test_empty_results_count_as_failures(self):
+        """Captcha pages without results count against the engine"""
+        engine = WebSearchEngine()
+        with patch.object(engine, "search_duckduckgo", return_value=[]), \
+                patch.object(engine, "search_bing", return_value=[]), \
+                patch.object(engine, "search_google", return_value=[]):
+            assert engine.search_web("python") == []
+
+        assert engine_health.get_stats()["duckduckgo"]["failures"] == 1
@@ -1,121 +1,151 @@
 """
-Продвинутая система веб-поиска с TF-IDF ранжированием и кэшированием
+Продвинутая система веб-поиска с BM25-поиском фрагментов и кэшированием
 """
 
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import quote, urljoin, urlparse
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import hashlib
-import os
-import time
+from urllib.parse import parse_qs, quote, unquote, urljoin, urlparse
 import logging
-from typing import List, Dict, Any
-import re
+from typing import List, Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 
+from utils.content_extractor import extract_main_text, make_soup
+from utils.cpu_pool import cpu_pool
+from utils.disk_cache import DiskCache
+from utils.http_transport import (EARLY_STOP_TEXT_FACTOR, MAX_PAGE_BYTES,
+                                  TextBudget, conditional_headers,
+                                  http_transport, response_validators)
+from utils.local_index import LocalIndex
+from utils.memory_cache import CacheLookup
+from utils.near_duplicates import drop_near_duplicates
+from utils.passage_retriever import Passage, group_by_url, retrieve_passages
+from utils.polite_fetch import polite_fetch_all
+from utils.snippet_sufficiency import ADAPTIVE_SEARCH_DEPTH, snippets_suffice
+from utils.upstream_health import EmptySearchResults, engine_health
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-# Создаем директорию для кэша
-CACHE_DIR = "cache"
-os.makedirs(CACHE_DIR, exist_ok=True)
+# Сколько символов очищенного текста страницы сохраняется
+EXTRACT_TEXT_LIMIT = 5000
+
 
 class AdvancedWebSearch:
     """Продвинутая система веб-поиска с интеллектуальным ранжированием"""
     
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-        })
-        
-        # Configure proxy if enabled
-        proxy_enabled = os.getenv("PROXY_ENABLED", "false").lower() == "true"
-        if proxy_enabled:
-            proxy_host = os.getenv("PROXY_HOST")
-            proxy_port = os.getenv("PROXY_PORT")
-            proxy_username = os.getenv("PROXY_USERNAME")
-            proxy_password = os.getenv("PROXY_PASSWORD")
-            
-            if proxy_host and proxy_port:
-                if proxy_username and proxy_password:
-                    proxy_url = f"http://{proxy_username}:{proxy_password}@{proxy_host}:{proxy_port}"
-                else:
-                    proxy_url = f"http://{proxy_host}:{proxy_port}"
-                
-                self.session.proxies = {
-                    "http": proxy_url,
-                    "https": proxy_url,
-                }
-                logger.info(f"🌐 AdvancedWebSearch: Proxy enabled {proxy_host}:{proxy_port}")
+        # Общий пул соединений, прокси и заголовки из utils.http_transport
+        self.session = http_transport.session()
+        # Индексированный дисковый кэш текста страниц
+        self.disk_cache = DiskCache()
+        # Полнотекстовый индекс тех же страниц для ответов без сети
+        self.local_index = LocalIndex()
+        # Страницы загружаются, только если сниппетов выдачи не хватает
+        self.adaptive_depth = ADAPTIVE_SEARCH_DEPTH
     
     def duck_search(self, query: str, max_results: int = 5) -> List[str]:
         """Поиск через DuckDuckGo с fallback"""
+        return self.duck_search_with_snippets(query, max_results)[0]
+    
+    def duck_search_with_snippets(
+        self, query: str, max_results: int = 5
+    ) -> Tuple[List[str], List[Dict[str, str]]]:
+        """Ссылки (с fallback) и сниппеты выдачи DuckDuckGo за один запрос"""
         try:
             url = f"https://html.duckduckgo.com/html/?q={quote(query)}"
             logger.info(f"Поиск DuckDuckGo: {query}")
             
-            response = self.session.get(url, timeout=15)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            # Ищем ссылки в результатах поиска (разные селекторы)
-            links = []
-            
-            # Пробуем разные селекторы для DuckDuckGo
-            selectors = [
-                ".result__url",
-                ".result__a",
-                ".result__title a",
-                ".result a",
-                "a[href*='http']"
-            ]
-            
-            for selector in selectors:
-                elements = soup.select(selector)
-                for elem in elements:
-                    href = elem.get("href")
-                    if href and href.startswith("http"):
-                        # Очищаем DuckDuckGo редиректы
-                        if "/l/?uddg=" in href:
-                            try:
-                                from urllib.parse import unquote, parse_qs
-                                parsed = parse_qs(href.split("?")[1])
-                                if "uddg" in parsed:
-                                    real_url = unquote(parsed["uddg"][0])
-                                    if real_url.startswith("http"):
-                                        href = real_url
-                                    else:
-                                        continue
-                                else:
-                                    continue
-                            except:
-                                continue
-                        elif href.startswith("//"):
-                            href = "https:" + href
-                        
-                        if href.startswith("http") and href not in links:
-                            links.append(href)
+            # Пока DuckDuckGo недоступен, сразу используется fallback
+            with engine_health.guard("duckduckgo"):
+                response = self.session.get(url, timeout=15)
+                response.raise_for_status()
                 
-                if links:  # Если нашли ссылки, прекращаем поиск
-                    break
+                links = self.extract_duck_links(response.text)
+                if not links:
+                    raise EmptySearchResults("DuckDuckGo не вернул ссылки")
             
             logger.info(f"Найдено ссылок: {len(links)}")
             
-            # Если не нашли ссылки, используем fallback
-            if not links:
-                logger.warning("DuckDuckGo не вернул ссылки, используем fallback")
-                return self._fallback_search(query, max_results)
-            
-            return links[:max_results]
+            return links[:max_results], self.extract_duck_snippets(response.text)[:max_results]
             
+        except EmptySearchResults:
+            # Если не нашли ссылки, используем fallback
+            logger.warning("DuckDuckGo не вернул ссылки, используем fallback")
+            return self._fallback_search(query, max_results), []
         except Exception as e:
             logger.error(f"Ошибка поиска DuckDuckGo: {e}")
-            return self._fallback_search(query, max_results)
+            return self._fallback_search(query, max_results), []
+    
+    def extract_duck_links(self, html: str) -> List[str]:
+        """Извлечь ссылки на результаты из HTML выдачи DuckDuckGo"""
+        soup = make_soup(html)
+        
+        # Ищем ссылки в результатах поиска (разные селекторы)
+        links = []
+        
+        # Пробуем разные селекторы для DuckDuckGo
+        selectors = [
+            ".result__url",
+            ".result__a",
+            ".result__title a",
+            ".result a",
+            "a[href*='http']"
+        ]
+        
+        for selector in selectors:
+            elements = soup.select(selector)
+            for elem in elements:
+                href = elem.get("href")
+                if href and href.startswith("http"):
+                    href = self.clean_duck_href(href)
+                    if href and href not in links:
+                        links.append(href)
+            
+            if links:  # Если нашли ссылки, прекращаем поиск
+                break
+        
+        return links
+    
+    @staticmethod
+    def clean_duck_href(href: str) -> Optional[str]:
+        """Настоящий URL вместо редиректа DuckDuckGo или None"""
+        if "/l/?uddg=" in href:
+            try:
+                parsed = parse_qs(href.split("?")[1])
+            except IndexError:
+                return None
+            if "uddg" not in parsed:
+                return None
+            href = unquote(parsed["uddg"][0])
+        elif href.startswith("//"):
+            href = "https:" + href
+        return href if href.startswith("http") else None
+    
+    def extract_duck_snippets(self, html: str) -> List[Dict[str, str]]:
+        """Заголовки и сниппеты результатов выдачи DuckDuckGo"""
+        snippets = []
+        for block in make_soup(html).select(".result"):
+            title_elem = block.select_one(".result__a")
+            snippet_elem = block.select_one(".result__snippet")
+            if title_elem is None or snippet_elem is None:
+                continue
+            url = self.clean_duck_href(title_elem.get("href") or "")
+            if url:
+                snippets.append({
+                    "url": url,
+                    "title": title_elem.get_text(" ", strip=True),
+                    "snippet": snippet_elem.get_text(" ", strip=True),
+                })
+        return snippets
+    
+    def snippet_result(self, query: str, snippets: List[Dict[str, str]]) -> Optional[Dict[str, Any]]:
+        """Результат поиска по одним сниппетам или None, если их не хватает для ответа"""
+        texts = [f"{snippet['title']}\n{snippet['snippet']}" for snippet in snippets]
+        if not self.adaptive_depth or not snippets_suffice(query, texts):
+            return None
+        logger.info(f"Сниппетов достаточно, страницы не загружаются: {query}")
+        result = self.build_analysis_result(query, texts, [snippet["url"] for snippet in snippets])
+        result["source"] = "snippets"
+        return result
     
     def _fallback_search(self, query: str, max_results: int = 5) -> List[str]:
         """Fallback поиск через простые источники"""
@@ -141,120 +171,123 @@ class AdvancedWebSearch:
         """Извлечение и очистка текста с веб-страницы"""
         try:
             logger.info(f"Загрузка: {url}")
-            response = self.session.get(url, timeout=15)
+            response = self.session.get(url, timeout=15, **self.page_fetch_options())
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            # Удаляем ненужные элементы
-            for element in soup(["script", "style", "noscript", "nav", "footer", "header", "aside"]):
-                element.decompose()
-            
-            # Удаляем элементы с классами рекламы и навигации
-            for element in soup.find_all(class_=re.compile(r"(ad|advertisement|banner|menu|navigation|sidebar|footer|header)")):
-                element.decompose()
-            
-            # Извлекаем основной контент
-            main_content = soup.find("main") or soup.find("article") or soup.find("div", class_=re.compile(r"(content|main|article)"))
-            
-            if main_content:
-                text = main_content.get_text(separator="\n", strip=True)
-            else:
-                text = soup.get_text(separator="\n", strip=True)
-            
-            # Очистка текста
-            lines = [line.strip() for line in text.split('\n') if line.strip()]
-            text = '\n'.join(lines)
-            
-            # Ограничиваем размер
-            return text[:5000]  # Увеличили лимит для лучшего контекста
+            return self.extract_text(response.text)
             
         except Exception as e:
             logger.error(f"Ошибка загрузки {url}: {e}")
             return ""
     
-    def cache_path(self, key: str) -> str:
-        """Получить путь к файлу кэша"""
-        return os.path.join(CACHE_DIR, hashlib.md5(key.encode()).hexdigest() + ".txt")
+    @staticmethod
+    def page_fetch_options() -> Dict[str, Any]:
+        """Потоковая загрузка страницы: лимит байт и остановка по набранному тексту"""
+        return {
+            "max_bytes": MAX_PAGE_BYTES,
+            "enough": TextBudget(EXTRACT_TEXT_LIMIT * EARLY_STOP_TEXT_FACTOR),
+        }
     
-    def get_cached_or_fetch(self, url: str) -> str:
-        """Получить данные из кэша или загрузить"""
-        cache_file = self.cache_path(url)
-        
-        # Проверяем кэш (действителен 24 часа)
-        if os.path.exists(cache_file):
-            file_age = time.time() - os.path.getmtime(cache_file)
-            if file_age < 86400:  # 24 часа
-                try:
-                    with open(cache_file, "r", encoding="utf-8") as f:
-                        content = f.read()
-                    logger.info(f"Загружено из кэша: {url}")
-                    return content
-                except Exception as e:
-                    logger.warning(f"Ошибка чтения кэша {url}: {e}")
-        
-        # Загружаем и кэшируем
-        content = self.fetch_text(url)
+    def extract_text(self, html: str) -> str:
+        """Очистка HTML и извлечение основного текста"""
+        # Большие страницы разбираются в пуле процессов
+        return cpu_pool.run(extract_main_text, html, EXTRACT_TEXT_LIMIT, size=len(html))
+    
+    def read_cache(self, url: str) -> Optional[CacheLookup]:
+        """Прочитать запись из дискового кэша (в том числе устаревшую, но перепроверяемую)"""
+        try:
+            cached = self.disk_cache.lookup(url)
+        except Exception as e:
+            logger.warning(f"Ошибка чтения кэша {url}: {e}")
+            return None
+        if cached is not None and cached.fresh:
+            logger.info(f"Загружено из кэша: {url}")
+        return cached
+    
+    def write_cache(self, url: str, content: str, validators: Optional[Dict[str, str]] = None) -> None:
+        """Сохранить контент в кэш вместе с ETag / Last-Modified"""
         if content:
             try:
-                with open(cache_file, "w", encoding="utf-8") as f:
-                    f.write(content)
+                self.disk_cache.set(url, content, validators=validators)
                 logger.info(f"Сохранено в кэш: {url}")
             except Exception as e:
                 logger.warning(f"Ошибка записи в кэш {url}: {e}")
+            try:
+                self.local_index.add(url, content)
+            except Exception as e:
+                logger.warning(f"Ошибка индексации {url}: {e}")
+    
+    def refresh_cache(self, url: str, validators: Optional[Dict[str, str]] = None) -> None:
+        """Продлить запись кэша после ответа 304"""
+        try:
+            self.disk_cache.refresh(url, validators=validators)
+            self.local_index.touch(url)
+            logger.info(f"Кэш подтвержден сервером: {url}")
+        except Exception as e:
+            logger.warning(f"Ошибка обновления кэша {url}: {e}")
+    
+    def load_content(self, url: str) -> Tuple[str, bool]:
+        """Получить данные из кэша или загрузить; второй элемент — попадание в кэш"""
+        cached = self.read_cache(url)
+        if cached is not None and cached.fresh:
+            return cached.value, True
         
-        return content
+        try:
+            logger.info(f"Загрузка: {url}")
+            # Устаревшую запись перепроверяем условным запросом
+            response = self.session.get(
+                url,
+                headers=conditional_headers(cached and cached.validators),
+                timeout=15,
+                **self.page_fetch_options(),
+            )
+            if cached is not None and response.status_code == 304:
+                # Страница не изменилась — продлеваем запись без загрузки и разбора
+                self.refresh_cache(url, response_validators(response))
+                return cached.value, True
+            response.raise_for_status()
+            content = self.extract_text(response.text)
+        except Exception as e:
+            logger.error(f"Ошибка загрузки {url}: {e}")
+            return "", False
+        
+        # Кэшируем
+        self.write_cache(url, content, response_validators(response))
+        
+        return content, False
     
-    def rank_contexts(self, query: str, docs: List[str]) -> List[str]:
-        """Ранжирование документов по релевантности с помощью TF-IDF"""
+    def get_cached_or_fetch(self, url: str) -> str:
+        """Получить данные из кэша или загрузить"""
+        return self.load_content(url)[0]
+    
+    def find_passages(self, query: str, documents: List[Tuple[str, str]]) -> List[Passage]:
+        """Лучшие фрагменты загруженных страниц (url, текст) по BM25"""
         try:
-            if not docs or not any(doc.strip() for doc in docs):
-                return docs
-            
-            # Подготавливаем документы
-            clean_docs = [doc.strip() for doc in docs if doc.strip()]
-            if not clean_docs:
-                return docs
-            
-            # Создаем векторizer с русскими стоп-словами
-            stop_words = [
-                'и', 'в', 'во', 'не', 'что', 'он', 'на', 'я', 'с', 'со', 'как', 'а', 'то', 'все', 'она', 'так', 'его', 'но', 'да', 'ты', 'к', 'у', 'же', 'вы', 'за', 'бы', 'по', 'только', 'ее', 'мне', 'было', 'вот', 'от', 'меня', 'еще', 'нет', 'о', 'из', 'ему', 'теперь', 'когда', 'даже', 'ну', 'вдруг', 'ли', 'если', 'уже', 'или', 'ни', 'быть', 'был', 'него', 'до', 'вас', 'нибудь', 'опять', 'уж', 'вам', 'ведь', 'там', 'потом', 'себя', 'ничего', 'ей', 'может', 'они', 'тут', 'где', 'есть', 'надо', 'ней', 'для', 'мы', 'тебя', 'их', 'чем', 'была', 'сам', 'чтоб', 'без', 'будто', 'чего', 'раз', 'тоже', 'себе', 'под', 'будет', 'ж', 'тогда', 'кто', 'этот', 'того', 'потому', 'этого', 'какой', 'совсем', 'ним', 'здесь', 'этом', 'один', 'почти', 'мой', 'тем', 'чтобы', 'нее', 'сейчас', 'были', 'куда', 'зачем', 'всех', 'никогда', 'можно', 'при', 'наконец', 'два', 'об', 'другой', 'хоть', 'после', 'над', 'больше', 'тот', 'через', 'эти', 'нас', 'про', 'всего', 'них', 'какая', 'много', 'разве', 'три', 'эту', 'моя', 'впрочем', 'хорошо', 'свою', 'этой', 'перед', 'иногда', 'лучше', 'чуть', 'том', 'нельзя', 'такой', 'им', 'более', 'всегда', 'конечно', 'всю', 'между'
-            ]
-            
-            vectorizer = TfidfVectorizer(
-                stop_words=stop_words,
-                max_features=1000,
-                ngram_range=(1, 2)
+            # Оценка большого набора страниц выполняется в пуле процессов
+            return cpu_pool.run(
+                retrieve_passages, query, documents, size=sum(len(text) for _, text in documents)
             )
-            
-            # Добавляем запрос к документам для векторизации
-            all_texts = [query] + clean_docs
-            
-            try:
-                vectors = vectorizer.fit_transform(all_texts)
-                scores = cosine_similarity(vectors[0:1], vectors[1:]).flatten()
-                
-                # Сортируем по релевантности
-                scored_docs = sorted(zip(scores, clean_docs), key=lambda x: -x[0])
-                ranked_docs = [doc for _, doc in scored_docs]
-                
-                logger.info(f"Ранжирование завершено. Лучший скор: {max(scores) if len(scores) > 0 else 0:.3f}")
-                return ranked_docs
-                
-            except Exception as e:
-                logger.warning(f"Ошибка TF-IDF ранжирования: {e}")
-                return clean_docs
-                
         except Exception as e:
-            logger.error(f"Ошибка ранжирования контекстов: {e}")
-            return docs
+            logger.error(f"Ошибка поиска фрагментов: {e}")
+            return []
+    
+    def search_local(self, query: str, max_results: int = 5) -> Optional[Dict[str, Any]]:
+        """Результат поиска по локальному индексу или None, если страниц мало"""
+        pages = self.local_index.lookup(query, max_results)
+        if not pages:
+            return None
+        result = self.build_analysis_result(
+            query, [text for _, text in pages], [url for url, _ in pages], cache_hits=len(pages)
+        )
+        result["source"] = "local_index"
+        return result
     
     def search_and_analyze(self, query: str, max_results: int = 5) -> Dict[str, Any]:
         """Основная функция поиска и анализа"""
         logger.info(f"🔍 Начинаем продвинутый поиск: {query}")
         
         # Поиск ссылок
-        links = self.duck_search(query, max_results)
+        links, snippets = self.duck_search_with_snippets(query, max_results)
         if not links:
             return {
                 "error": "Не удалось найти результаты поиска",
@@ -262,16 +295,27 @@ class AdvancedWebSearch:
                 "results": []
             }
         
-        # Загрузка и кэширование контента
-        raw_docs = []
-        successful_links = []
+        # Простые фактические вопросы закрываются сниппетами без загрузки страниц
+        snippet_result = self.snippet_result(query, snippets)
+        if snippet_result is not None:
+            return snippet_result
         
-        for link in links:
-            content = self.get_cached_or_fetch(link)
-            if content:
-                raw_docs.append(content)
-                successful_links.append(link)
+        # Параллельная загрузка и кэширование контента
+        contents = [None] * len(links)
+        cache_hits = 0
+        for index, _, loaded in polite_fetch_all(links, self.load_content):
+            if loaded is not None:
+                contents[index], from_cache = loaded
+                cache_hits += from_cache
+        raw_docs = [content for content in contents if content]
+        successful_links = [link for link, content in zip(links, contents) if content]
         
+        return self.build_analysis_result(query, raw_docs, successful_links, cache_hits)
+    
+    def build_analysis_result(
+        self, query: str, raw_docs: List[str], successful_links: List[str], cache_hits: int = 0
+    ) -> Dict[str, Any]:
+        """Ранжировать загруженные документы и сформировать результат поиска"""
         if not raw_docs:
             return {
                 "error": "Не удалось загрузить контент с найденных страниц",
@@ -279,17 +323,28 @@ class AdvancedWebSearch:
                 "results": []
             }
         
-        # Ранжирование по релевантности
-        ranked_docs = self.rank_contexts(query, raw_docs)
+        # Документы остаются связанными со своими URL; зеркала и перепечатки отбрасываются
+        documents, duplicates = drop_near_duplicates(
+            list(zip(successful_links, raw_docs)), lambda document: document[1]
+        )
+        if duplicates:
+            logger.info(f"Отброшено почти одинаковых страниц: {duplicates}")
+        passages = self.find_passages(query, documents)
+        by_url = group_by_url(passages)
+        
+        # Страницы упорядочены по сумме оценок отобранных фрагментов
+        doc_scores = {url: sum(p.score for p in by_url.get(url, [])) for url, _ in documents}
+        best_score = max(doc_scores.values()) or 1.0
+        ranked = sorted(documents, key=lambda item: -doc_scores[item[0]])
         
-        # Формируем результат
         results = []
-        for i, (doc, link) in enumerate(zip(ranked_docs, successful_links)):
+        for i, (link, doc) in enumerate(ranked):
             results.append({
                 "rank": i + 1,
                 "url": link,
                 "content": doc,
-                "relevance_score": 1.0 - (i * 0.1)  # Простой скор на основе ранга
+                "relevance_score": round(doc_scores[link] / best_score, 3),
+                "passages": [passage._asdict() for passage in by_url.get(link, [])],
             })
         
         logger.info(f"✅ Поиск завершен. Обработано {len(results)} результатов")
@@ -298,7 +353,9 @@ class AdvancedWebSearch:
             "query": query,
             "total_results": len(results),
             "results": results,
-            "cache_hits": len([f for f in os.listdir(CACHE_DIR) if f.endswith('.txt')]) if os.path.exists(CACHE_DIR) else 0
+            "passages": [passage._asdict() for passage in passages],
+            "duplicates_removed": duplicates,
+            "cache_hits": cache_hits
         }
 
 # Глобальный экземпляр для использования
@@ -308,6 +365,13 @@ def get_advanced_web_search(query: str, max_results: int = 5) -> Dict[str, Any]:
     """Получить результаты продвинутого веб-поиска"""
     return advanced_search.search_and_analyze(query, max_results)
 
+def result_excerpt(result: Dict[str, Any], fallback_chars: int) -> str:
+    """Релевантные фрагменты результата или, если их нет, начало страницы"""
+    passages = result.get("passages")
+    if passages:
+        return "\n…\n".join(passage["text"] for passage in passages)
+    return f"{result.get('content', '')[:fallback_chars]}..."
+
 def format_advanced_search_results(search_data: Dict[str, Any]) -> str:
     """Форматировать результаты продвинутого поиска для AI"""
     if "error" in search_data:
@@ -318,12 +382,12 @@ def format_advanced_search_results(search_data: Dict[str, Any]) -> str:
     
     formatted_text = f"🌐 ПРОДВИНУТЫЙ ВЕБ-ПОИСК ПО ЗАПРОСУ '{search_data['query']}':\n"
     formatted_text += f"📊 Найдено результатов: {search_data['total_results']}\n"
-    formatted_text += f"💾 Кэш-файлов: {search_data.get('cache_hits', 0)}\n\n"
+    formatted_text += f"💾 Из кэша: {search_data.get('cache_hits', 0)}\n\n"
     
     for result in search_data["results"][:3]:  # Топ-3 результата
         formatted_text += f"### Результат #{result['rank']}\n"
         formatted_text += f"🔗 URL: {result['url']}\n"
         formatted_text += f"📈 Релевантность: {result['relevance_score']:.2f}\n"
-        formatted_text += f"📄 Контент:\n{result['content'][:1000]}...\n\n"
+        formatted_text += f"📄 Контент:\n{result_excerpt(result, 1000)}\n\n"
     
     return formatted_text
@@ -2,6 +2,8 @@
 AI Configuration - единый конфиг для system-prompt и настроек генерации
 """
 
+from utils.intent_classifier import classify_intents
+
 # Умный гибкий системный промпт
 UNIVERSAL_SYSTEM_PROMPT = {
     "role": "system",
@@ -82,13 +84,7 @@ def get_system_prompt() -> dict:
 def get_enhanced_user_prompt(user_question: str) -> str:
     """Умная обработка запроса пользователя с учетом контекста."""
     # Проверяем, является ли запрос задачей для выполнения
-    task_indicators = [
-        'создай', 'сделай', 'напиши', 'реализуй', 'разработай', 'настрой',
-        'установи', 'запусти', 'сгенерируй', 'проект', 'приложение', 'система',
-        'база данных', 'скрипт', 'код', 'программа', 'инструмент'
-    ]
-
-    is_task = any(indicator in user_question.lower() for indicator in task_indicators)
+    is_task = "task" in classify_intents(user_question)
 
     if is_task:
         # Для задач используем ETE-подход
@@ -5,6 +5,8 @@ from typing import Any, Dict
 import pytz
 import requests
 
+from utils.intent_classifier import classify_intents
+
 
 def generate_ai_response(message: str, model: str) -> str:
     """Generate AI response using WIndexAI API with fallback"""
@@ -151,55 +153,13 @@ def generate_fallback_response(message: str) -> str:
 
 def should_search_web(message: str) -> bool:
     """Определяет, нужен ли веб-поиск для сообщения"""
-    keywords = [
-        "найди",
-        "поиск",
-        "актуальн",
-        "новости",
-        "сейчас",
-        "сегодня",
-        "последние",
-        "тренд",
-        "курс",
-        "погода",
-        "цены",
-        "события",
-        "что происходит",
-        "как дела",
-        "статистика",
-        "данные",
-        "информация о",
-        "расскажи про",
-        "что нового",
-    ]
-    text = message.lower()
-    return any(k in text for k in keywords)
+    intents = classify_intents(message)
+    return "search_keywords" in intents or "status_question" in intents
 
 
 def should_create_website(message: str) -> bool:
     """Определяет, просит ли пользователь создать сайт"""
-    keywords = [
-        "создай сайт",
-        "сделай сайт",
-        "лендинг",
-        "веб-сайт",
-        "страницу",
-        "сайт для",
-        "сайт о",
-        "дизайн сайта",
-        "сайт компании",
-        "сайт-визитка",
-        "интернет-магазин",
-        "портал",
-        "блог",
-        "сайт-одностраничник",
-        "сайт с нуля",
-        "web-сайт",
-        "сайт на заказ",
-        "сайт под ключ",
-    ]
-    text = message.lower()
-    return any(k in text for k in keywords)
+    return "create_website" in classify_intents(message)
 
 
 def extract_search_query(message: str) -> str:
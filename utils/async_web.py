@@ -0,0 +1,517 @@
+"""
+Асинхронный веб-поиск через общий HTTP-транспорт для обработчиков FastAPI
+
+Повторяет логику синхронных WebSearchEngine, WebParser, AdvancedWebSearch и
+UniversalWebParser, но выполняет сетевые запросы без блокировки event loop.
+Разбор HTML переиспользует методы синхронных классов, поэтому результаты
+обоих API совпадают по формату; большие страницы разбираются в пуле
+процессов (utils.cpu_pool).
+
+Одинаковые одновременные запросы на каждом уровне поиска объединяются
+(utils.singleflight), чтобы всплеск популярного запроса не размножал
+обращения к ЦБ, CoinGecko и поисковикам.
+"""
+
+import asyncio
+import functools
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import httpx
+
+from utils.advanced_web_search import EXTRACT_TEXT_LIMIT, advanced_search
+from utils.content_extractor import extract_main_text
+from utils.cpu_pool import cpu_pool
+from utils.hedged_retrieval import (ENGINE_HEDGE_DELAY_SECONDS,
+                                    TIER_HEDGE_DELAY_SECONDS, hedged_first)
+from utils.http_transport import (EARLY_STOP_TEXT_FACTOR, MAX_PAGE_BYTES,
+                                  HTTPTransport, TextBudget,
+                                  conditional_headers, http_transport,
+                                  response_validators)
+from utils.live_data import (CRYPTO_REFRESH_SECONDS, EXCHANGE_REFRESH_SECONDS,
+                             LiveDataRefresher, live_data)
+from utils.news_index import (NEWS_FEEDS, NEWS_PAGE_HEADLINES,
+                              NEWS_REFRESH_SECONDS, NewsIndex, NewsSource,
+                              ingest_news, news_index, news_result,
+                              parse_feed, parse_headlines_html)
+from utils.polite_fetch import async_polite_fetch_all
+from utils.singleflight import coalesce
+from utils.universal_parser import parse_html_content, universal_parser
+from utils.upstream_health import engine_health
+from utils.web_parser import (CBR_URL, COINGECKO_URL, SPECIALIZED_KEYS,
+                              web_parser)
+from utils.web_search import extract_page_text, web_search_engine
+
+logger = logging.getLogger(__name__)
+
+
+def _tier_is_satisfactory(tier: str, result: Dict[str, Any]) -> bool:
+    """Подходит ли результат уровня поиска для ответа"""
+    if "error" in result:
+        return False
+    if tier == "specialized":
+        return any(key in result for key in SPECIALIZED_KEYS)
+    if tier == "advanced":
+        return bool(result.get("results"))
+    return True
+
+
+class AsyncWebRetriever:
+    """Асинхронный веб-поиск и парсинг"""
+
+    def __init__(
+        self,
+        timeout: float = 10.0,
+        live_data: Optional[LiveDataRefresher] = None,
+        transport: Optional[HTTPTransport] = None,
+        news_index: Optional[NewsIndex] = None,
+        news_sources: Optional[List[NewsSource]] = None,
+    ):
+        self.timeout = timeout
+        # Общий пул соединений с синхронными парсерами
+        self.transport = transport or http_transport
+        # Курсы валют и криптовалют держатся в памяти и обновляются по расписанию
+        self.live_data = live_data or LiveDataRefresher()
+        self.live_data.register("crypto", self.fetch_crypto_prices, CRYPTO_REFRESH_SECONDS)
+        self.live_data.register("exchange", self.fetch_exchange_rates, EXCHANGE_REFRESH_SECONDS)
+        # Новости собираются в индекс в фоне и отдаются из памяти
+        self.news_index = news_index if news_index is not None else NewsIndex()
+        self.news_sources = NEWS_FEEDS if news_sources is None else news_sources
+        self.live_data.register("news", self.fetch_news, NEWS_REFRESH_SECONDS)
+
+    async def aclose(self) -> None:
+        """Закрыть HTTP-клиент"""
+        await self.transport.aclose()
+
+    async def fetch(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        **stream_options: Any,
+    ) -> httpx.Response:
+        """GET-запрос с проверкой статуса
+
+        stream_options (max_bytes, enough) включают потоковое чтение тела.
+        Запросы к поисковикам и API ограничены только пулом соединений
+        транспорта; вежливость к хостам (utils.polite_fetch) применяется к
+        загрузке страниц выдачи.
+        """
+        response = await self.transport.aget(
+            url, headers=headers, timeout=timeout or self.timeout, **stream_options
+        )
+        # 304 приходит только на условный запрос и означает, что кэш актуален
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
+
+    async def fetch_text(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        **stream_options: Any,
+    ) -> Optional[str]:
+        """Получить текст страницы или None при ошибке"""
+        try:
+            response = await self.fetch(url, headers=headers, timeout=timeout, **stream_options)
+            return response.text
+        except Exception as e:
+            logger.error(f"Ошибка при получении страницы {url}: {e}")
+            return None
+
+    # --- WebSearchEngine ---
+
+    async def search_links(self, query: str, num_results: int = 5) -> List[Dict[str, str]]:
+        """Поиск по поисковикам (DuckDuckGo, Bing, Google с хеджированием)"""
+        headers = dict(web_search_engine.session.headers)
+        engines = [
+            (
+                "duckduckgo",
+                f"https://html.duckduckgo.com/html/?q={query}",
+                web_search_engine.parse_duckduckgo_results,
+            ),
+            (
+                "bing",
+                f"https://www.bing.com/search?q={query}&count={num_results}",
+                web_search_engine.parse_bing_results,
+            ),
+            (
+                "google",
+                f"https://www.google.com/search?q={query}&num={num_results}",
+                web_search_engine.parse_google_results,
+            ),
+        ]
+
+        async def run_engine(name: str, search_url: str, parse) -> List[Dict[str, str]]:
+            started = time.monotonic()
+            html = await self.fetch_text(search_url, headers=headers, timeout=10)
+            try:
+                results = parse(html, num_results) if html else []
+            except Exception:
+                results = []
+            # Пустая выдача (капча, блокировка) считается ошибкой поисковика
+            engine_health.record(name, bool(results), time.monotonic() - started)
+            return results
+
+        # Поисковики запускаются с хеджированием, побеждает первый непустой ответ;
+        # поисковики с разомкнутым выключателем пропускаются
+        allowed = [
+            (name, functools.partial(run_engine, name, search_url, parse))
+            for name, search_url, parse in engines
+            if engine_health.allow(name)
+        ]
+        hedged = await hedged_first(
+            "engines",
+            allowed,
+            accept=lambda name, results: bool(results),
+            hedge_delay=ENGINE_HEDGE_DELAY_SECONDS,
+        )
+        # Незапущенные и отмененные попытки ничего не говорят о поисковике:
+        # пробный запрос переносится на следующий поиск
+        for name, _ in allowed:
+            if name not in hedged.results:
+                engine_health.cancel(name)
+        if hedged.winner is None:
+            return []
+        return web_search_engine.deduplicate_results(hedged.value)[:num_results]
+
+    async def fetch_page_content(self, url: str, max_length: int = 2000) -> str:
+        """Получение очищенного текста страницы"""
+        html = await self.fetch_text(
+            url,
+            headers=dict(web_search_engine.session.headers),
+            timeout=15,
+            max_bytes=MAX_PAGE_BYTES,
+            enough=TextBudget(max_length * EARLY_STOP_TEXT_FACTOR),
+        )
+        if not html:
+            return ""
+        try:
+            return await cpu_pool.arun(extract_page_text, html, max_length, size=len(html))
+        except Exception:
+            return ""
+
+    @coalesce("search_web")
+    async def search_web(self, query: str, num_results: int = 3) -> List[Dict[str, str]]:
+        """Поиск и получение содержимого страниц"""
+        search_results = await self.search_links(query, num_results)
+        if web_search_engine.snippets_answer(query, search_results):
+            return web_search_engine.snippet_results(search_results)
+        contents = [""] * len(search_results)
+        async for index, _, content in async_polite_fetch_all(
+            [result["url"] for result in search_results], self.fetch_page_content
+        ):
+            contents[index] = content or ""
+
+        return web_search_engine.drop_duplicate_pages([
+            {
+                "title": result["title"],
+                "url": result["url"],
+                "description": result["description"],
+                "content": content,
+            }
+            for result, content in zip(search_results, contents)
+        ])
+
+    # --- WebParser ---
+
+    async def _get_cached_page(self, url: str) -> Optional[str]:
+        """Страница через общий кэш страниц WebParser"""
+        cached = web_parser.cache.lookup(url)
+        if cached is not None and cached.fresh:
+            return cached.value
+
+        try:
+            # Устаревшую запись перепроверяем условным запросом
+            response = await self.fetch(
+                url,
+                headers={
+                    **web_parser.session.headers,
+                    **conditional_headers(cached and cached.validators),
+                },
+                max_bytes=MAX_PAGE_BYTES,
+            )
+        except Exception as e:
+            logger.error(f"Ошибка при получении страницы {url}: {e}")
+            return None
+        if cached is not None and response.status_code == 304:
+            web_parser.cache.refresh(url, validators=response_validators(response))
+            return cached.value
+        web_parser.cache.set(url, response.text, validators=response_validators(response))
+        return response.text
+
+    async def get_crypto_prices(self) -> Dict[str, Any]:
+        """Курсы криптовалют из памяти (обновляются в фоне)"""
+        return await self.live_data.get("crypto")
+
+    async def fetch_crypto_prices(self) -> Dict[str, Any]:
+        """Загрузить курсы криптовалют из CoinGecko"""
+        try:
+            response = await self.fetch(COINGECKO_URL, headers=dict(web_parser.session.headers))
+            return web_parser.parse_crypto_prices(response.json())
+        except Exception as e:
+            logger.error(f"Ошибка при получении курсов криптовалют: {e}")
+            return {"error": str(e)}
+
+    async def get_exchange_rates(self) -> Dict[str, Any]:
+        """Курсы валют ЦБ РФ из памяти (обновляются в фоне)"""
+        return await self.live_data.get("exchange")
+
+    async def fetch_exchange_rates(self) -> Dict[str, Any]:
+        """Загрузить курсы валют ЦБ РФ"""
+        try:
+            response = await self.fetch(CBR_URL, headers=dict(web_parser.session.headers))
+            return web_parser.parse_exchange_rates(response.json())
+        except Exception as e:
+            logger.error(f"Ошибка при получении курсов валют: {e}")
+            return {"error": str(e)}
+
+    @coalesce("news")
+    async def get_news(self, query: str = "", limit: int = 5) -> Dict[str, Any]:
+        """Новости по теме вопроса из индекса (обновляется в фоне)"""
+        # Ждать источники приходится, только пока индекс пуст или слишком стар
+        await self.live_data.get("news")
+        return news_result(self.news_index, query, limit)
+
+    async def fetch_news(self) -> Dict[str, Any]:
+        """Загрузить ленты новостей (или главные страницы) в индекс"""
+        headers = dict(web_parser.session.headers)
+
+        async def pull(source: NewsSource) -> List[Dict[str, Any]]:
+            news: List[Dict[str, Any]] = []
+            if source.feed_url:
+                xml = await self.fetch_text(
+                    source.feed_url, headers=headers, max_bytes=MAX_PAGE_BYTES
+                )
+                if xml:
+                    news = await cpu_pool.arun(parse_feed, xml, source.page_url, size=len(xml))
+            if not news:
+                html = await self.fetch_text(
+                    source.page_url, headers=headers, max_bytes=MAX_PAGE_BYTES
+                )
+                if html:
+                    news = await cpu_pool.arun(
+                        parse_headlines_html, html, source.page_url, NEWS_PAGE_HEADLINES,
+                        size=len(html),
+                    )
+            return news
+
+        batches = await asyncio.gather(*(pull(source) for source in self.news_sources))
+        return ingest_news(self.news_index, self.news_sources, batches)
+
+    @coalesce("duckduckgo")
+    async def duckduckgo_search(self, query: str, limit: int = 5) -> Dict[str, Any]:
+        """Поиск DuckDuckGo в формате WebParser.search_web"""
+        html = await self._get_cached_page(f"https://html.duckduckgo.com/html/?q={query}")
+        if not html:
+            return {"error": "Не удалось получить результаты поиска"}
+        try:
+            return {
+                "timestamp": datetime.now().isoformat(),
+                "query": query,
+                "results": web_parser.parse_search_html(html, limit),
+            }
+        except Exception as e:
+            logger.error(f"Ошибка при поиске в интернете: {e}")
+            return {"error": str(e)}
+
+    async def parse_general_info(self, topic: str) -> Dict[str, Any]:
+        """Специализированные данные по теме запроса"""
+        topic_type = web_parser.classify_topic(topic)
+
+        if topic_type == "crypto":
+            return await self.get_crypto_prices()
+        elif topic_type == "exchange":
+            return await self.get_exchange_rates()
+        elif topic_type == "news":
+            return await self.get_news(topic)
+        elif topic_type == "weather":
+            return web_parser.get_weather()
+        return await self.duckduckgo_search(topic)
+
+    # --- AdvancedWebSearch ---
+
+    async def _load_advanced_content(self, url: str) -> Tuple[str, bool]:
+        """Текст страницы через дисковый кэш AdvancedWebSearch и признак попадания в кэш"""
+        cached = await asyncio.to_thread(advanced_search.read_cache, url)
+        if cached is not None and cached.fresh:
+            return cached.value, True
+
+        try:
+            # Устаревшую запись перепроверяем условным запросом
+            response = await self.fetch(
+                url,
+                headers={
+                    **advanced_search.session.headers,
+                    **conditional_headers(cached and cached.validators),
+                },
+                timeout=15,
+                **advanced_search.page_fetch_options(),
+            )
+            if cached is not None and response.status_code == 304:
+                await asyncio.to_thread(
+                    advanced_search.refresh_cache, url, response_validators(response)
+                )
+                return cached.value, True
+            content = await cpu_pool.arun(
+                extract_main_text, response.text, EXTRACT_TEXT_LIMIT, size=len(response.text)
+            )
+        except Exception as e:
+            logger.error(f"Ошибка загрузки {url}: {e}")
+            return "", False
+        await asyncio.to_thread(
+            advanced_search.write_cache, url, content, response_validators(response)
+        )
+        return content, False
+
+    @coalesce("advanced")
+    async def advanced_search(self, query: str, max_results: int = 5) -> Dict[str, Any]:
+        """Продвинутый поиск с ранжированием"""
+        links: List[str] = []
+        snippets: List[Dict[str, str]] = []
+        if engine_health.allow("duckduckgo"):
+            started = time.monotonic()
+            try:
+                html = await self.fetch_text(
+                    f"https://html.duckduckgo.com/html/?q={quote(query)}",
+                    headers=dict(advanced_search.session.headers),
+                    timeout=15,
+                )
+            except asyncio.CancelledError:
+                engine_health.cancel("duckduckgo")
+                raise
+            if html:
+                links = advanced_search.extract_duck_links(html)[:max_results]
+                if links:
+                    snippets = advanced_search.extract_duck_snippets(html)[:max_results]
+            engine_health.record("duckduckgo", bool(links), time.monotonic() - started)
+        if not links:
+            links = advanced_search._fallback_search(query, max_results)
+        if not links:
+            return {"error": "Не удалось найти результаты поиска", "query": query, "results": []}
+
+        # Простые фактические вопросы закрываются сниппетами без загрузки страниц
+        snippet_result = await asyncio.to_thread(advanced_search.snippet_result, query, snippets)
+        if snippet_result is not None:
+            return snippet_result
+
+        loaded: List[Tuple[str, bool]] = [("", False)] * len(links)
+        async for index, _, result in async_polite_fetch_all(links, self._load_advanced_content):
+            loaded[index] = result or ("", False)
+        raw_docs = [content for content, _ in loaded if content]
+        successful_links = [link for link, (content, _) in zip(links, loaded) if content]
+        cache_hits = sum(from_cache for _, from_cache in loaded)
+
+        # Ранжирование не должно занимать event loop
+        return await asyncio.to_thread(
+            advanced_search.build_analysis_result, query, raw_docs, successful_links, cache_hits
+        )
+
+    # --- UniversalWebParser ---
+
+    @coalesce("universal")
+    async def universal_search(self, query: str, num_results: int = 5) -> Dict[str, Any]:
+        """Поиск и парсинг результатов"""
+        headers = dict(universal_parser.session.headers)
+        html = await self.fetch_text(
+            f"https://html.duckduckgo.com/html/?q={query}", headers=headers, timeout=15
+        )
+        if not html:
+            return {"error": "Не удалось получить результаты поиска"}
+
+        hits = universal_parser.parse_search_results_html(html, num_results)
+
+        async def parse_hit(url: str) -> Dict[str, Any]:
+            page = await self.fetch_text(url, headers=headers, timeout=15, max_bytes=MAX_PAGE_BYTES)
+            if not page:
+                return {"error": "Не удалось получить содержимое страницы"}
+            try:
+                return await cpu_pool.arun(parse_html_content, page, url, size=len(page))
+            except Exception as e:
+                return {"error": str(e)}
+
+        pages: List[Dict[str, Any]] = [{} for _ in hits]
+        urls = [hit["url"] for hit in hits if hit["url"]]
+        positions = [index for index, hit in enumerate(hits) if hit["url"]]
+        async for index, _, page in async_polite_fetch_all(urls, parse_hit):
+            pages[positions[index]] = page or {}
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "query": query,
+            "results": [{**hit, "parsed_content": page} for hit, page in zip(hits, pages)],
+        }
+
+    # --- Комплексный поиск ---
+
+    @coalesce("comprehensive")
+    async def get_comprehensive_web_info(self, topic: str) -> Dict[str, Any]:
+        """Асинхронный аналог get_comprehensive_web_info"""
+        # Общие вопросы сначала ищем среди уже загруженных страниц
+        if web_parser.classify_topic(topic) == "search":
+            local = await asyncio.to_thread(advanced_search.search_local, topic)
+            if local:
+                return {
+                    "timestamp": datetime.now().isoformat(),
+                    "search_type": "advanced_search",
+                    "source": "local_index",
+                    "query": topic,
+                    "results": local["results"],
+                    "total_results": local["total_results"],
+                    "cache_hits": local["cache_hits"],
+                }
+
+        try:
+            # Уровни поиска запускаются с хеджированием вместо последовательного перебора
+            hedged = await hedged_first(
+                "tiers",
+                [
+                    ("specialized", lambda: self.parse_general_info(topic)),
+                    ("advanced", lambda: self.advanced_search(topic, max_results=5)),
+                    ("universal", lambda: self.universal_search(topic, num_results=3)),
+                ],
+                accept=_tier_is_satisfactory,
+                hedge_delay=TIER_HEDGE_DELAY_SECONDS,
+            )
+        except Exception as e:
+            logger.error(f"Ошибка при получении комплексной информации: {e}")
+            return {"error": str(e)}
+
+        if hedged.winner == "specialized":
+            return hedged.value
+        if hedged.winner == "advanced":
+            return {
+                "timestamp": datetime.now().isoformat(),
+                "search_type": "advanced_search",
+                "source": hedged.value.get("source", "web"),
+                "query": topic,
+                "results": hedged.value["results"],
+                "total_results": hedged.value["total_results"],
+                "cache_hits": hedged.value.get("cache_hits", 0),
+            }
+        if hedged.winner == "universal":
+            return {
+                "timestamp": datetime.now().isoformat(),
+                "search_type": "universal_search",
+                "search_results": hedged.value,
+            }
+        return hedged.results.get(
+            "specialized", {"error": "Не удалось получить информацию из интернета"}
+        )
+
+
+# Глобальный экземпляр асинхронного поисковика
+async_web_retriever = AsyncWebRetriever(live_data=live_data, news_index=news_index)
+
+
+async def async_search_web(query: str, num_results: int = 3) -> List[Dict[str, str]]:
+    """Асинхронный поиск в интернете с содержимым страниц"""
+    return await async_web_retriever.search_web(query, num_results)
+
+
+async def async_get_comprehensive_web_info(topic: str) -> Dict[str, Any]:
+    """Асинхронно получить комплексную информацию из интернета"""
+    return await async_web_retriever.get_comprehensive_web_info(topic)
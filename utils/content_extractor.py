@@ -0,0 +1,263 @@
+"""
+Быстрое извлечение основного текста веб-страниц
+
+Раньше каждый парсер разбирал страницу BeautifulSoup на html.parser и
+очищал ее в несколько проходов: удалял script/style/nav, затем искал
+регулярным выражением рекламные классы по всем элементам, затем заново
+искал main/article. Здесь страница разбирается lxml, а служебные блоки
+отбрасываются за один обход дерева, который одновременно считает
+плотность текста (в духе Readability):
+- блоки с текстом (p, li, pre, ...) добавляют очки родителю и, вдвое
+  меньше, прародителю;
+- очки контейнера умножаются на долю текста вне ссылок;
+- основной текст берется из контейнера с наибольшим счетом; если он
+  лежит внутри article/main или блока с «контентным» классом либо рядом
+  с заголовком h1 (карточка товара с ценой и характеристиками), берется
+  этот предок;
+- заголовок страницы (h1, иначе title) всегда идет первой строкой.
+
+Для разбора по селекторам есть make_soup() — BeautifulSoup на lxml.
+"""
+
+import re
+from typing import Dict, List, Optional, Set
+
+from bs4 import BeautifulSoup
+from lxml import etree
+from lxml import html as lxml_html
+
+# Элементы, которые никогда не содержат основного текста
+SKIP_TAGS = {
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe", "form",
+    "button", "select", "nav", "footer", "header", "aside", "menu",
+}
+
+# Блоки, текст которых оценивается как абзац
+PARAGRAPH_TAGS = {"p", "pre", "blockquote", "li", "td", "dd", "h2", "h3", "h4"}
+
+# Элементы, которые могут быть контейнером основного текста
+CONTAINER_TAGS = {"div", "article", "main", "section", "td", "body", "blockquote"}
+
+# Элементы, после которых в тексте нужен перевод строки
+BLOCK_TAGS = PARAGRAPH_TAGS | CONTAINER_TAGS | {
+    "h1", "h5", "h6", "ul", "ol", "dl", "dt", "tr", "table", "br", "hr", "figcaption",
+}
+
+# Служебные блоки по class/id: отдельные слова, а не подстроки ("head" не совпадает с "heading")
+BOILERPLATE_RE = re.compile(
+    r"(?:^|[\s_-])(?:ad|ads|advert|advertisement|banner|breadcrumbs?|comments?|cookie|"
+    r"footer|header|menu|nav|navbar|navigation|popup|promo|related|share|sidebar|social|"
+    r"sponsor|subscribe|widget)(?:$|[\s_-])",
+    re.IGNORECASE,
+)
+CONTENT_RE = re.compile(r"article|content|entry|main|post|story|text|body", re.IGNORECASE)
+BOILERPLATE_ROLES = {"navigation", "banner", "contentinfo", "complementary", "search"}
+
+# Абзацы короче этого не учитываются при оценке контейнеров
+MIN_PARAGRAPH_CHARS = 25
+
+# Если среди лучших кандидатов несколько близких по счету, берется их общий предок
+TOP_CANDIDATES = 5
+RIVAL_SCORE_RATIO = 0.75
+MIN_COMMON_CANDIDATES = 3
+
+_WHITESPACE_RE = re.compile(r"[ \t\r\f\v\xa0]+")
+
+
+def make_soup(html: str) -> BeautifulSoup:
+    """BeautifulSoup на парсере lxml для разбора по селекторам"""
+    return BeautifulSoup(html, "lxml")
+
+
+def parse_document(html: str) -> Optional[etree._Element]:
+    """Разобрать HTML в дерево lxml (None для пустой или битой страницы)"""
+    if not html or not html.strip():
+        return None
+    try:
+        return lxml_html.document_fromstring(html)
+    except (etree.ParserError, ValueError):
+        return None
+
+
+def _is_boilerplate(element: etree._Element) -> bool:
+    if element.get("hidden") is not None or element.get("aria-hidden") == "true":
+        return True
+    if element.get("role") in BOILERPLATE_ROLES:
+        return True
+    style = element.get("style")
+    if style and "display:none" in style.replace(" ", "").lower():
+        return True
+    names = f"{element.get('class', '')} {element.get('id', '')}"
+    return bool(names.strip()) and bool(BOILERPLATE_RE.search(names)) and not CONTENT_RE.search(names)
+
+
+class _Scorer:
+    """Один обход дерева: отбрасывание служебных блоков и подсчет очков"""
+
+    def __init__(self):
+        self.skipped: Set[etree._Element] = set()
+        self.scores: Dict[etree._Element, float] = {}
+        self.link_chars: Dict[etree._Element, int] = {}
+        self.text_chars: Dict[etree._Element, int] = {}
+
+    def visit(self, element: etree._Element) -> None:
+        """Посчитать символы текста и ссылок в поддереве"""
+        tag = element.tag
+        if not isinstance(tag, str) or tag in SKIP_TAGS or _is_boilerplate(element):
+            # Комментарии и служебные блоки в текст не попадают
+            self.skipped.add(element)
+            return
+
+        text_chars = len((element.text or "").strip())
+        link_chars = text_chars if tag == "a" else 0
+        for child in element:
+            self.visit(child)
+            tail_chars = len((child.tail or "").strip())
+            text_chars += self.text_chars.get(child, 0) + tail_chars
+            link_chars += self.text_chars.get(child, 0) if tag == "a" else self.link_chars.get(child, 0)
+        self.text_chars[element] = text_chars
+        self.link_chars[element] = link_chars
+
+        if tag in PARAGRAPH_TAGS and text_chars >= MIN_PARAGRAPH_CHARS:
+            text = element.text_content()
+            points = 1 + text.count(",") + min(text_chars // 100, 3)
+            parent = element.getparent()
+            if parent is not None:
+                self.scores[parent] = self.scores.get(parent, 0.0) + points
+                grandparent = parent.getparent()
+                if grandparent is not None:
+                    self.scores[grandparent] = self.scores.get(grandparent, 0.0) + points / 2
+
+    def best_container(self, body: etree._Element) -> etree._Element:
+        """Контейнер с наибольшим счетом с поправкой на плотность ссылок"""
+        ranked = []
+        for element, score in self.scores.items():
+            if element.tag not in CONTAINER_TAGS:
+                continue
+            if element.tag in ("article", "main"):
+                score += 5
+            names = f"{element.get('class', '')} {element.get('id', '')}"
+            if CONTENT_RE.search(names):
+                score += 3
+            text_chars = self.text_chars.get(element, 0)
+            if text_chars:
+                score *= 1 - self.link_chars.get(element, 0) / text_chars
+            if score > 0:
+                ranked.append((score, element))
+        if not ranked:
+            return body
+        ranked.sort(key=lambda item: item[0], reverse=True)
+        best_score, best = ranked[0]
+
+        # Текст, разбитый на много похожих блоков (посты форума, карточки),
+        # собирается из их общего предка
+        rivals = [
+            element for score, element in ranked[1:TOP_CANDIDATES]
+            if score >= best_score * RIVAL_SCORE_RATIO
+        ]
+        if len(rivals) >= MIN_COMMON_CANDIDATES - 1:
+            for ancestor in best.iterancestors():
+                contained = sum(
+                    1 for element in rivals
+                    if any(parent is ancestor for parent in element.iterancestors())
+                )
+                if contained >= MIN_COMMON_CANDIDATES - 1:
+                    return ancestor
+                if ancestor is body:
+                    break
+        return best
+
+    def content_root(
+        self, container: etree._Element, body: etree._Element, headline: Optional[etree._Element]
+    ) -> etree._Element:
+        """Ближайший предок контейнера, который охватывает всю статью
+
+        Самый плотный блок часто лишь тело статьи: заголовок, цена и
+        таблица характеристик лежат рядом с ним в article/main или в общем
+        с заголовком h1 блоке.
+        """
+        if container is body or container.tag in ("article", "main"):
+            return container
+        for ancestor in container.iterancestors():
+            if ancestor is body:
+                break
+            names = f"{ancestor.get('class', '')} {ancestor.get('id', '')}"
+            if (
+                ancestor.tag in ("article", "main")
+                or CONTENT_RE.search(names)
+                or (headline is not None and _contains(ancestor, headline))
+            ):
+                return ancestor
+        return container
+
+
+def _contains(ancestor: etree._Element, element: etree._Element) -> bool:
+    return any(parent is ancestor for parent in element.iterancestors())
+
+
+def _find_headline(body: etree._Element, skipped: Set[etree._Element]) -> Optional[etree._Element]:
+    """Первый h1 вне служебных блоков"""
+    for headline in body.iter("h1"):
+        if headline not in skipped and not any(parent in skipped for parent in headline.iterancestors()):
+            if headline.text_content().strip():
+                return headline
+    return None
+
+
+def _collect_text(element: etree._Element, skipped: Set[etree._Element], parts: List[str]) -> None:
+    if element in skipped:
+        return
+    block = element.tag in BLOCK_TAGS
+    if block:
+        parts.append("\n")
+    if element.text:
+        parts.append(element.text)
+    for child in element:
+        _collect_text(child, skipped, parts)
+        if child.tail:
+            parts.append(child.tail)
+    if block:
+        parts.append("\n")
+
+
+def _normalize(parts: List[str], separator: str) -> str:
+    lines = (_WHITESPACE_RE.sub(" ", line).strip() for line in "".join(parts).split("\n"))
+    return separator.join(line for line in lines if line)
+
+
+def extract_main_text(html: str, max_chars: Optional[int] = None, separator: str = "\n") -> str:
+    """Основной текст страницы без меню, рекламы и прочих служебных блоков
+
+    Строки текста соединяются separator; max_chars обрезает результат.
+    """
+    root = parse_document(html)
+    if root is None:
+        return ""
+    body = root.find("body")
+    if body is None:
+        body = root
+
+    scorer = _Scorer()
+    scorer.visit(body)
+    headline = _find_headline(body, scorer.skipped)
+    container = scorer.content_root(scorer.best_container(body), body, headline)
+
+    parts: List[str] = []
+    _collect_text(container, scorer.skipped, parts)
+    text = _normalize(parts, separator)
+    if container is not body and len(text) < MIN_PARAGRAPH_CHARS * 4:
+        # Контейнер выбран неудачно — берем весь текст страницы без служебных блоков
+        container = body
+        parts = []
+        _collect_text(body, scorer.skipped, parts)
+        text = _normalize(parts, separator)
+
+    # Заголовок страницы нужен всегда, даже если он вне выбранного контейнера
+    if headline is None:
+        title = root.find("head/title")
+        title_text = _WHITESPACE_RE.sub(" ", title.text_content()).strip() if title is not None else ""
+        if title_text:
+            text = separator.join(filter(None, (title_text, text)))
+    elif container is not headline and not _contains(container, headline):
+        text = separator.join(filter(None, (_normalize([headline.text_content()], " "), text)))
+    return text[:max_chars] if max_chars is not None else text
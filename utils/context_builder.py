@@ -0,0 +1,184 @@
+"""
+Сборка контекста беседы для модели с ограничением по токенам
+
+Последние KEEP_RECENT_MESSAGES сообщений передаются дословно всегда,
+более старые — пока помещаются в бюджет, а затем заменяются скользящим
+резюме, которое хранится в Conversation.summary и дополняется
+инкрементально в фоне после ответа. Если бюджет не вместил часть еще не
+резюмированных сообщений (например, из-за длинного системного промпта с
+веб-контекстом или документом), резюме обновляется при следующем вызове
+refresh_summary, не дожидаясь SUMMARY_BATCH_MESSAGES.
+"""
+
+import logging
+import os
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from database import Conversation as DBConversation
+from database import SessionLocal
+from utils.history_cache import HistoryRow, history_cache
+from utils.openai_client import generate_raw_response
+from utils.tokens import TokenCounter
+from utils.tokens import token_counter as shared_token_counter
+
+logger = logging.getLogger(__name__)
+
+# Бюджет токенов на весь контекст (системный промпт + резюме + история)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+# Сколько последних сообщений всегда передается дословно
+KEEP_RECENT_MESSAGES = int(os.getenv("CONTEXT_KEEP_RECENT_MESSAGES", "8"))
+# Сколько старых сообщений должно накопиться, чтобы обновить резюме
+SUMMARY_BATCH_MESSAGES = int(os.getenv("CONTEXT_SUMMARY_BATCH_MESSAGES", "6"))
+SUMMARY_MAX_TOKENS = 600
+
+SUMMARY_PROMPT = """Ты ведешь краткое содержание диалога пользователя с ассистентом WIndexAI.
+Обнови резюме, добавив в него новые сообщения. Сохрани факты, имена, числа,
+договоренности, открытые вопросы и предпочтения пользователя. Пиши по-русски,
+сжато, без вступлений, не длиннее 250 слов.
+
+ТЕКУЩЕЕ РЕЗЮМЕ:
+{summary}
+
+НОВЫЕ СООБЩЕНИЯ:
+{messages}
+"""
+
+
+class ConversationContext:
+    """Результат сборки контекста"""
+
+    def __init__(self, messages: List[Dict[str, str]], is_first_exchange: bool, tokens: int):
+        self.messages = messages
+        self.is_first_exchange = is_first_exchange
+        self.tokens = tokens
+
+
+class ContextBuilder:
+    """Сборщик контекста беседы с резюме старых сообщений"""
+
+    def __init__(
+        self,
+        token_counter: Optional[TokenCounter] = None,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        keep_recent: int = KEEP_RECENT_MESSAGES,
+        summary_batch: int = SUMMARY_BATCH_MESSAGES,
+    ):
+        self.token_counter = token_counter or shared_token_counter
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.summary_batch = summary_batch
+        self._summarizing: Set[int] = set()
+        # Беседы, в которых бюджет вытеснил еще не резюмированные сообщения
+        self._overflowed: Set[int] = set()
+
+    def load_history(
+        self, db: Session, conversation_id: int, after_message_id: Optional[int] = None
+    ) -> List[HistoryRow]:
+        """Сообщения беседы после указанного id в хронологическом порядке"""
+        history = history_cache.get(db, conversation_id)
+        if after_message_id is not None:
+            history = [row for row in history if row[0] > after_message_id]
+        return history
+
+    def build(
+        self,
+        db: Session,
+        conversation: DBConversation,
+        system_content: str,
+        token_budget: Optional[int] = None,
+    ) -> ConversationContext:
+        """Собрать сообщения для модели в пределах бюджета токенов"""
+        budget = token_budget or self.token_budget
+        history = self.load_history(db, conversation.id, conversation.summary_until_message_id)
+
+        messages = [{"role": "system", "content": system_content}]
+        if conversation.summary:
+            messages.append(
+                {
+                    "role": "system",
+                    "content": f"Краткое содержание предыдущей части беседы:\n{conversation.summary}",
+                }
+            )
+        used = sum(self.token_counter.count_message(msg) for msg in messages)
+
+        # Берем сообщения с конца: последние keep_recent (и текущий запрос)
+        # включаются всегда, более старые — пока помещаются в бюджет
+        selected: List[Dict[str, str]] = []
+        for _, role, content in reversed(history):
+            message = {"role": role, "content": content}
+            tokens = self.token_counter.count_message(message)
+            if len(selected) >= max(self.keep_recent, 1) and used + tokens > budget:
+                break
+            selected.append(message)
+            used += tokens
+
+        if len(selected) < len(history):
+            # Вытесненные сообщения не должны пропасть: они попадут в резюме
+            self._overflowed.add(conversation.id)
+            logger.info(
+                f"Контекст беседы {conversation.id}: {len(selected)} из {len(history)} "
+                f"сообщений в бюджете {budget} токенов, остальные будут резюмированы"
+            )
+
+        return ConversationContext(
+            messages=messages + list(reversed(selected)),
+            is_first_exchange=conversation.summary_until_message_id is None and len(history) == 1,
+            tokens=used,
+        )
+
+    async def refresh_summary(self, conversation_id: int, model: str) -> None:
+        """Дополнить резюме беседы сообщениями, вышедшими из окна последних"""
+        if conversation_id in self._summarizing:
+            return
+        self._summarizing.add(conversation_id)
+
+        db = SessionLocal()
+        try:
+            conversation = db.get(DBConversation, conversation_id)
+            if not conversation:
+                return
+
+            history = self.load_history(db, conversation_id, conversation.summary_until_message_id)
+            older = history[: max(0, len(history) - self.keep_recent)]
+            if not older or (
+                len(older) < self.summary_batch and conversation_id not in self._overflowed
+            ):
+                return
+
+            transcript = "\n".join(
+                f"{'Пользователь' if role == 'user' else 'Ассистент'}: {content}"
+                for _, role, content in older
+            )
+            summary = await generate_raw_response(
+                [
+                    {
+                        "role": "user",
+                        "content": SUMMARY_PROMPT.format(
+                            summary=conversation.summary or "(пусто)", messages=transcript
+                        ),
+                    }
+                ],
+                model,
+                max_tokens=SUMMARY_MAX_TOKENS,
+            )
+            if not summary:
+                return
+
+            conversation.summary = summary.strip()
+            conversation.summary_until_message_id = older[-1][0]
+            db.commit()
+            self._overflowed.discard(conversation_id)
+            logger.info(
+                f"Резюме беседы {conversation_id} обновлено до сообщения {older[-1][0]}"
+            )
+        except Exception as e:
+            logger.error(f"Ошибка обновления резюме беседы {conversation_id}: {e}")
+        finally:
+            db.close()
+            self._summarizing.discard(conversation_id)
+
+
+# Глобальный экземпляр сборщика контекста
+context_builder = ContextBuilder()
@@ -0,0 +1,171 @@
+"""
+Упаковка результатов веб-поиска в контекст модели с бюджетом токенов
+
+Раньше каждый источник обрезался до фиксированного числа символов
+(content[:500], content[:1000], content[:1500]) независимо от бюджета
+контекста и релевантности. Здесь:
+- фрагменты собираются со всех уровней поиска (продвинутый, универсальный,
+  обычный поиск) и заново оцениваются по BM25 одним запросом, чтобы
+  оценки разных уровней были сравнимы;
+- фрагменты отбираются по MMR (Maximal Marginal Relevance): на каждом шаге
+  берется фрагмент с лучшим балансом релевантности и непохожести на уже
+  выбранные, пока не исчерпан бюджет WEB_CONTEXT_TOKEN_BUDGET;
+- результат — компактный блок, где каждый фрагмент помечен номером
+  источника [n], а список источников с URL идет в конце.
+"""
+
+import os
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set
+
+from utils.passage_retriever import bm25_scores, split_passages, tokenize
+from utils.tokens import TokenCounter
+from utils.tokens import token_counter as shared_token_counter
+
+# Бюджет токенов на найденные в интернете фрагменты
+WEB_CONTEXT_TOKEN_BUDGET = int(os.getenv("WEB_CONTEXT_TOKEN_BUDGET", "1500"))
+# Вес релевантности в MMR; остальное — штраф за сходство с выбранными фрагментами
+MMR_LAMBDA = float(os.getenv("WEB_CONTEXT_MMR_LAMBDA", "0.7"))
+# Фрагменты короче этого (обрывки меню, подписи) не рассматриваются
+MIN_CANDIDATE_CHARS = 40
+
+
+class Candidate(NamedTuple):
+    """Фрагмент-кандидат в контекст с источником"""
+
+    url: str
+    title: str
+    text: str
+
+
+def _add_text(candidates: List[Candidate], url: str, title: str, text: Optional[str]) -> None:
+    if not text:
+        return
+    for passage in split_passages(url, text):
+        if len(passage.text) >= MIN_CANDIDATE_CHARS:
+            candidates.append(Candidate(url, title, passage.text))
+
+
+def collect_candidates(results: Iterable[Any]) -> List[Candidate]:
+    """Фрагменты из результатов любых уровней поиска
+
+    Понимает ответы get_comprehensive_web_info (продвинутый и универсальный
+    поиск), списки WebSearchEngine.search_and_fetch_content и выдачу
+    WebParser.search_web.
+    """
+    candidates: List[Candidate] = []
+    for result in results:
+        if isinstance(result, list):
+            # Обычный поиск: заголовок, описание и текст страницы
+            for item in result:
+                url, title = item.get("url", ""), item.get("title", "")
+                _add_text(candidates, url, title, item.get("description"))
+                _add_text(candidates, url, title, item.get("content"))
+            continue
+        if not isinstance(result, dict) or "error" in result:
+            continue
+
+        if result.get("search_type") == "advanced_search":
+            for item in result.get("results", []):
+                passages = item.get("passages")
+                if passages:
+                    for passage in passages:
+                        candidates.append(Candidate(item["url"], "", passage["text"]))
+                else:
+                    _add_text(candidates, item["url"], "", item.get("content"))
+        elif result.get("search_type") == "universal_search":
+            for item in result.get("search_results", {}).get("results", []):
+                url, title = item.get("url", ""), item.get("title", "")
+                _add_text(candidates, url, title, item.get("snippet"))
+                parsed = item.get("parsed_content") or {}
+                if "error" not in parsed:
+                    _add_text(candidates, url, title, parsed.get("description"))
+                    _add_text(candidates, url, title, parsed.get("text_content"))
+        else:
+            # Выдача DuckDuckGo из WebParser: заголовок и сниппет
+            for item in result.get("results", []):
+                if isinstance(item, dict):
+                    _add_text(candidates, item.get("url", ""), item.get("title", ""), item.get("snippet"))
+    return candidates
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class ContextPacker:
+    """Отбор фрагментов по MMR под бюджет токенов"""
+
+    def __init__(
+        self,
+        token_counter: Optional[TokenCounter] = None,
+        token_budget: int = WEB_CONTEXT_TOKEN_BUDGET,
+        mmr_lambda: float = MMR_LAMBDA,
+    ):
+        self.token_counter = token_counter or shared_token_counter
+        self.token_budget = token_budget
+        self.mmr_lambda = mmr_lambda
+
+    def select(
+        self, query: str, candidates: List[Candidate], token_budget: Optional[int] = None
+    ) -> List[Candidate]:
+        """Фрагменты в порядке отбора MMR, суммарно не больше бюджета токенов"""
+        if not candidates:
+            return []
+        budget = self.token_budget if token_budget is None else token_budget
+
+        # Одинаковые тексты (сниппет совпадает с началом страницы) рассматриваются один раз
+        unique: List[Candidate] = []
+        seen_texts: Set[str] = set()
+        for candidate in candidates:
+            if candidate.text not in seen_texts:
+                seen_texts.add(candidate.text)
+                unique.append(candidate)
+        scores = bm25_scores(query, unique)
+        best = scores.max()
+        relevance = scores / best if best > 0 else scores
+        terms = [set(tokenize(candidate.text)) for candidate in unique]
+        tokens = [self.token_counter.count(candidate.text) for candidate in unique]
+
+        selected: List[int] = []
+        # Если хоть что-то совпало с запросом, фрагменты без совпадений не берутся
+        remaining = {index for index in range(len(unique)) if best <= 0 or scores[index] > 0}
+        while remaining and budget > 0:
+            def mmr(index: int) -> float:
+                redundancy = max((_jaccard(terms[index], terms[chosen]) for chosen in selected), default=0.0)
+                return self.mmr_lambda * relevance[index] - (1 - self.mmr_lambda) * redundancy
+
+            index = max(sorted(remaining), key=mmr)
+            remaining.discard(index)
+            if tokens[index] > budget:
+                continue
+            selected.append(index)
+            budget -= tokens[index]
+        return [unique[index] for index in selected]
+
+    def pack(self, query: str, results: Iterable[Any], token_budget: Optional[int] = None) -> str:
+        """Блок контекста с пометками источников [n] или пустая строка"""
+        chosen = self.select(query, collect_candidates(results), token_budget)
+        if not chosen:
+            return ""
+
+        sources: Dict[str, int] = {}
+        titles: Dict[str, str] = {}
+        lines = []
+        for candidate in chosen:
+            number = sources.setdefault(candidate.url, len(sources) + 1)
+            if candidate.title and not titles.get(candidate.url):
+                titles[candidate.url] = candidate.title
+            lines.append(f"[{number}] {candidate.text}")
+
+        lines.append("")
+        lines.append("Источники:")
+        for url, number in sources.items():
+            title = titles.get(url)
+            lines.append(f"[{number}] {title} — {url}" if title else f"[{number}] {url}")
+        return "\n".join(lines)
+
+
+# Глобальный упаковщик контекста веб-поиска
+context_packer = ContextPacker()
@@ -0,0 +1,161 @@
+"""
+Пул процессов для CPU-емких этапов веб-поиска
+
+Разбор HTML (BeautifulSoup, lxml), конвертация в Markdown (html2text) и
+ранжирование документов — чистые вычисления на Python. В потоке запроса
+они блокируют event loop, а перенос в потоки почти не помогает из-за GIL.
+Здесь такие задачи выполняются в отдельных процессах:
+- задача — функция уровня модуля, аргументы и результат — строки, списки
+  и словари, поэтому передача между процессами дешевая;
+- входы меньше CPU_POOL_MIN_INPUT_CHARS обрабатываются в текущем процессе:
+  передача в пул стоит дороже самой работы;
+- если пул недоступен или сломан, задача выполняется в текущем процессе.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pickle import PicklingError
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 0 отключает пул: все задачи выполняются в текущем процессе
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+CPU_POOL_MIN_INPUT_CHARS = int(os.getenv("CPU_POOL_MIN_INPUT_CHARS", "65536"))
+
+# Ошибки самого пула, а не задачи: после них задача повторяется в текущем процессе
+_POOL_ERRORS = (BrokenProcessPool, PicklingError)
+
+# Внутри процесса пула задачи не передаются дальше
+_in_worker = False
+
+
+def _mark_worker() -> None:
+    global _in_worker
+    _in_worker = True
+
+
+class CPUPool:
+    """Ленивый пул процессов с порогом размера входа"""
+
+    def __init__(
+        self,
+        workers: int = CPU_POOL_WORKERS,
+        min_input_chars: int = CPU_POOL_MIN_INPUT_CHARS,
+    ):
+        self.workers = workers
+        self.min_input_chars = min_input_chars
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.inline = 0
+        self.offloaded = 0
+        self.fallbacks = 0
+        self._offloaded_seconds = 0.0
+
+    def should_offload(self, size: int) -> bool:
+        """Передавать ли в пул вход такого размера"""
+        return not _in_worker and self.workers > 0 and size >= self.min_input_chars
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: дочерние процессы не наследуют потоки и открытые соединения
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_mark_worker,
+                )
+            return self._executor
+
+    def _reset(self, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, func: Callable[..., T], *args: Any, size: int = 0, **kwargs: Any) -> T:
+        """Выполнить func(*args, **kwargs), передав в пул, если вход большой
+
+        Блокирует вызывающий поток до результата; из корутин вызывайте arun.
+        """
+        if not self.should_offload(size):
+            self.inline += 1
+            return func(*args, **kwargs)
+
+        executor = self._get_executor()
+        started = time.perf_counter()
+        try:
+            result = self._submit(executor, func, *args, **kwargs).result()
+        except _POOL_ERRORS as e:
+            return self._fallback(executor, e, func, *args, **kwargs)
+        self._record(started)
+        return result
+
+    async def arun(self, func: Callable[..., T], *args: Any, size: int = 0, **kwargs: Any) -> T:
+        """Асинхронный run: event loop не блокируется, пока задача выполняется в пуле"""
+        if not self.should_offload(size):
+            self.inline += 1
+            return func(*args, **kwargs)
+
+        executor = self._get_executor()
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wrap_future(self._submit(executor, func, *args, **kwargs))
+        except _POOL_ERRORS as e:
+            return self._fallback(executor, e, func, *args, **kwargs)
+        self._record(started)
+        return result
+
+    @staticmethod
+    def _submit(executor: ProcessPoolExecutor, func: Callable[..., T], *args, **kwargs) -> Future:
+        try:
+            return executor.submit(func, *args, **kwargs)
+        except RuntimeError as e:
+            # Пул остановлен (shutdown) — ошибка пула, а не задачи
+            raise BrokenProcessPool(str(e)) from e
+
+    def _fallback(
+        self, executor: ProcessPoolExecutor, error: Exception, func: Callable[..., T], *args, **kwargs
+    ) -> T:
+        logger.warning(f"Пул процессов недоступен ({error!r}), {func.__name__} выполняется в процессе")
+        self.fallbacks += 1
+        if isinstance(error, BrokenProcessPool):
+            self._reset(executor)
+        return func(*args, **kwargs)
+
+    def _record(self, started: float) -> None:
+        self.offloaded += 1
+        self._offloaded_seconds += time.perf_counter() - started
+
+    def shutdown(self) -> None:
+        """Остановить процессы пула"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Настройки пула и число задач в пуле и в текущем процессе"""
+        return {
+            "workers": self.workers,
+            "min_input_chars": self.min_input_chars,
+            "running": self._executor is not None,
+            "inline": self.inline,
+            "offloaded": self.offloaded,
+            "fallbacks": self.fallbacks,
+            "avg_offloaded_ms": (
+                round(self._offloaded_seconds / self.offloaded * 1000, 1) if self.offloaded else 0.0
+            ),
+        }
+
+
+# Глобальный пул для парсеров и ранжирования
+cpu_pool = CPUPool()
@@ -0,0 +1,256 @@
+"""
+Индексированный дисковый кэш на SQLite
+
+Заменяет кэш AdvancedWebSearch из отдельных md5.txt файлов, у которого не
+было ни лимита размера, ни очистки, а число записей считалось через
+os.listdir на каждый поиск. Здесь:
+- значения хранятся сжатыми (zlib) в одной таблице с индексом по ключу;
+- у каждой записи свой срок жизни, просроченные удаляются периодической чисткой;
+- суммарный размер ограничен квотой, лишнее вытесняется по LRU;
+- ведутся счетчики попаданий, промахов и вытеснений.
+
+Записи с валидаторами HTTP (ETag, Last-Modified) после истечения срока
+хранятся еще WEB_CACHE_STALE_SECONDS, чтобы их можно было перепроверить
+условным запросом вместо повторной загрузки.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+from utils.memory_cache import CacheLookup
+
+WEB_CACHE_PATH = os.getenv("WEB_CACHE_PATH", os.path.join("cache", "web_cache.sqlite3"))
+WEB_CACHE_MAX_BYTES = int(os.getenv("WEB_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+WEB_CACHE_TTL_SECONDS = float(os.getenv("WEB_CACHE_TTL_SECONDS", "86400"))
+WEB_CACHE_SWEEP_INTERVAL_SECONDS = float(os.getenv("WEB_CACHE_SWEEP_INTERVAL_SECONDS", "600"))
+WEB_CACHE_STALE_SECONDS = float(os.getenv("WEB_CACHE_STALE_SECONDS", str(7 * 86400)))
+
+# Сколько самых старых записей удаляется за один шаг вытеснения
+_EVICT_BATCH = 64
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    validators TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at);
+"""
+
+
+class DiskCache:
+    """Потокобезопасный дисковый кэш строк с TTL и квотой по размеру"""
+
+    def __init__(
+        self,
+        path: str = WEB_CACHE_PATH,
+        max_bytes: int = WEB_CACHE_MAX_BYTES,
+        ttl: float = WEB_CACHE_TTL_SECONDS,
+        sweep_interval: float = WEB_CACHE_SWEEP_INTERVAL_SECONDS,
+        stale_ttl: float = WEB_CACHE_STALE_SECONDS,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.stale_ttl = stale_ttl
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._total_bytes = 0
+        self._entries = 0
+        self._last_sweep = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale = 0
+        self.revalidations = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Ленивое открытие базы при первом обращении"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(entries)")}
+            if "validators" not in columns:
+                # База, созданная до появления условных запросов
+                conn.execute("ALTER TABLE entries ADD COLUMN validators TEXT")
+            self._entries, self._total_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        """Значение из кэша или None, если его нет или срок жизни истек"""
+        found = self.lookup(key)
+        if found is None or not found.fresh:
+            return None
+        return found.value
+
+    def lookup(self, key: str) -> Optional[CacheLookup]:
+        """Запись из кэша, включая устаревшие записи с валидаторами"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, size, expires_at, validators FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, size, expires_at, validators = row
+            fresh = expires_at > now
+            if not fresh and not validators:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._entries -= 1
+                self._total_bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            if fresh:
+                self.hits += 1
+            else:
+                self.stale += 1
+        return CacheLookup(
+            zlib.decompress(value).decode("utf-8"),
+            json.loads(validators) if validators else None,
+            fresh,
+        )
+
+    def set(
+        self,
+        key: str,
+        value: str,
+        ttl: Optional[float] = None,
+        validators: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Сохранить значение; ttl по умолчанию берется из настроек кэша"""
+        blob = zlib.compress(value.encode("utf-8"))
+        size = len(blob)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            conn = self._connect()
+            previous = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(key, value, size, expires_at, accessed_at, validators) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, blob, size, expires_at, now, json.dumps(validators) if validators else None),
+            )
+            if previous is None:
+                self._entries += 1
+            else:
+                self._total_bytes -= previous[0]
+            self._total_bytes += size
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep(now)
+            self._evict()
+
+    def refresh(
+        self,
+        key: str,
+        ttl: Optional[float] = None,
+        validators: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Продлить запись после ответа 304, обновив валидаторы"""
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT validators FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return
+            merged = {**(json.loads(row[0]) if row[0] else {}), **(validators or {})}
+            conn.execute(
+                "UPDATE entries SET expires_at = ?, accessed_at = ?, validators = ? WHERE key = ?",
+                (expires_at, now, json.dumps(merged) if merged else None, key),
+            )
+            self.revalidations += 1
+
+    def sweep(self) -> int:
+        """Удалить просроченные записи, вернуть их число"""
+        with self._lock:
+            self._connect()
+            return self._sweep(time.time())
+
+    def clear(self) -> None:
+        """Очистить кэш"""
+        with self._lock:
+            self._connect().execute("DELETE FROM entries")
+            self._entries = 0
+            self._total_bytes = 0
+
+    def close(self) -> None:
+        """Закрыть соединение с базой"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика кэша"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._entries,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "stale": self.stale,
+                "revalidations": self.revalidations,
+            }
+
+    def _sweep(self, now: float) -> int:
+        # Записи с валидаторами живут дольше срока свежести, чтобы их можно было перепроверить
+        condition = "expires_at <= ? AND (validators IS NULL OR expires_at <= ?)"
+        params = (now, now - self.stale_ttl)
+        conn = self._conn
+        count, size = conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE {condition}", params
+        ).fetchone()
+        if count:
+            conn.execute(f"DELETE FROM entries WHERE {condition}", params)
+            self._entries -= count
+            self._total_bytes -= size
+            self.expirations += count
+        self._last_sweep = now
+        return count
+
+    def _evict(self) -> None:
+        conn = self._conn
+        while self._total_bytes > self.max_bytes and self._entries:
+            rows = conn.execute(
+                "SELECT key, size FROM entries ORDER BY accessed_at LIMIT ?", (_EVICT_BATCH,)
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._entries -= 1
+                self._total_bytes -= size
+                self.evictions += 1
@@ -0,0 +1,161 @@
+"""
+Параллельный запуск поисковиков и уровней поиска с хеджированием
+
+Вместо последовательного перебора (DuckDuckGo → Bing → Google,
+специализированный → продвинутый → универсальный поиск), где худшее
+время — сумма всех таймаутов, попытки запускаются с задержкой hedge_delay
+друг за другом, а следующая запускается сразу, если предыдущая завершилась
+неудачно. Побеждает первый приемлемый результат, остальные попытки
+отменяются. Общее время ограничено бюджетом.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Общий бюджет времени на получение данных из интернета для одного запроса
+RETRIEVAL_BUDGET_SECONDS = float(os.getenv("WEB_RETRIEVAL_BUDGET_SECONDS", "12"))
+# Через сколько секунд без ответа запускать следующий поисковик
+ENGINE_HEDGE_DELAY_SECONDS = float(os.getenv("WEB_ENGINE_HEDGE_DELAY_SECONDS", "1.5"))
+# Через сколько секунд без ответа запускать следующий уровень поиска
+TIER_HEDGE_DELAY_SECONDS = float(os.getenv("WEB_TIER_HEDGE_DELAY_SECONDS", "2.0"))
+
+Attempt = Tuple[str, Callable[[], Awaitable[Any]]]
+
+
+class HedgedResult:
+    """Результат хеджированного запуска"""
+
+    def __init__(self):
+        self.winner: Optional[str] = None
+        self.value: Any = None
+        # Завершившиеся попытки, включая неприемлемые результаты
+        self.results: Dict[str, Any] = {}
+        self.launched: List[str] = []
+        self.elapsed = 0.0
+        self.timed_out = False
+
+
+class RetrievalStats:
+    """Статистика победителей и таймаутов по группам попыток"""
+
+    def __init__(self):
+        self._groups: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, group: str, result: HedgedResult) -> None:
+        stats = self._groups.setdefault(
+            group,
+            {
+                "requests": 0,
+                "no_winner": 0,
+                "timeouts": 0,
+                "total_seconds": 0.0,
+                "wins": {},
+                "launched": {},
+            },
+        )
+        stats["requests"] += 1
+        stats["total_seconds"] += result.elapsed
+        if result.timed_out:
+            stats["timeouts"] += 1
+        if result.winner is None:
+            stats["no_winner"] += 1
+        else:
+            stats["wins"][result.winner] = stats["wins"].get(result.winner, 0) + 1
+        for name in result.launched:
+            stats["launched"][name] = stats["launched"].get(name, 0) + 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            group: {
+                **{key: value for key, value in stats.items() if key != "total_seconds"},
+                "avg_seconds": round(stats["total_seconds"] / stats["requests"], 3),
+            }
+            for group, stats in self._groups.items()
+        }
+
+
+async def hedged_first(
+    group: str,
+    attempts: List[Attempt],
+    accept: Callable[[str, Any], bool],
+    hedge_delay: float,
+    budget: float = RETRIEVAL_BUDGET_SECONDS,
+) -> HedgedResult:
+    """Запустить попытки с хеджированием и вернуть первый приемлемый результат
+
+    Попытки запускаются по порядку: следующая — через hedge_delay или сразу
+    после неудачи предыдущей. Из одновременно завершившихся предпочитается
+    более ранняя. accept(name, value) решает, приемлем ли результат.
+    Невыполненные попытки отменяются.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + budget
+    order = {name: index for index, (name, _) in enumerate(attempts)}
+    result = HedgedResult()
+    pending: Dict[asyncio.Future, str] = {}
+    next_index = 0
+    next_launch_at = started
+
+    def launch() -> None:
+        nonlocal next_index, next_launch_at
+        name, func = attempts[next_index]
+        next_index += 1
+        pending[asyncio.ensure_future(func())] = name
+        result.launched.append(name)
+        next_launch_at = loop.time() + hedge_delay
+
+    try:
+        while pending or next_index < len(attempts):
+            now = loop.time()
+            if now >= deadline:
+                result.timed_out = True
+                break
+            if next_index < len(attempts) and (not pending or now >= next_launch_at):
+                launch()
+                continue
+
+            timeout = deadline - now
+            if next_index < len(attempts):
+                timeout = min(timeout, next_launch_at - now)
+            done, _ = await asyncio.wait(
+                pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+
+            for task in sorted(done, key=lambda t: order[pending[t]]):
+                name = pending.pop(task)
+                if task.cancelled():
+                    continue
+                if task.exception() is not None:
+                    logger.warning(
+                        f"Попытка {group}/{name} завершилась ошибкой: {task.exception()}"
+                    )
+                    continue
+                value = task.result()
+                result.results[name] = value
+                if result.winner is None and accept(name, value):
+                    result.winner = name
+                    result.value = value
+
+            if result.winner is not None:
+                break
+            if done and next_index < len(attempts):
+                # Неудача — следующую попытку запускаем без ожидания
+                launch()
+    finally:
+        for task in pending:
+            task.cancel()
+        result.elapsed = round(loop.time() - started, 3)
+        retrieval_stats.record(group, result)
+
+    if result.winner is None:
+        logger.info(f"{group}: нет приемлемого результата за {result.elapsed}с")
+    return result
+
+
+# Глобальная статистика хеджированных запросов
+retrieval_stats = RetrievalStats()
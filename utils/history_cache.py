@@ -0,0 +1,153 @@
+"""
+Кэш истории недавних бесед в памяти
+
+Хранит для каждой беседы список (id, role, content) в порядке сообщений.
+Кэш сквозной: маршруты дописывают новые сообщения сразу после commit,
+поэтому активная беседа читается из базы только один раз. При промахе
+история загружается запросом только нужных колонок, без ORM-объектов.
+Вытеснение — LRU с ограничением по памяти.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from database import Message as DBMessage
+
+logger = logging.getLogger(__name__)
+
+HISTORY_CACHE_MAX_BYTES = int(os.getenv("HISTORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Примерные накладные расходы Python на одну строку истории
+ROW_OVERHEAD_BYTES = 120
+
+HistoryRow = Tuple[int, str, str]  # (id, role, content)
+
+
+def _row_size(role: str, content: str) -> int:
+    return ROW_OVERHEAD_BYTES + len(role) + len(content.encode("utf-8"))
+
+
+class ConversationHistoryCache:
+    """LRU-кэш истории бесед с лимитом по памяти"""
+
+    def __init__(self, max_bytes: int = HISTORY_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[int, List[HistoryRow]]" = OrderedDict()
+        self._sizes: Dict[int, int] = {}
+        self._total_bytes = 0
+        # Беседы, которые сейчас загружаются из базы: число записей за время загрузки
+        self._loading: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, db: Session, conversation_id: int) -> List[HistoryRow]:
+        """История беседы из кэша или из базы"""
+        with self._lock:
+            rows = self._entries.get(conversation_id)
+            if rows is not None:
+                self._entries.move_to_end(conversation_id)
+                self.hits += 1
+                return list(rows)
+            self.misses += 1
+            self._loading.setdefault(conversation_id, 0)
+
+        try:
+            rows = self.load(db, conversation_id)
+        except Exception:
+            with self._lock:
+                self._loading.pop(conversation_id, None)
+            raise
+
+        with self._lock:
+            # Если во время загрузки в беседу писали, снимок мог устареть
+            concurrent_writes = self._loading.pop(conversation_id, 0)
+            if not concurrent_writes and conversation_id not in self._entries:
+                self._store(conversation_id, rows)
+        return list(rows)
+
+    def load(self, db: Session, conversation_id: int) -> List[HistoryRow]:
+        """Загрузить историю только нужными колонками"""
+        return [
+            (row.id, row.role, row.content)
+            for row in db.query(DBMessage.id, DBMessage.role, DBMessage.content)
+            .filter(DBMessage.conversation_id == conversation_id)
+            .order_by(DBMessage.timestamp)
+            .all()
+        ]
+
+    def append(self, conversation_id: int, message_id: int, role: str, content: str) -> None:
+        """Дописать сообщение в кэш (только если беседа уже закэширована)"""
+        with self._lock:
+            rows = self._entries.get(conversation_id)
+            if rows is None:
+                if conversation_id in self._loading:
+                    self._loading[conversation_id] += 1
+                return
+            rows.append((message_id, role, content))
+            size = _row_size(role, content)
+            self._sizes[conversation_id] += size
+            self._total_bytes += size
+            self._entries.move_to_end(conversation_id)
+            self._evict()
+
+    def append_message(self, message: DBMessage) -> None:
+        """Дописать сохраненное ORM-сообщение"""
+        self.append(message.conversation_id, message.id, message.role, message.content)
+
+    def invalidate(self, conversation_id: int) -> None:
+        """Удалить беседу из кэша"""
+        with self._lock:
+            if conversation_id in self._entries:
+                del self._entries[conversation_id]
+                self._total_bytes -= self._sizes.pop(conversation_id)
+
+    def clear(self) -> None:
+        """Очистить кэш"""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._total_bytes = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        """Статистика кэша"""
+        with self._lock:
+            return {
+                "conversations": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _store(self, conversation_id: int, rows: List[HistoryRow]) -> None:
+        size = sum(_row_size(role, content) for _, role, content in rows)
+        if size > self.max_bytes:
+            # Беседа больше всего кэша — не кэшируем
+            return
+        self._entries[conversation_id] = list(rows)
+        self._sizes[conversation_id] = size
+        self._total_bytes += size
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            conversation_id, _ = self._entries.popitem(last=False)
+            self._total_bytes -= self._sizes.pop(conversation_id)
+            self.evictions += 1
+        if self._total_bytes > self.max_bytes and self._entries:
+            # Единственная оставшаяся беседа переросла лимит
+            conversation_id, _ = self._entries.popitem(last=False)
+            self._total_bytes -= self._sizes.pop(conversation_id)
+            self.evictions += 1
+
+
+# Глобальный кэш истории бесед
+history_cache = ConversationHistoryCache()
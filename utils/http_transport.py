@@ -0,0 +1,554 @@
+"""
+Общий HTTP-транспорт для всех парсеров
+
+Раньше WebSearchEngine, WebParser, AdvancedWebSearch и UniversalWebParser
+создавали по собственной requests.Session с продублированной настройкой
+прокси и разными User-Agent. Теперь все запросы идут через один транспорт
+на httpx:
+- общий пул соединений с лимитами и keep-alive;
+- HTTP/2, если установлен пакет h2;
+- одна конфигурация прокси;
+- не больше HTTP_MAX_CONNECTIONS_PER_HOST одновременных запросов к хосту;
+- статистика повторного использования соединений по хостам;
+- выключатели хостов и негативный кэш неудачных URL (utils.upstream_health);
+- определение кодировки страниц без charset в Content-Type: по
+  <meta charset> или, если его нет, по содержимому (charset_normalizer).
+  Иначе httpx декодирует такие страницы как UTF-8, а многие русские
+  сайты отдают windows-1251.
+
+Основной API асинхронный (aget). Для синхронного кода есть фасад
+HTTPSession с привычными session.headers и session.get().
+
+Страницы можно загружать потоково (параметр max_bytes): заголовки
+Content-Type и Content-Length проверяются до чтения тела, загрузка
+обрывается на лимите байт или раньше, когда набрано достаточно текста
+(параметр enough, например TextBudget).
+"""
+
+import asyncio
+import codecs
+import logging
+import os
+import re
+import threading
+import time
+import weakref
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+from charset_normalizer import from_bytes
+from dotenv import load_dotenv
+
+from utils.upstream_health import (NegativeCache, UpstreamHealth,
+                                   UpstreamUnavailable, is_definitive_failure,
+                                   is_upstream_failure)
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "6"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+DEFAULT_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "15"))
+MAX_PAGE_BYTES = int(os.getenv("HTTP_MAX_PAGE_BYTES", str(1536 * 1024)))
+# Во сколько раз видимого текста нужно больше, чем останется после очистки
+EARLY_STOP_TEXT_FACTOR = int(os.getenv("HTTP_EARLY_STOP_TEXT_FACTOR", "4"))
+
+# Типы содержимого, которые имеет смысл разбирать как страницу
+TEXT_CONTENT_TYPES = (
+    "text/", "application/xhtml+xml", "application/xml", "application/json",
+    "application/rss+xml", "application/atom+xml",
+)
+
+# Заголовки, которые после потокового чтения больше не описывают тело ответа
+_BODY_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7",
+}
+
+# Событие httpcore, которое возникает только при открытии нового соединения
+_NEW_CONNECTION_EVENT = "connection.connect_tcp.started"
+
+
+def get_proxy_url() -> Optional[str]:
+    """Собрать URL прокси из переменных окружения"""
+    if os.getenv("PROXY_ENABLED", "false").lower() != "true":
+        return None
+
+    proxy_host = os.getenv("PROXY_HOST")
+    proxy_port = os.getenv("PROXY_PORT")
+    proxy_username = os.getenv("PROXY_USERNAME")
+    proxy_password = os.getenv("PROXY_PASSWORD")
+
+    if not (proxy_host and proxy_port):
+        return None
+    if proxy_username and proxy_password:
+        return f"http://{proxy_username}:{proxy_password}@{proxy_host}:{proxy_port}"
+    return f"http://{proxy_host}:{proxy_port}"
+
+
+def response_validators(response: httpx.Response) -> Dict[str, str]:
+    """ETag и Last-Modified ответа для последующего условного запроса"""
+    return {
+        name: response.headers[name]
+        for name in ("ETag", "Last-Modified")
+        if name in response.headers
+    }
+
+
+def conditional_headers(validators: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """Заголовки If-None-Match / If-Modified-Since по сохраненным валидаторам"""
+    headers = {}
+    if validators:
+        if "ETag" in validators:
+            headers["If-None-Match"] = validators["ETag"]
+        if "Last-Modified" in validators:
+            headers["If-Modified-Since"] = validators["Last-Modified"]
+    return headers
+
+
+class ContentTypeError(Exception):
+    """Ответ не похож на текстовую страницу"""
+
+
+class TextBudget(HTMLParser):
+    """Счетчик видимого текста страницы по мере загрузки
+
+    Передается как enough в потоковый GET: возвращает True, когда вне
+    script/style набрано не меньше target символов.
+    """
+
+    _SKIP_TAGS = {"script", "style", "noscript", "template"}
+
+    def __init__(self, target: int):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+        self.chars = 0
+        self._skip_depth = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.chars += len(data.strip())
+
+    def __call__(self, chunk: bytes) -> bool:
+        self.feed(self._decoder.decode(chunk))
+        return self.chars >= self.target
+
+
+_META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)""", re.IGNORECASE)
+# Сколько байт начала страницы просматривать в поисках <meta charset>
+META_CHARSET_SCAN_BYTES = 4096
+
+
+def detect_encoding(content: bytes) -> str:
+    """Кодировка тела без charset в Content-Type: <meta charset> или угаданная по байтам"""
+    match = _META_CHARSET_RE.search(content[:META_CHARSET_SCAN_BYTES])
+    if match:
+        try:
+            return codecs.lookup(match.group(1).decode("ascii")).name
+        except (LookupError, UnicodeDecodeError):
+            pass
+    best = from_bytes(content).best() if content else None
+    return best.encoding if best is not None else "utf-8"
+
+
+def _check_content(response: httpx.Response) -> None:
+    """Отклонить нетекстовый ответ до чтения тела"""
+    content_type = response.headers.get("Content-Type", "").lower()
+    if content_type and not content_type.startswith(TEXT_CONTENT_TYPES):
+        raise ContentTypeError(f"Неподдерживаемый тип содержимого: {content_type}")
+
+
+def _capped_response(response: httpx.Response, body: bytes, stopped: Optional[str]) -> httpx.Response:
+    """Ответ с прочитанной частью тела"""
+    headers = [
+        (name, value)
+        for name, value in response.headers.multi_items()
+        if name.lower() not in _BODY_HEADERS
+    ]
+    return httpx.Response(
+        response.status_code,
+        headers=headers,
+        content=body,
+        request=response.request,
+        extensions={**response.extensions, "stopped": stopped},
+        default_encoding=detect_encoding,
+    )
+
+
+def _http2_available() -> bool:
+    """HTTP/2 в httpx требует необязательного пакета h2"""
+    if not HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("Пакет h2 не установлен, HTTP/2 отключён")
+        return False
+    return True
+
+
+class ConnectionStats:
+    """Статистика запросов и повторного использования соединений по хостам"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _host(self, host: str) -> Dict[str, int]:
+        return self._stats.setdefault(
+            host, {"requests": 0, "new_connections": 0, "http2_requests": 0, "errors": 0}
+        )
+
+    def record(self, host: str, new_connection: bool, http_version: str) -> None:
+        with self._lock:
+            stats = self._host(host)
+            stats["requests"] += 1
+            stats["new_connections"] += int(new_connection)
+            stats["http2_requests"] += int(http_version == "HTTP/2")
+
+    def record_error(self, host: str) -> None:
+        with self._lock:
+            self._host(host)["errors"] += 1
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            result = {}
+            for host, stats in self._stats.items():
+                reused = stats["requests"] - stats["new_connections"]
+                result[host] = {
+                    **stats,
+                    "reused_connections": reused,
+                    "reuse_rate": round(reused / stats["requests"], 3) if stats["requests"] else 0.0,
+                }
+            return result
+
+
+class _LoopState:
+    """Асинхронный клиент и семафоры хостов одного event loop"""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+class HTTPTransport:
+    """Общий пул HTTP-соединений для синхронного и асинхронного кода"""
+
+    def __init__(
+        self,
+        max_connections_per_host: int = MAX_CONNECTIONS_PER_HOST,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS,
+        transport: Optional[httpx.BaseTransport] = None,
+        health: Optional[UpstreamHealth] = None,
+    ):
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        # Подменный транспорт httpx (например, MockTransport в тестах)
+        self._transport = transport
+        self.proxy_url = get_proxy_url()
+        self.http2 = _http2_available()
+        self.limits = httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+        )
+        self.stats = ConnectionStats()
+        # Выключатели хостов и негативный кэш неудачных URL
+        self.health = health or UpstreamHealth()
+        self.failed_urls = NegativeCache()
+        # Сколько потоковых загрузок оборвано по лимиту, по набранному тексту и по типу
+        self.stream_stats = {"max_bytes": 0, "enough_text": 0, "content_type": 0}
+
+        self._lock = threading.Lock()
+        self._sync_client: Optional[httpx.Client] = None
+        self._sync_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        # Асинхронный клиент привязан к event loop, в котором создан
+        self._loops: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+        if self.proxy_url:
+            logger.info(f"🌐 HTTPTransport: Proxy enabled {self.proxy_url.rsplit('@', 1)[-1]}")
+
+    def _client_options(self) -> Dict[str, Any]:
+        options: Dict[str, Any] = {
+            "timeout": self.timeout,
+            "follow_redirects": True,
+            "limits": self.limits,
+            "http2": self.http2,
+            "default_encoding": detect_encoding,
+        }
+        if self.proxy_url:
+            options["proxy"] = self.proxy_url
+        if self._transport is not None:
+            options["transport"] = self._transport
+        return options
+
+    # --- Синхронный API ---
+
+    def _get_sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._sync_client is None or self._sync_client.is_closed:
+                self._sync_client = httpx.Client(**self._client_options())
+            return self._sync_client
+
+    def _sync_semaphore(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            return self._sync_semaphores.setdefault(
+                host, threading.BoundedSemaphore(self.max_connections_per_host)
+            )
+
+    def get(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        enough: Optional[Callable[[bytes], bool]] = None,
+    ) -> httpx.Response:
+        """Синхронный GET через общий пул; с max_bytes тело читается потоково"""
+        host = httpx.URL(url).host
+        new_connection = False
+
+        def trace(event_name: str, info: Dict[str, Any]) -> None:
+            nonlocal new_connection
+            if event_name == _NEW_CONNECTION_EVENT:
+                new_connection = True
+
+        client = self._get_sync_client()
+        options = {
+            "headers": headers,
+            "timeout": timeout or self.timeout,
+            "extensions": {"trace": trace},
+        }
+        self._check_upstream(url, host)
+        with self._sync_semaphore(host):
+            started = time.monotonic()
+            try:
+                if max_bytes is None:
+                    response = client.get(url, **options)
+                else:
+                    with client.stream("GET", url, **options) as streamed:
+                        _check_content(streamed)
+                        body = bytearray()
+                        self._log_oversized(streamed, max_bytes)
+                        stopped = None
+                        for chunk in streamed.iter_bytes():
+                            body += chunk
+                            stopped = self._read_more(body, chunk, max_bytes, enough)
+                            if stopped:
+                                break
+                        response = _capped_response(streamed, bytes(body[:max_bytes]), stopped)
+            except Exception as e:
+                self.stats.record_error(host)
+                self._record_rejection(e)
+                self._record_outcome(url, host, started, error=e)
+                raise
+            except BaseException:
+                self.health.cancel(host)
+                raise
+        self._record_outcome(url, host, started, status_code=response.status_code)
+        self.stats.record(host, new_connection, response.http_version)
+        self._record_stop(response)
+        return response
+
+    def session(self, headers: Optional[Dict[str, str]] = None) -> "HTTPSession":
+        """Синхронная сессия с собственными заголовками поверх общего пула"""
+        return HTTPSession(self, headers)
+
+    def close(self) -> None:
+        """Закрыть синхронный клиент"""
+        with self._lock:
+            if self._sync_client is not None:
+                self._sync_client.close()
+                self._sync_client = None
+
+    # --- Асинхронный API ---
+
+    def _get_loop_state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None or state.client.is_closed:
+            state = self._loops[loop] = _LoopState(httpx.AsyncClient(**self._client_options()))
+        return state
+
+    async def aget(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        enough: Optional[Callable[[bytes], bool]] = None,
+    ) -> httpx.Response:
+        """Асинхронный GET через общий пул; с max_bytes тело читается потоково"""
+        host = httpx.URL(url).host
+        state = self._get_loop_state()
+        semaphore = state.semaphores.get(host)
+        if semaphore is None:
+            semaphore = state.semaphores[host] = asyncio.Semaphore(self.max_connections_per_host)
+        new_connection = False
+
+        async def trace(event_name: str, info: Dict[str, Any]) -> None:
+            nonlocal new_connection
+            if event_name == _NEW_CONNECTION_EVENT:
+                new_connection = True
+
+        options = {
+            "headers": headers,
+            "timeout": timeout or self.timeout,
+            "extensions": {"trace": trace},
+        }
+        self._check_upstream(url, host)
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                if max_bytes is None:
+                    response = await state.client.get(url, **options)
+                else:
+                    async with state.client.stream("GET", url, **options) as streamed:
+                        _check_content(streamed)
+                        body = bytearray()
+                        self._log_oversized(streamed, max_bytes)
+                        stopped = None
+                        async for chunk in streamed.aiter_bytes():
+                            body += chunk
+                            stopped = self._read_more(body, chunk, max_bytes, enough)
+                            if stopped:
+                                break
+                        response = _capped_response(streamed, bytes(body[:max_bytes]), stopped)
+            except Exception as e:
+                self.stats.record_error(host)
+                self._record_rejection(e)
+                self._record_outcome(url, host, started, error=e)
+                raise
+            except BaseException:
+                self.health.cancel(host)
+                raise
+        self._record_outcome(url, host, started, status_code=response.status_code)
+        self.stats.record(host, new_connection, response.http_version)
+        self._record_stop(response)
+        return response
+
+    async def aclose(self) -> None:
+        """Закрыть асинхронный клиент текущего event loop"""
+        state = self._loops.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await state.client.aclose()
+
+    # --- Потоковое чтение ---
+
+    @staticmethod
+    def _log_oversized(response: httpx.Response, max_bytes: int) -> None:
+        """Content-Length сразу показывает, что тело будет обрезано"""
+        content_length = response.headers.get("Content-Length", "")
+        if content_length.isdigit() and int(content_length) > max_bytes:
+            logger.info(f"Страница {response.url} ({content_length} байт) будет обрезана до {max_bytes}")
+
+    @staticmethod
+    def _read_more(
+        body: bytearray, chunk: bytes, max_bytes: int, enough: Optional[Callable[[bytes], bool]]
+    ) -> Optional[str]:
+        """Причина остановки чтения или None, если читать дальше"""
+        if len(body) >= max_bytes:
+            return "max_bytes"
+        if enough is not None and enough(chunk):
+            return "enough_text"
+        return None
+
+    # --- Состояние хостов ---
+
+    def _check_upstream(self, url: str, host: str) -> None:
+        """UpstreamUnavailable без запроса для недавно не загрузившегося URL или хоста"""
+        self.failed_urls.check(url)
+        if not self.health.allow(host):
+            raise UpstreamUnavailable(f"{host}: выключатель разомкнут")
+
+    def _record_outcome(
+        self,
+        url: str,
+        host: str,
+        started: float,
+        status_code: Optional[int] = None,
+        error: Optional[Exception] = None,
+    ) -> None:
+        """Учесть исход запроса в выключателе хоста и негативном кэше"""
+        # Отказ по типу содержимого говорит о странице, а не о хосте
+        host_failed = (error is not None and not isinstance(error, ContentTypeError)) or (
+            is_upstream_failure(status_code)
+        )
+        self.health.record(host, not host_failed, time.monotonic() - started)
+        if isinstance(error, ContentTypeError) or is_definitive_failure(status_code):
+            self.failed_urls.add(url)
+        elif error is None and status_code is not None and status_code < 400:
+            self.failed_urls.discard(url)
+
+    def _record_stop(self, response: httpx.Response) -> None:
+        stopped = response.extensions.get("stopped")
+        if stopped:
+            with self._lock:
+                self.stream_stats[stopped] += 1
+
+    def _record_rejection(self, error: Exception) -> None:
+        if isinstance(error, ContentTypeError):
+            with self._lock:
+                self.stream_stats["content_type"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Настройки пула и статистика соединений по хостам"""
+        return {
+            "http2": self.http2,
+            "proxy": self.proxy_url is not None,
+            "max_connections": MAX_CONNECTIONS,
+            "max_keepalive_connections": MAX_KEEPALIVE_CONNECTIONS,
+            "keepalive_expiry_seconds": KEEPALIVE_EXPIRY_SECONDS,
+            "max_connections_per_host": self.max_connections_per_host,
+            "max_page_bytes": MAX_PAGE_BYTES,
+            "stopped_streams": dict(self.stream_stats),
+            "hosts": self.stats.get_stats(),
+        }
+
+
+class HTTPSession:
+    """Синхронный фасад в стиле requests.Session для старых парсеров"""
+
+    def __init__(self, transport: HTTPTransport, headers: Optional[Dict[str, str]] = None):
+        self.transport = transport
+        self.headers: Dict[str, str] = {**DEFAULT_HEADERS, **(headers or {})}
+
+    def get(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        enough: Optional[Callable[[bytes], bool]] = None,
+    ) -> httpx.Response:
+        """GET с заголовками сессии"""
+        return self.transport.get(
+            url,
+            headers={**self.headers, **(headers or {})},
+            timeout=timeout,
+            max_bytes=max_bytes,
+            enough=enough,
+        )
+
+
+# Глобальный HTTP-транспорт
+http_transport = HTTPTransport()
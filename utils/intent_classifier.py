@@ -0,0 +1,172 @@
+"""
+Классификация намерений пользователя по ключевым словам и шаблонам
+
+Все наборы ключевых слов компилируются один раз в общий многошаблонный
+матчер, который за один проход по сообщению находит все вхождения, а
+шаблоны начала сообщения — в заранее скомпилированные выражения. Результат
+classify() — множество найденных намерений; маршрутизаторы (веб-поиск,
+выбор тематического парсера, создание сайта, задачи) проверяют его
+вместо собственных списков слов.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Pattern, Set
+
+# Ключевые слова (поиск подстрок в сообщении в нижнем регистре)
+INTENT_KEYWORDS: Dict[str, List[str]] = {
+    # Явные признаки запроса к интернету (AI редактор)
+    "search_keywords": [
+        "найди", "поиск", "актуальн", "новости", "сейчас", "сегодня", "последние",
+        "тренд", "курс", "погода", "цены", "события", "что происходит",
+        "статистика", "данные", "информация о", "расскажи про", "что нового",
+    ],
+    "status_question": ["как дела"],
+    # Сообщения, для которых веб-поиск не нужен: вопросы о боте, команды,
+    # просьбы посчитать (остальные случаи — в INTENT_PATTERNS)
+    "no_search": [
+        "как дела", "что делаешь", "кто ты", "что ты умеешь", "расскажи о себе",
+        "что ты можешь", "очистить", "удалить", "новый чат", "стоп", "хватит",
+        "clear", "delete", "new chat", "stop", "посчитай", "сколько будет",
+    ],
+    "create_website": [
+        "создай сайт", "сделай сайт", "лендинг", "веб-сайт", "страницу", "сайт для",
+        "сайт о", "дизайн сайта", "сайт компании", "сайт-визитка", "интернет-магазин",
+        "портал", "блог", "сайт-одностраничник", "сайт с нуля", "web-сайт",
+        "сайт на заказ", "сайт под ключ",
+    ],
+    "task": [
+        "создай", "сделай", "напиши", "реализуй", "разработай", "настрой",
+        "установи", "запусти", "сгенерируй", "проект", "приложение", "система",
+        "база данных", "скрипт", "код", "программа", "инструмент",
+    ],
+    # Темы специализированных парсеров
+    "topic_crypto": [
+        "биткоин", "bitcoin", "btc", "криптовалют", "крипто", "ethereum", "eth",
+        "solana", "sol", "cardano", "ada", "binance", "bnb",
+    ],
+    "topic_exchange": ["курс", "валют", "доллар", "евро", "рубль"],
+    "topic_news": ["новости", "новость", "news"],
+    "topic_weather": ["погода", "weather"],
+    # Уточнение поискового запроса
+    "query_weather": ["погод"],
+    "query_rates": ["курс", "валют", "доллар", "евро", "рубль", "bitcoin", "btc"],
+    "query_usd": ["доллар", "usd"],
+    "query_eur": ["евро", "eur"],
+    "query_btc": ["bitcoin", "btc"],
+    "query_crypto": ["крипто", "криптовалют", "ethereum", "eth"],
+    "query_eth": ["ethereum", "eth"],
+    "query_price": ["цена", "стоит", "купить", "продажа"],
+    "query_news": ["новости", "что нового", "последние", "актуально"],
+    "query_top": ["топ", "рейтинг", "лучший", "популярный"],
+    # Признаки для оценки необходимости веб-поиска
+    "explicit_search": [
+        "найди", "поищи", "поиск", "загугли", "погугли", "в интернете", "search", "google",
+    ],
+    "recency": [
+        "сейчас", "сегодня", "вчера", "последн", "актуальн", "свеж", "текущ",
+        "на данный момент", "в этом году", "новост", "today", "latest", "current", "news",
+    ],
+    "fact_question": ["кто ", "когда", "где ", "сколько", "какой курс", "who ", "when ", "where "],
+    "offline_task": [
+        "объясни", "придумай", "переведи", "сочини", "перепиши", "исправь", "сократи",
+        "перефразируй", "что такое", "как работает", "пример кода",
+    ],
+}
+
+# Шаблоны начала сообщения (re.match по сообщению в нижнем регистре без пробелов по краям)
+INTENT_PATTERNS: Dict[str, List[str]] = {
+    # Сообщения, для которых веб-поиск не нужен
+    "no_search": [
+        # Приветствия и благодарности
+        r"(привет|здравствуй|добрый день|доброе утро|добрый вечер|спасибо|благодар|пока|до свидания)$",
+        r"(hi|hello|hey|thanks|thank you|bye|goodbye)$",
+        # Математические операции (простые)
+        r"\d+[\+\-\*\/]\d+.*$",
+        r"вычисли",
+        # Очень короткие сообщения (1-2 слова)
+        r"\w{1,10}(\s+\w{1,10})?$",
+    ],
+}
+
+
+class KeywordMatcher:
+    """Поиск всех ключевых слов из набора за один проход по тексту
+
+    Ключевые слова объединяются в одно регулярное выражение внутри
+    опережающей проверки, поэтому движок re проверяет каждую позицию текста
+    один раз и находит в том числе перекрывающиеся вхождения. В позиции
+    берется самое длинное слово; более короткие слова, являющиеся его
+    префиксами, учитываются заранее посчитанным замыканием.
+    """
+
+    def __init__(self, keywords: Dict[str, Iterable[str]]):
+        labels: Dict[str, Set[str]] = {}
+        for label, words in keywords.items():
+            for word in words:
+                labels.setdefault(word.lower(), set()).add(label)
+
+        # Для каждого слова — метки всех слов, являющихся его префиксами
+        self._labels: Dict[str, FrozenSet[str]] = {}
+        for word in labels:
+            closure: Set[str] = set()
+            for other, other_labels in labels.items():
+                if word.startswith(other):
+                    closure |= other_labels
+            self._labels[word] = frozenset(closure)
+
+        alternatives = "|".join(
+            re.escape(word) for word in sorted(labels, key=len, reverse=True)
+        )
+        self._pattern: Pattern[str] = re.compile(f"(?=({alternatives}))")
+
+    def match(self, text: str) -> FrozenSet[str]:
+        """Метки всех ключевых слов, встречающихся в тексте"""
+        found: Set[str] = set()
+        for word in set(self._pattern.findall(text)):
+            found |= self._labels[word]
+        return frozenset(found)
+
+
+class IntentClassifier:
+    """Определение всех намерений сообщения за один проход"""
+
+    def __init__(
+        self,
+        keywords: Dict[str, List[str]] = INTENT_KEYWORDS,
+        patterns: Dict[str, List[str]] = INTENT_PATTERNS,
+        cache_size: int = 1024,
+    ):
+        self.matcher = KeywordMatcher(keywords)
+        # Шаблоны одного намерения объединяются в одно выражение,
+        # привязанное к началу сообщения
+        self.patterns: Dict[str, Pattern[str]] = {
+            intent: re.compile("|".join(f"(?:{p})" for p in intent_patterns), re.IGNORECASE)
+            for intent, intent_patterns in patterns.items()
+        }
+        # Одно сообщение обычно проверяют несколько маршрутизаторов подряд
+        self._classify_normalized = lru_cache(maxsize=cache_size)(self._classify)
+
+    def classify(self, message: str) -> FrozenSet[str]:
+        """Все намерения, найденные в сообщении"""
+        return self._classify_normalized(message.lower().strip())
+
+    def has(self, message: str, intent: str) -> bool:
+        """Есть ли в сообщении указанное намерение"""
+        return intent in self.classify(message)
+
+    def _classify(self, text: str) -> FrozenSet[str]:
+        intents = set(self.matcher.match(text))
+        for intent, pattern in self.patterns.items():
+            if pattern.match(text):
+                intents.add(intent)
+        return frozenset(intents)
+
+
+# Глобальный классификатор намерений
+intent_classifier = IntentClassifier()
+
+
+def classify_intents(message: str) -> FrozenSet[str]:
+    """Все намерения, найденные в сообщении"""
+    return intent_classifier.classify(message)
@@ -0,0 +1,187 @@
+"""
+Фоновое обновление «биржевых» данных (stale-while-revalidate)
+
+Курсы валют ЦБ РФ и криптовалют CoinGecko нужны во многих запросах, но
+меняются не чаще раз в минуту. Планировщик держит их в памяти свежими и
+обновляет по расписанию; запрос получает значение из памяти сразу. Если
+значение устарело, но не старше max_stale, оно отдается немедленно, а
+обновление запускается в фоне. Ждать источник приходится только при
+пустом или слишком старом значении.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CRYPTO_REFRESH_SECONDS = float(os.getenv("LIVE_DATA_CRYPTO_REFRESH_SECONDS", "60"))
+EXCHANGE_REFRESH_SECONDS = float(os.getenv("LIVE_DATA_EXCHANGE_REFRESH_SECONDS", "600"))
+# Дольше этого устаревшие данные не отдаются без ожидания обновления
+MAX_STALE_SECONDS = float(os.getenv("LIVE_DATA_MAX_STALE_SECONDS", "3600"))
+
+FetchFunc = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+class LiveDataset:
+    """Один набор данных с периодическим обновлением"""
+
+    def __init__(self, name: str, fetch: FetchFunc, refresh_interval: float, max_stale: float):
+        self.name = name
+        self.fetch = fetch
+        self.refresh_interval = refresh_interval
+        self.max_stale = max(max_stale, refresh_interval)
+        self.value: Optional[Dict[str, Any]] = None
+        self.updated_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._refreshing: Optional[asyncio.Task] = None
+        self.stats = {"fresh": 0, "stale": 0, "waited": 0, "refreshes": 0, "failures": 0}
+
+    def age(self) -> Optional[float]:
+        """Возраст значения в секундах"""
+        if self.updated_at is None:
+            return None
+        return time.monotonic() - self.updated_at
+
+    def store(self, value: Dict[str, Any]) -> None:
+        """Сохранить новое значение (в том числе полученное синхронным кодом)"""
+        self.value = value
+        self.updated_at = time.monotonic()
+        self.last_error = None
+
+    async def get(self) -> Dict[str, Any]:
+        """Значение из памяти; при устаревании — обновление в фоне"""
+        age = self.age()
+        if age is not None and age < self.refresh_interval:
+            self.stats["fresh"] += 1
+            return self.value
+        if age is not None and age < self.max_stale:
+            self.stats["stale"] += 1
+            self.start_refresh()
+            return self.value
+
+        self.stats["waited"] += 1
+        await asyncio.shield(self.start_refresh())
+        if self.value is None:
+            return {"error": self.last_error or f"Нет данных {self.name}"}
+        return self.value
+
+    def start_refresh(self) -> asyncio.Task:
+        """Запустить обновление, если оно еще не выполняется"""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.ensure_future(self.refresh())
+        return self._refreshing
+
+    async def refresh(self) -> None:
+        """Загрузить данные из источника; при ошибке сохраняется прежнее значение"""
+        started = time.perf_counter()
+        try:
+            value = await self.fetch()
+            if "error" in value:
+                raise RuntimeError(value["error"])
+        except Exception as e:
+            self.stats["failures"] += 1
+            self.last_error = str(e)
+            logger.error(f"Ошибка обновления {self.name}: {e}")
+            return
+
+        self.store(value)
+        self.stats["refreshes"] += 1
+        logger.info(f"Данные {self.name} обновлены за {time.perf_counter() - started:.2f}с")
+
+    def get_stats(self) -> Dict[str, Any]:
+        age = self.age()
+        return {
+            **self.stats,
+            "age_seconds": round(age, 1) if age is not None else None,
+            "refresh_interval": self.refresh_interval,
+            "refreshing": self._refreshing is not None and not self._refreshing.done(),
+            "last_error": self.last_error,
+        }
+
+
+class LiveDataRefresher:
+    """Планировщик обновления наборов данных"""
+
+    def __init__(self, max_stale: float = MAX_STALE_SECONDS):
+        self.max_stale = max_stale
+        self.datasets: Dict[str, LiveDataset] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, fetch: FetchFunc, refresh_interval: float) -> LiveDataset:
+        """Зарегистрировать набор данных"""
+        dataset = LiveDataset(name, fetch, refresh_interval, self.max_stale)
+        self.datasets[name] = dataset
+        return dataset
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def get(self, name: str) -> Dict[str, Any]:
+        """Значение набора данных без ожидания источника, если оно есть"""
+        return await self.datasets[name].get()
+
+    def snapshot(self, name: str) -> Optional[Dict[str, Any]]:
+        """Значение для синхронного кода или None, если его нужно загрузить
+
+        Устаревшее значение отдается, только пока работает планировщик,
+        который скоро его обновит.
+        """
+        dataset = self.datasets.get(name)
+        if dataset is None:
+            return None
+        age = dataset.age()
+        if age is None:
+            return None
+        if age < dataset.refresh_interval or (self.running and age < dataset.max_stale):
+            dataset.stats["fresh" if age < dataset.refresh_interval else "stale"] += 1
+            return dataset.value
+        return None
+
+    def store(self, name: str, value: Dict[str, Any]) -> None:
+        """Сохранить значение, загруженное в обход планировщика"""
+        dataset = self.datasets.get(name)
+        if dataset is not None and "error" not in value:
+            dataset.store(value)
+
+    def start(self) -> None:
+        """Запустить фоновое обновление в текущем event loop"""
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить фоновое обновление"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            refreshes = [
+                dataset.start_refresh()
+                for dataset in self.datasets.values()
+                if dataset.age() is None or dataset.age() >= dataset.refresh_interval
+            ]
+            if refreshes:
+                await asyncio.gather(*refreshes, return_exceptions=True)
+            # Проверяем чаще самого короткого интервала, чтобы не опаздывать
+            intervals = [dataset.refresh_interval for dataset in self.datasets.values()]
+            await asyncio.sleep(max(1.0, min(intervals, default=60.0) / 4))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возраст и статистика обращений по наборам данных"""
+        return {
+            "running": self.running,
+            "datasets": {name: dataset.get_stats() for name, dataset in self.datasets.items()},
+        }
+
+
+# Глобальный планировщик обновления данных
+live_data = LiveDataRefresher()
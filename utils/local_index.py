@@ -0,0 +1,231 @@
+"""
+Локальный полнотекстовый индекс загруженных страниц (SQLite FTS5)
+
+Текст каждой страницы, загруженной продвинутым поиском, попадает не только
+в дисковый кэш (поиск только по точному URL), но и в инвертированный
+индекс FTS5. Повторные и похожие вопросы находят страницы в индексе без
+обращения к поисковику и сайтам.
+
+У каждой страницы хранится время загрузки. Для запросов, чувствительных
+ко времени (новости, курсы, «сейчас», «сегодня»), подходят только
+страницы моложе LOCAL_INDEX_RECENT_SECONDS, поэтому такие вопросы, как
+правило, по-прежнему уходят в сеть. Страницы старше
+LOCAL_INDEX_MAX_AGE_SECONDS и сверх LOCAL_INDEX_MAX_PAGES удаляются.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.intent_classifier import classify_intents
+from utils.passage_retriever import tokenize
+
+logger = logging.getLogger(__name__)
+
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", os.path.join("cache", "local_index.sqlite3"))
+LOCAL_INDEX_MAX_AGE_SECONDS = float(os.getenv("LOCAL_INDEX_MAX_AGE_SECONDS", str(7 * 86400)))
+LOCAL_INDEX_RECENT_SECONDS = float(os.getenv("LOCAL_INDEX_RECENT_SECONDS", "900"))
+LOCAL_INDEX_MIN_PAGES = int(os.getenv("LOCAL_INDEX_MIN_PAGES", "2"))
+LOCAL_INDEX_MAX_PAGES = int(os.getenv("LOCAL_INDEX_MAX_PAGES", "20000"))
+
+# Намерения, для которых нужны свежие данные
+TIME_SENSITIVE_INTENTS = frozenset({
+    "recency", "query_news", "query_price", "topic_news", "topic_crypto",
+    "topic_exchange", "topic_weather",
+})
+
+# Чистка устаревших страниц — не чаще раза в столько добавлений
+_PRUNE_EVERY = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_fetched_at ON pages (fetched_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(content, tokenize = 'unicode61');
+"""
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """Выражение FTS5: все основы слов запроса как префиксы"""
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return None
+    return " AND ".join(f'"{term}"*' for term in terms)
+
+
+class LocalIndex:
+    """Инкрементальный полнотекстовый индекс страниц с временем загрузки"""
+
+    def __init__(
+        self,
+        path: str = LOCAL_INDEX_PATH,
+        max_age: float = LOCAL_INDEX_MAX_AGE_SECONDS,
+        recent_max_age: float = LOCAL_INDEX_RECENT_SECONDS,
+        min_pages: int = LOCAL_INDEX_MIN_PAGES,
+        max_pages: int = LOCAL_INDEX_MAX_PAGES,
+    ):
+        self.path = path
+        self.max_age = max_age
+        self.recent_max_age = recent_max_age
+        self.min_pages = min_pages
+        self.max_pages = max_pages
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._adds_since_prune = 0
+        self.indexed = 0
+        self.hits = 0
+        self.misses = 0
+        self.pruned = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Ленивое открытие базы при первом обращении"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def add(self, url: str, text: str, fetched_at: Optional[float] = None) -> None:
+        """Добавить или заменить текст страницы"""
+        if not text:
+            return
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                row = conn.execute("SELECT id FROM pages WHERE url = ?", (url,)).fetchone()
+                if row is None:
+                    page_id = conn.execute(
+                        "INSERT INTO pages (url, fetched_at) VALUES (?, ?)", (url, fetched_at)
+                    ).lastrowid
+                else:
+                    page_id = row[0]
+                    conn.execute("UPDATE pages SET fetched_at = ? WHERE id = ?", (fetched_at, page_id))
+                    conn.execute("DELETE FROM pages_fts WHERE rowid = ?", (page_id,))
+                conn.execute("INSERT INTO pages_fts (rowid, content) VALUES (?, ?)", (page_id, text))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self.indexed += 1
+            self._adds_since_prune += 1
+            if self._adds_since_prune >= _PRUNE_EVERY:
+                self._prune(time.time())
+
+    def touch(self, url: str, fetched_at: Optional[float] = None) -> None:
+        """Отметить страницу как свежую (сервер ответил 304)"""
+        with self._lock:
+            self._connect().execute(
+                "UPDATE pages SET fetched_at = ? WHERE url = ?",
+                (time.time() if fetched_at is None else fetched_at, url),
+            )
+
+    def max_age_for(self, query: str) -> float:
+        """Допустимый возраст страниц для запроса"""
+        if classify_intents(query) & TIME_SENSITIVE_INTENTS:
+            return self.recent_max_age
+        return self.max_age
+
+    def search(self, query: str, limit: int = 5, max_age: Optional[float] = None) -> List[Tuple[str, str]]:
+        """Страницы (url, текст), содержащие все слова запроса, по убыванию BM25"""
+        match = build_match_query(query)
+        if match is None:
+            return []
+        oldest = time.time() - (self.max_age if max_age is None else max_age)
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT pages.url, pages_fts.content FROM pages_fts "
+                "JOIN pages ON pages.id = pages_fts.rowid "
+                "WHERE pages_fts MATCH ? AND pages.fetched_at >= ? "
+                "ORDER BY bm25(pages_fts) LIMIT ?",
+                (match, oldest, limit),
+            ).fetchall()
+        return [(url, content) for url, content in rows]
+
+    def lookup(self, query: str, limit: int = 5) -> Optional[List[Tuple[str, str]]]:
+        """Страницы для ответа без сети или None, если их недостаточно"""
+        try:
+            pages = self.search(query, limit, self.max_age_for(query))
+        except sqlite3.Error as e:
+            logger.warning(f"Ошибка поиска в локальном индексе: {e}")
+            pages = []
+        if len(pages) < self.min_pages:
+            self.misses += 1
+            return None
+        self.hits += 1
+        logger.info(f"Локальный индекс: {len(pages)} страниц для '{query}'")
+        return pages
+
+    def prune(self) -> int:
+        """Удалить устаревшие и лишние страницы, вернуть их число"""
+        with self._lock:
+            self._connect()
+            return self._prune(time.time())
+
+    def clear(self) -> None:
+        """Очистить индекс"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM pages")
+            conn.execute("DELETE FROM pages_fts")
+
+    def close(self) -> None:
+        """Закрыть соединение с базой"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Размер индекса и доля запросов, отвеченных из него"""
+        with self._lock:
+            pages, oldest = self._connect().execute(
+                "SELECT COUNT(*), MIN(fetched_at) FROM pages"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "pages": pages,
+                "oldest_age_seconds": round(time.time() - oldest, 1) if oldest else None,
+                "indexed": self.indexed,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "pruned": self.pruned,
+            }
+
+    def _prune(self, now: float) -> int:
+        conn = self._conn
+        stale = [
+            row[0] for row in conn.execute(
+                "SELECT id FROM pages WHERE fetched_at < ?", (now - self.max_age,)
+            )
+        ]
+        total = conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        excess = total - len(stale) - self.max_pages
+        if excess > 0:
+            stale += [
+                row[0] for row in conn.execute(
+                    "SELECT id FROM pages WHERE fetched_at >= ? ORDER BY fetched_at LIMIT ?",
+                    (now - self.max_age, excess),
+                )
+            ]
+        if stale:
+            conn.execute("BEGIN")
+            conn.executemany("DELETE FROM pages WHERE id = ?", [(page_id,) for page_id in stale])
+            conn.executemany("DELETE FROM pages_fts WHERE rowid = ?", [(page_id,) for page_id in stale])
+            conn.execute("COMMIT")
+            self.pruned += len(stale)
+        self._adds_since_prune = 0
+        return len(stale)
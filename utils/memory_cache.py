@@ -0,0 +1,211 @@
+"""
+Ограниченный кэш в памяти: LRU по размеру и TTL на запись
+
+Заменяет простые словари, в которых парсеры держали HTML страниц:
+они проверяли срок жизни при чтении, но никогда ничего не удаляли,
+поэтому память процесса росла без ограничений. Здесь:
+- общий объем записей ограничен бюджетом в байтах, лишнее вытесняется по LRU;
+- у каждой записи свой срок жизни;
+- большие строки и байты хранятся сжатыми (zlib);
+- ведутся счетчики попаданий, промахов и вытеснений.
+
+Вместе со значением можно сохранить валидаторы HTTP (ETag, Last-Modified).
+Такая запись после истечения срока не удаляется, а отдается через lookup()
+как устаревшая, чтобы вызывающий код мог перепроверить ее условным
+запросом и при ответе 304 продлить через refresh().
+"""
+
+import os
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, NamedTuple, Optional
+
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+PAGE_CACHE_TTL_SECONDS = float(os.getenv("PAGE_CACHE_TTL_SECONDS", "300"))
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", "4096"))
+
+# Примерные накладные расходы Python на одну запись (ключ, кортеж, узел словаря)
+ENTRY_OVERHEAD_BYTES = 200
+
+# Быстрое сжатие: HTML сжимается в 4-8 раз уже на первом уровне
+_COMPRESS_LEVEL = 1
+
+
+class _Entry(NamedTuple):
+    value: Any
+    kind: Optional[str]  # None, если значение не сжато, иначе "str" или "bytes"
+    expires_at: float
+    size: int
+    validators: Optional[Dict[str, str]]
+
+
+class CacheLookup(NamedTuple):
+    """Найденная запись: значение, валидаторы HTTP и признак свежести"""
+
+    value: Any
+    validators: Optional[Dict[str, str]]
+    fresh: bool
+
+
+class BoundedCache:
+    """Потокобезопасный LRU-кэш с лимитом по памяти и TTL"""
+
+    def __init__(
+        self,
+        max_bytes: int = PAGE_CACHE_MAX_BYTES,
+        ttl: float = PAGE_CACHE_TTL_SECONDS,
+        compress_min_bytes: Optional[int] = CACHE_COMPRESS_MIN_BYTES,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # None отключает сжатие
+        self.compress_min_bytes = compress_min_bytes
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale = 0
+        self.revalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Значение из кэша или None, если его нет или срок жизни истек"""
+        found = self.lookup(key)
+        if found is None or not found.fresh:
+            return None
+        return found.value
+
+    def lookup(self, key: Hashable) -> Optional[CacheLookup]:
+        """Запись из кэша, включая устаревшие записи с валидаторами"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            fresh = entry.expires_at > time.monotonic()
+            if not fresh and not entry.validators:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if fresh:
+                self.hits += 1
+            else:
+                self.stale += 1
+        return CacheLookup(self._unpack(entry), entry.validators, fresh)
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: Optional[float] = None,
+        validators: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Сохранить значение; ttl по умолчанию берется из настроек кэша"""
+        stored, kind = self._pack(value)
+        size = ENTRY_OVERHEAD_BYTES + sys.getsizeof(stored)
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                # Запись больше всего кэша — не кэшируем
+                return
+            self._entries[key] = _Entry(stored, kind, expires_at, size, validators or None)
+            self._total_bytes += size
+            self._evict()
+
+    def refresh(
+        self,
+        key: Hashable,
+        ttl: Optional[float] = None,
+        validators: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Продлить запись после ответа 304, обновив валидаторы"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            self._entries[key] = entry._replace(
+                expires_at=expires_at, validators={**(entry.validators or {}), **(validators or {})}
+            )
+            self._entries.move_to_end(key)
+            self.revalidations += 1
+
+    def pop(self, key: Hashable) -> None:
+        """Удалить запись"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        """Очистить кэш"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry.expires_at > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика кэша"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "stale": self.stale,
+                "revalidations": self.revalidations,
+            }
+
+    def _pack(self, value: Any):
+        if self.compress_min_bytes is None:
+            return value, None
+        if isinstance(value, str) and len(value) >= self.compress_min_bytes:
+            compressed = zlib.compress(value.encode("utf-8"), _COMPRESS_LEVEL)
+            if sys.getsizeof(compressed) < sys.getsizeof(value):
+                return compressed, "str"
+        elif isinstance(value, bytes) and len(value) >= self.compress_min_bytes:
+            compressed = zlib.compress(value, _COMPRESS_LEVEL)
+            if len(compressed) < len(value):
+                return compressed, "bytes"
+        return value, None
+
+    @staticmethod
+    def _unpack(entry: _Entry) -> Any:
+        if entry.kind == "str":
+            return zlib.decompress(entry.value).decode("utf-8")
+        if entry.kind == "bytes":
+            return zlib.decompress(entry.value)
+        return entry.value
+
+    def _remove(self, key: Hashable) -> None:
+        self._total_bytes -= self._entries.pop(key).size
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._total_bytes -= entry.size
+            self.evictions += 1
+
+
+# Общий кэш HTML страниц для WebParser и UniversalWebParser
+page_cache = BoundedCache()
@@ -0,0 +1,99 @@
+"""
+Поиск почти одинаковых текстов (MinHash)
+
+В выдаче часто встречаются зеркала, перепечатки новостей и одна и та же
+статья Википедии под разными URL. Дедупликация по точному URL их не
+видит, и в промпт попадают две-три копии одного текста. Здесь у текста
+считается MinHash-подпись по шинглам из SHINGLE_WORDS слов:
+- каждый шингл получает стабильный 64-битный хеш (blake2b);
+- MINHASH_PERMUTATIONS перестановок хешей считаются разом в NumPy, в
+  подпись идет минимум по каждой перестановке;
+- доля совпавших позиций подписей оценивает сходство Жаккара множеств
+  шинглов; тексты со сходством от NEAR_DUPLICATE_SIMILARITY считаются
+  копиями, и остается только первый из них.
+
+В отличие от SimHash оценка не зависит от длины текста, поэтому один
+порог подходит и для целых страниц, и для коротких фрагментов.
+"""
+
+import hashlib
+import os
+import re
+from typing import Callable, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+
+SHINGLE_WORDS = 3
+MINHASH_PERMUTATIONS = 64
+NEAR_DUPLICATE_SIMILARITY = float(os.getenv("NEAR_DUPLICATE_SIMILARITY", "0.7"))
+
+WORD_RE = re.compile(r"[^\W_]+")
+
+# Перестановки вида x -> a * x + b (mod 2^64) с нечетным a и перемешиванием старших битов
+_rng = np.random.default_rng(20240601)
+_MULTIPLIERS = _rng.integers(1, 2**63, size=MINHASH_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_OFFSETS = _rng.integers(0, 2**63, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+def _shingle_hash(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def shingles(text: str) -> List[str]:
+    """Последовательности из SHINGLE_WORDS соседних слов текста"""
+    words = WORD_RE.findall(text.lower())
+    if len(words) <= SHINGLE_WORDS:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """MinHash-подпись текста или None, если в нем нет слов"""
+    text_shingles = set(shingles(text))
+    if not text_shingles:
+        return None
+    hashes = np.fromiter((_shingle_hash(s) for s in text_shingles), dtype=np.uint64)
+    values = hashes[:, None] * _MULTIPLIERS + _OFFSETS
+    values ^= values >> np.uint64(29)
+    return values.min(axis=0)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Оценка сходства Жаккара по двум подписям"""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+class NearDuplicateFilter:
+    """Запоминает подписи увиденных текстов и узнает их копии"""
+
+    def __init__(self, threshold: float = NEAR_DUPLICATE_SIMILARITY):
+        self.threshold = threshold
+        self.signatures: List[np.ndarray] = []
+        self.duplicates = 0
+
+    def is_duplicate(self, text: str) -> bool:
+        """Копия ли текст уже увиденного; новый текст запоминается"""
+        signature = minhash(text)
+        if signature is None:
+            return False
+        if self.signatures:
+            # Сравнение со всеми запомненными подписями одной операцией
+            matches = np.count_nonzero(np.vstack(self.signatures) == signature, axis=1)
+            if matches.max() / len(signature) >= self.threshold:
+                self.duplicates += 1
+                return True
+        self.signatures.append(signature)
+        return False
+
+
+def drop_near_duplicates(
+    items: Sequence[T],
+    text_of: Callable[[T], str],
+    threshold: float = NEAR_DUPLICATE_SIMILARITY,
+) -> Tuple[List[T], int]:
+    """Элементы без почти одинаковых копий (из копий остается первая) и число удаленных"""
+    seen = NearDuplicateFilter(threshold)
+    kept = [item for item in items if not seen.is_duplicate(text_of(item))]
+    return kept, seen.duplicates
@@ -0,0 +1,310 @@
+"""
+Фоновый сбор новостей в индекс в памяти
+
+Раньше каждый вопрос о новостях загружал и разбирал главную страницу
+ria.ru и брал первые теги h1/h2/h3, а тема вопроса (get_news(query))
+не учитывалась. Теперь новости собираются заранее:
+- планировщик utils.live_data раз в NEWS_REFRESH_SECONDS загружает RSS
+  источников NEWS_FEEDS; если лента недоступна или пуста, разбирается
+  главная страница источника;
+- заголовки без повторов (одинаковые после нормализации и почти
+  одинаковые по MinHash) попадают в NewsIndex;
+- заголовок индексируется по словам темы (основы слов из
+  utils.passage_retriever) в инвертированном индексе;
+- вопрос о новостях отвечается из памяти: слова темы вопроса отбирают
+  заголовки, без темы возвращаются последние новости.
+
+Старше NEWS_MAX_AGE_SECONDS и сверх NEWS_MAX_ITEMS заголовки удаляются.
+"""
+
+import email.utils
+import logging
+import math
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set
+from urllib.parse import urljoin
+
+import numpy as np
+from lxml import etree
+
+from utils.content_extractor import make_soup
+from utils.near_duplicates import NEAR_DUPLICATE_SIMILARITY, minhash
+from utils.passage_retriever import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class NewsSource(NamedTuple):
+    """Источник новостей: главная страница и RSS-лента"""
+
+    page_url: str
+    feed_url: Optional[str]
+
+
+def _parse_sources(value: str) -> List[NewsSource]:
+    """Источники из строки вида «страница|лента,страница|лента»"""
+    sources = []
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        page_url, _, feed_url = entry.partition("|")
+        sources.append(NewsSource(page_url.strip(), feed_url.strip() or None))
+    return sources
+
+
+NEWS_FEEDS = _parse_sources(os.getenv(
+    "NEWS_FEEDS",
+    "https://ria.ru|https://ria.ru/export/rss2/archive/index.xml,"
+    "https://tass.ru|https://tass.ru/rss/v2.xml,"
+    "https://lenta.ru|https://lenta.ru/rss/news",
+))
+NEWS_REFRESH_SECONDS = float(os.getenv("NEWS_REFRESH_SECONDS", "600"))
+NEWS_MAX_AGE_SECONDS = float(os.getenv("NEWS_MAX_AGE_SECONDS", str(2 * 86400)))
+NEWS_MAX_ITEMS = int(os.getenv("NEWS_MAX_ITEMS", "1000"))
+# Сколько заголовков брать с главной страницы, если лента недоступна
+NEWS_PAGE_HEADLINES = 30
+# Заголовки не длиннее этого — обычно пункты меню
+MIN_HEADLINE_CHARS = 10
+
+# Слова, которые говорят о новостях вообще, а не о теме
+NEWS_GENERIC_TERMS = frozenset(tokenize(
+    "новости новость новостей последние свежие главные сегодня сегодняшние "
+    "что нового происходит актуально расскажи покажи news latest today headlines"
+))
+
+_SPACE_RE = re.compile(r"\s+")
+_XML_PARSER = etree.XMLParser(resolve_entities=False, no_network=True, recover=True)
+
+
+def _local_name(element: Any) -> str:
+    """Имя тега без пространства имен (Atom, RSS с расширениями)"""
+    return etree.QName(element).localname if isinstance(element.tag, str) else ""
+
+
+def _child_text(element: Any, name: str) -> str:
+    for child in element:
+        if _local_name(child) == name:
+            return _SPACE_RE.sub(" ", "".join(child.itertext())).strip()
+    return ""
+
+
+def _parse_date(value: str) -> Optional[float]:
+    """Время публикации из RFC 822 (RSS) или ISO 8601 (Atom)"""
+    if not value:
+        return None
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def parse_feed(xml: str, source: str) -> List[Dict[str, Any]]:
+    """Заголовки из RSS 2.0 или Atom"""
+    try:
+        root = etree.fromstring(xml.strip().encode("utf-8"), _XML_PARSER)
+    except (etree.XMLSyntaxError, ValueError):
+        return []
+    if root is None:
+        return []
+
+    news = []
+    for element in root.iter():
+        if _local_name(element) not in ("item", "entry"):
+            continue
+        title = _child_text(element, "title")
+        if len(title) <= MIN_HEADLINE_CHARS:
+            continue
+        url = _child_text(element, "link") or None
+        if url is None:
+            # В Atom ссылка — атрибут href
+            for child in element:
+                if _local_name(child) == "link" and child.get("href"):
+                    url = child.get("href")
+                    break
+        published = None
+        for name in ("pubDate", "published", "updated", "date"):
+            published = _parse_date(_child_text(element, name))
+            if published is not None:
+                break
+        news.append({"title": title, "source": source, "url": url, "published": published})
+    return news
+
+
+def parse_headlines_html(html: str, source: str, limit: int = 5) -> List[Dict[str, Any]]:
+    """Заголовки из HTML главной страницы (если RSS недоступен)"""
+    soup = make_soup(html)
+    news = []
+    for headline in soup.find_all(["h1", "h2", "h3"]):
+        text = _SPACE_RE.sub(" ", headline.get_text()).strip()
+        if len(text) <= MIN_HEADLINE_CHARS:
+            continue
+        link = headline.find("a") or headline.find_parent("a")
+        href = link.get("href") if link is not None else None
+        news.append({
+            "title": text,
+            "source": source,
+            "url": urljoin(source, href) if href else None,
+            "published": None,
+        })
+        if len(news) >= limit:
+            break
+    return news
+
+
+def topic_terms(query: str) -> Set[str]:
+    """Слова темы вопроса без общих слов о новостях"""
+    return set(tokenize(query)) - NEWS_GENERIC_TERMS
+
+
+class NewsIndex:
+    """Заголовки новостей без повторов с индексом по словам темы"""
+
+    def __init__(self, max_items: int = NEWS_MAX_ITEMS, max_age: float = NEWS_MAX_AGE_SECONDS):
+        self.max_items = max_items
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._items: Dict[int, Dict[str, Any]] = {}
+        self._signatures: Dict[int, np.ndarray] = {}
+        self._keys: Dict[str, int] = {}
+        self._terms: Dict[str, Set[int]] = {}
+        self._next_id = 0
+        self.stats = {"ingested": 0, "duplicates": 0, "searches": 0, "topic_hits": 0}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @staticmethod
+    def _key(title: str) -> str:
+        return " ".join(re.findall(r"[^\W_]+", title.lower()))
+
+    def _is_duplicate(self, key: str, signature: Optional[np.ndarray]) -> bool:
+        if key in self._keys:
+            return True
+        if signature is None or not self._signatures:
+            return False
+        # Почти одинаковые заголовки (перепечатки с правкой пунктуации или слова)
+        matches = np.count_nonzero(np.vstack(list(self._signatures.values())) == signature, axis=1)
+        return matches.max() / len(signature) >= NEAR_DUPLICATE_SIMILARITY
+
+    def add(self, news: List[Dict[str, Any]], fetched_at: Optional[float] = None) -> int:
+        """Добавить заголовки, вернуть число новых"""
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        added = 0
+        with self._lock:
+            for item in news:
+                key = self._key(item["title"])
+                signature = minhash(item["title"])
+                if not key or self._is_duplicate(key, signature):
+                    self.stats["duplicates"] += 1
+                    continue
+                item_id = self._next_id
+                self._next_id += 1
+                self._items[item_id] = {
+                    **item,
+                    "published": item.get("published") or fetched_at,
+                }
+                self._keys[key] = item_id
+                if signature is not None:
+                    self._signatures[item_id] = signature
+                for term in set(tokenize(item["title"])):
+                    self._terms.setdefault(term, set()).add(item_id)
+                added += 1
+            self.stats["ingested"] += added
+            self._prune(time.time())
+        return added
+
+    def _remove(self, item_id: int) -> None:
+        item = self._items.pop(item_id)
+        self._signatures.pop(item_id, None)
+        self._keys.pop(self._key(item["title"]), None)
+        for term in set(tokenize(item["title"])):
+            ids = self._terms.get(term)
+            if ids is not None:
+                ids.discard(item_id)
+                if not ids:
+                    del self._terms[term]
+
+    def _prune(self, now: float) -> None:
+        by_age = sorted(self._items, key=lambda item_id: self._items[item_id]["published"])
+        excess = len(by_age) - self.max_items
+        for index, item_id in enumerate(by_age):
+            if index >= excess and self._items[item_id]["published"] >= now - self.max_age:
+                break
+            self._remove(item_id)
+
+    def search(self, query: str = "", limit: int = 5) -> List[Dict[str, Any]]:
+        """Заголовки по теме вопроса (или последние, если темы нет), свежие первыми"""
+        terms = topic_terms(query)
+        with self._lock:
+            self.stats["searches"] += 1
+            if not terms:
+                candidates = list(self._items)
+            else:
+                # Для темы из нескольких слов нужна хотя бы половина из них
+                matched: Dict[int, int] = {}
+                for term in terms:
+                    for item_id in self._terms.get(term, ()):
+                        matched[item_id] = matched.get(item_id, 0) + 1
+                needed = math.ceil(len(terms) / 2)
+                candidates = [item_id for item_id, count in matched.items() if count >= needed]
+                if candidates:
+                    self.stats["topic_hits"] += 1
+            candidates.sort(
+                key=lambda item_id: (
+                    -(matched[item_id] if terms else 0), -self._items[item_id]["published"]
+                )
+            )
+            return [self._render(self._items[item_id]) for item_id in candidates[:limit]]
+
+    @staticmethod
+    def _render(item: Dict[str, Any]) -> Dict[str, Any]:
+        return {**item, "published": datetime.fromtimestamp(item["published"]).isoformat()}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._signatures.clear()
+            self._keys.clear()
+            self._terms.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Размер индекса и доля вопросов, для которых нашлась тема"""
+        with self._lock:
+            return {**self.stats, "items": len(self._items), "terms": len(self._terms)}
+
+
+def ingest_news(
+    index: NewsIndex, sources: Sequence[NewsSource], batches: Sequence[List[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    """Добавить заголовки, загруженные из источников, и вернуть сводку для live_data"""
+    if not any(batches):
+        return {"error": "Не удалось загрузить новости ни из одного источника"}
+    added = index.add([item for batch in batches for item in batch])
+    logger.info(f"Новости: добавлено {added} заголовков, в индексе {len(index)}")
+    return {
+        "items": len(index),
+        "added": added,
+        "sources": {source.page_url: len(batch) for source, batch in zip(sources, batches)},
+    }
+
+
+def news_result(index: NewsIndex, query: str = "", limit: int = 5) -> Dict[str, Any]:
+    """Ответ get_news: новости по теме вопроса или, если по теме ничего нет, последние"""
+    result: Dict[str, Any] = {"timestamp": datetime.now().isoformat()}
+    news = index.search(query, limit)
+    if topic_terms(query):
+        result["topic_matched"] = bool(news)
+        if not news:
+            news = index.search("", limit)
+    result["news"] = news
+    return result
+
+
+# Глобальный индекс новостей
+news_index = NewsIndex()
@@ -1,6 +1,6 @@
 import os
 import tempfile
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 from dotenv import load_dotenv
 from openai import OpenAI, AsyncOpenAI
@@ -74,6 +74,8 @@ except ImportError as e:
     def get_model_config(model): return {}
     def get_system_prompt(): return ""
 
+API_KEY_MISSING_MESSAGE = "⚠️ OpenAI API ключ не настроен. Пожалуйста, добавьте ваш API ключ в файл .env"
+
 # Legacy MODELS dict for backward compatibility
 MODELS = {
     "gpt-4o-mini": {
@@ -105,35 +107,62 @@ def get_model_config(model_name: str) -> Dict[str, Any]:
     return get_ai_model_config(model_name)
 
 
+def _build_enhanced_messages(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Добавить системный промпт и обработать последнее сообщение пользователя"""
+    enhanced_messages = []
+
+    # Add system prompt
+    system_prompt = get_system_prompt()
+    enhanced_messages.append(system_prompt)
+
+    # Process user messages and enhance the last user message
+    for i, msg in enumerate(messages):
+        if msg.get("role") == "user" and i == len(messages) - 1:
+            # This is the last user message - enhance it
+            enhanced_user_prompt = get_enhanced_user_prompt(msg["content"])
+            enhanced_messages.append({"role": "user", "content": enhanced_user_prompt})
+        else:
+            # Keep other messages as is
+            enhanced_messages.append(msg)
+
+    return enhanced_messages
+
+
+class GenerationError(Exception):
+    """Ошибка генерации ответа; текст исключения можно показать пользователю"""
+
+
+def _format_generation_error(e: Exception) -> str:
+    """Человекочитаемое сообщение об ошибке генерации"""
+    if "max_tokens" in str(e):
+        return "Извините, произошла ошибка с настройками модели. Попробуйте еще раз."
+    elif "rate_limit" in str(e).lower():
+        return "Превышен лимит запросов. Пожалуйста, подождите немного и попробуйте снова."
+    elif "invalid_api_key" in str(e).lower():
+        return "Ошибка API ключа. Обратитесь к администратору."
+    else:
+        return f"Извините, произошла ошибка при генерации ответа: {str(e)[:100]}..."
+
+
 async def generate_response(
-    messages: List[Dict[str, str]], model: str = "gpt-4o-mini"
+    messages: List[Dict[str, str]], model: str = "gpt-4o-mini", raise_errors: bool = False
 ) -> str:
-    """Generate AI response using OpenAI API with enhanced analytical system"""
+    """Generate AI response using OpenAI API with enhanced analytical system
+
+    С raise_errors=True ошибка выбрасывается как GenerationError, а не
+    возвращается текстом вместо ответа.
+    """
     if not async_openai_client:
-        return "⚠️ OpenAI API ключ не настроен. Пожалуйста, добавьте ваш API ключ в файл .env"
+        if raise_errors:
+            raise GenerationError(API_KEY_MISSING_MESSAGE)
+        return API_KEY_MISSING_MESSAGE
 
     try:
         # Get generation parameters from new config
         gen_params = get_generation_params(model)
 
         # Prepare enhanced messages
-        enhanced_messages = []
-
-        # Add system prompt
-        system_prompt = get_system_prompt()
-        enhanced_messages.append(system_prompt)
-
-        # Process user messages and enhance the last user message
-        for i, msg in enumerate(messages):
-            if msg.get("role") == "user" and i == len(messages) - 1:
-                # This is the last user message - enhance it
-                enhanced_user_prompt = get_enhanced_user_prompt(msg["content"])
-                enhanced_messages.append(
-                    {"role": "user", "content": enhanced_user_prompt}
-                )
-            else:
-                # Keep other messages as is
-                enhanced_messages.append(msg)
+        enhanced_messages = _build_enhanced_messages(messages)
 
         response = await async_openai_client.chat.completions.create(
             model=gen_params["model"],
@@ -148,16 +177,75 @@ async def generate_response(
 
     except Exception as e:
         # Более детальная обработка ошибок
-        if "max_tokens" in str(e):
-            return (
-                "Извините, произошла ошибка с настройками модели. Попробуйте еще раз."
-            )
-        elif "rate_limit" in str(e).lower():
-            return "Превышен лимит запросов. Пожалуйста, подождите немного и попробуйте снова."
-        elif "invalid_api_key" in str(e).lower():
-            return "Ошибка API ключа. Обратитесь к администратору."
-        else:
-            return f"Извините, произошла ошибка при генерации ответа: {str(e)[:100]}..."
+        if raise_errors:
+            raise GenerationError(_format_generation_error(e)) from e
+        return _format_generation_error(e)
+
+
+async def stream_response(
+    messages: List[Dict[str, str]], model: str = "gpt-4o-mini", raise_errors: bool = False
+) -> AsyncIterator[str]:
+    """Stream AI response deltas as they arrive from OpenAI API
+
+    С raise_errors=True ошибка (в том числе посреди потока) выбрасывается
+    как GenerationError, а не выдается фрагментом ответа.
+    """
+    if not async_openai_client:
+        if raise_errors:
+            raise GenerationError(API_KEY_MISSING_MESSAGE)
+        yield API_KEY_MISSING_MESSAGE
+        return
+
+    try:
+        gen_params = get_generation_params(model)
+        enhanced_messages = _build_enhanced_messages(messages)
+
+        stream = await async_openai_client.chat.completions.create(
+            model=gen_params["model"],
+            messages=enhanced_messages,
+            max_tokens=gen_params["max_tokens"],
+            temperature=gen_params["temperature"],
+            top_p=gen_params["top_p"],
+            stream=True,
+        )
+
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+    except Exception as e:
+        if raise_errors:
+            raise GenerationError(_format_generation_error(e)) from e
+        yield _format_generation_error(e)
+
+
+async def generate_raw_response(
+    messages: List[Dict[str, str]], model: str = "gpt-4o-mini", max_tokens: int = 1000
+) -> Optional[str]:
+    """Generate completion for service tasks without the assistant system prompt
+
+    Возвращает None при ошибке, чтобы вызывающий код не сохранил текст ошибки
+    как полезный результат.
+    """
+    if not async_openai_client:
+        return None
+
+    try:
+        gen_params = get_generation_params(model)
+        response = await async_openai_client.chat.completions.create(
+            model=gen_params["model"],
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=0.3,
+            stream=False,
+        )
+        return response.choices[0].message.content
+    except Exception as e:
+        print(f"❌ Service completion error: {e}")
+        return None
 
 
 def format_messages_for_openai(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
@@ -0,0 +1,170 @@
+"""
+Поиск релевантных фрагментов страниц (BM25)
+
+Раньше AdvancedWebSearch ранжировал целые документы по 5000 символов
+через TF-IDF, который обучался заново на каждый запрос, а в промпт
+попадали первые 1000 символов каждой страницы. Здесь:
+- страницы делятся на фрагменты по абзацам, не длиннее PASSAGE_CHARS;
+- у каждого фрагмента сохраняется источник: URL и смещения в тексте;
+- фрагменты оцениваются по BM25 относительно запроса, расчет по всем
+  фрагментам сразу выполняется в NumPy;
+- возвращаются лучшие фрагменты в пределах бюджета символов, без
+  почти одинаковых копий (utils.near_duplicates).
+
+Слова приводятся к нижнему регистру, стоп-слова отбрасываются, а у
+длинных слов отрезаются типичные русские окончания, чтобы «поиск» и
+«поиска» совпадали.
+"""
+
+import os
+import re
+from collections import Counter
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+from utils.near_duplicates import NearDuplicateFilter
+
+# Параметры BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Максимальная длина фрагмента в символах
+PASSAGE_CHARS = int(os.getenv("PASSAGE_CHARS", "600"))
+# Сколько фрагментов и символов уходит в промпт
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "8"))
+RETRIEVAL_BUDGET_CHARS = int(os.getenv("RETRIEVAL_BUDGET_CHARS", "4000"))
+
+# Русские стоп-слова
+STOP_WORDS = frozenset([
+    'и', 'в', 'во', 'не', 'что', 'он', 'на', 'я', 'с', 'со', 'как', 'а', 'то', 'все', 'она', 'так', 'его', 'но', 'да', 'ты', 'к', 'у', 'же', 'вы', 'за', 'бы', 'по', 'только', 'ее', 'мне', 'было', 'вот', 'от', 'меня', 'еще', 'нет', 'о', 'из', 'ему', 'теперь', 'когда', 'даже', 'ну', 'вдруг', 'ли', 'если', 'уже', 'или', 'ни', 'быть', 'был', 'него', 'до', 'вас', 'нибудь', 'опять', 'уж', 'вам', 'ведь', 'там', 'потом', 'себя', 'ничего', 'ей', 'может', 'они', 'тут', 'где', 'есть', 'надо', 'ней', 'для', 'мы', 'тебя', 'их', 'чем', 'была', 'сам', 'чтоб', 'без', 'будто', 'чего', 'раз', 'тоже', 'себе', 'под', 'будет', 'ж', 'тогда', 'кто', 'этот', 'того', 'потому', 'этого', 'какой', 'совсем', 'ним', 'здесь', 'этом', 'один', 'почти', 'мой', 'тем', 'чтобы', 'нее', 'сейчас', 'были', 'куда', 'зачем', 'всех', 'никогда', 'можно', 'при', 'наконец', 'два', 'об', 'другой', 'хоть', 'после', 'над', 'больше', 'тот', 'через', 'эти', 'нас', 'про', 'всего', 'них', 'какая', 'много', 'разве', 'три', 'эту', 'моя', 'впрочем', 'хорошо', 'свою', 'этой', 'перед', 'иногда', 'лучше', 'чуть', 'том', 'нельзя', 'такой', 'им', 'более', 'всегда', 'конечно', 'всю', 'между'
+])
+
+WORD_RE = re.compile(r"[^\W_]+")
+LINE_RE = re.compile(r"[^\n]+")
+# Окончания отрезаются только у слов длиннее STEM_MIN_CHARS
+ENDING_RE = re.compile(
+    r"(?:иями|ями|ами|иях|ого|его|ому|ему|ыми|ими|ией|ых|их|ах|ях|ам|ям|ов|ев|ей|ой|ый|ий|ая|яя|"
+    r"ое|ее|ые|ие|ую|юю|ом|ем|ым|им|а|я|о|е|ы|и|у|ю|ь)$"
+)
+STEM_MIN_CHARS = 4
+
+
+class Passage(NamedTuple):
+    """Фрагмент страницы с источником и оценкой BM25"""
+
+    url: str
+    start: int
+    end: int
+    text: str
+    score: float = 0.0
+
+
+def tokenize(text: str) -> List[str]:
+    """Слова текста без стоп-слов, с отрезанными окончаниями"""
+    terms = []
+    for word in WORD_RE.findall(text.lower()):
+        if word in STOP_WORDS:
+            continue
+        if len(word) > STEM_MIN_CHARS:
+            word = ENDING_RE.sub("", word)
+        terms.append(word)
+    return terms
+
+
+def _line_spans(text: str, max_chars: int) -> List[Tuple[int, int]]:
+    """Границы строк; слишком длинные строки режутся по пробелу"""
+    spans = []
+    for match in LINE_RE.finditer(text):
+        start, end = match.span()
+        while end - start > max_chars:
+            cut = text.rfind(" ", start, start + max_chars)
+            if cut <= start:
+                cut = start + max_chars
+            spans.append((start, cut))
+            start = cut
+        if text[start:end].strip():
+            spans.append((start, end))
+    return spans
+
+
+def split_passages(url: str, text: str, max_chars: int = PASSAGE_CHARS) -> List[Passage]:
+    """Разбить текст на фрагменты из соседних абзацев не длиннее max_chars"""
+    passages = []
+    start = end = None
+    for line_start, line_end in _line_spans(text, max_chars):
+        if start is not None and line_end - start > max_chars:
+            passages.append(Passage(url, start, end, text[start:end].strip()))
+            start = None
+        if start is None:
+            start = line_start
+        end = line_end
+    if start is not None:
+        passages.append(Passage(url, start, end, text[start:end].strip()))
+    return passages
+
+
+def bm25_scores(query: str, passages: Sequence[Passage]) -> np.ndarray:
+    """Оценки BM25 всех фрагментов относительно запроса"""
+    query_terms = list(dict.fromkeys(tokenize(query)))
+    if not passages or not query_terms:
+        return np.zeros(len(passages))
+
+    # Частоты терминов запроса: строки — фрагменты, столбцы — термины
+    tf = np.zeros((len(passages), len(query_terms)))
+    lengths = np.zeros(len(passages))
+    for row, passage in enumerate(passages):
+        terms = tokenize(passage.text)
+        lengths[row] = len(terms)
+        counts = Counter(terms)
+        tf[row] = [counts.get(term, 0) for term in query_terms]
+
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((len(passages) - df + 0.5) / (df + 0.5))
+    average = lengths.mean() or 1.0
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / average)
+    return (tf * (BM25_K1 + 1) / (tf + norm[:, None]) * idf).sum(axis=1)
+
+
+def retrieve_passages(
+    query: str,
+    documents: Sequence[Tuple[str, str]],
+    top_k: int = RETRIEVAL_TOP_K,
+    max_chars: int = RETRIEVAL_BUDGET_CHARS,
+) -> List[Passage]:
+    """Лучшие фрагменты документов (url, текст) в пределах бюджета символов
+
+    Фрагменты отсортированы по убыванию оценки, почти одинаковые фрагменты
+    пропускаются. Если ни один фрагмент не содержит слов запроса, берутся
+    начала документов.
+    """
+    passages = [passage for url, text in documents for passage in split_passages(url, text)]
+    if not passages:
+        return []
+    scores = bm25_scores(query, passages)
+    if scores.max() > 0:
+        order = [index for index in np.argsort(-scores, kind="stable") if scores[index] > 0]
+    else:
+        order = list(range(len(passages)))
+
+    selected = []
+    budget = max_chars
+    # Один и тот же абзац с разных страниц (перепечатки) берется один раз
+    seen = NearDuplicateFilter()
+    for index in order:
+        passage = passages[index]
+        if len(passage.text) > budget or seen.is_duplicate(passage.text):
+            continue
+        selected.append(passage._replace(score=round(float(scores[index]), 4)))
+        budget -= len(passage.text)
+        if len(selected) >= top_k or budget <= 0:
+            break
+    return selected
+
+
+def group_by_url(passages: Sequence[Passage]) -> Dict[str, List[Passage]]:
+    """Фрагменты по источникам в порядке оценки"""
+    groups: Dict[str, List[Passage]] = {}
+    for passage in passages:
+        groups.setdefault(passage.url, []).append(passage)
+    return groups
@@ -0,0 +1,177 @@
+"""
+Параллельная загрузка страниц с вежливостью по отношению к хостам
+
+Вместо последовательной загрузки с time.sleep(1) после каждой страницы
+все страницы загружаются параллельно, а нагрузка ограничивается для
+каждого хоста отдельно: не больше POLITE_MAX_PER_HOST одновременных
+запросов и не чаще одного запуска в POLITE_MIN_INTERVAL_SECONDS.
+Результаты отдаются по мере готовности.
+
+Есть синхронный вариант (пул потоков) для парсеров на requests и
+асинхронный для обработчиков FastAPI.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import asynccontextmanager, contextmanager
+from typing import (Any, AsyncIterator, Awaitable, Callable, Dict, Iterator,
+                    List, Tuple)
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+MAX_PER_HOST = int(os.getenv("POLITE_MAX_PER_HOST", "2"))
+MIN_INTERVAL_SECONDS = float(os.getenv("POLITE_MIN_INTERVAL_SECONDS", "0.25"))
+MAX_FETCH_WORKERS = int(os.getenv("POLITE_FETCH_WORKERS", "8"))
+
+
+def host_of(url: str) -> str:
+    """Хост URL в нижнем регистре"""
+    return (urlparse(url).hostname or "").lower()
+
+
+class _HostStats:
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def record(self, host: str, waited: float) -> None:
+        stats = self._stats.setdefault(host, {"requests": 0, "waited_seconds": 0.0})
+        stats["requests"] += 1
+        stats["waited_seconds"] = round(stats["waited_seconds"] + waited, 3)
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        return dict(self._stats)
+
+
+class HostLimiter:
+    """Ограничение запросов к хосту для потоков"""
+
+    def __init__(self, max_per_host: int = MAX_PER_HOST, min_interval: float = MIN_INTERVAL_SECONDS):
+        self.max_per_host = max_per_host
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._next_start: Dict[str, float] = {}
+        self.stats = _HostStats()
+
+    @contextmanager
+    def slot(self, url: str) -> Iterator[None]:
+        """Дождаться очереди хоста и занять слот на время запроса"""
+        host = host_of(url)
+        started = time.monotonic()
+        with self._lock:
+            semaphore = self._semaphores.setdefault(
+                host, threading.BoundedSemaphore(self.max_per_host)
+            )
+        with semaphore:
+            with self._lock:
+                now = time.monotonic()
+                start_at = max(now, self._next_start.get(host, now))
+                self._next_start[host] = start_at + self.min_interval
+            if start_at > now:
+                time.sleep(start_at - now)
+            with self._lock:
+                self.stats.record(host, time.monotonic() - started)
+            yield
+
+
+class AsyncHostLimiter:
+    """Ограничение запросов к хосту для корутин"""
+
+    def __init__(self, max_per_host: int = MAX_PER_HOST, min_interval: float = MIN_INTERVAL_SECONDS):
+        self.max_per_host = max_per_host
+        self.min_interval = min_interval
+        # Семафоры asyncio привязаны к event loop, поэтому он входит в ключ
+        self._semaphores: Dict[Tuple[int, str], asyncio.Semaphore] = {}
+        self._next_start: Dict[str, float] = {}
+        self.stats = _HostStats()
+
+    @asynccontextmanager
+    async def slot(self, url: str) -> AsyncIterator[None]:
+        """Дождаться очереди хоста и занять слот на время запроса"""
+        host = host_of(url)
+        started = time.monotonic()
+        key = (id(asyncio.get_running_loop()), host)
+        semaphore = self._semaphores.get(key)
+        if semaphore is None:
+            semaphore = self._semaphores[key] = asyncio.Semaphore(self.max_per_host)
+        async with semaphore:
+            now = time.monotonic()
+            start_at = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start_at + self.min_interval
+            if start_at > now:
+                await asyncio.sleep(start_at - now)
+            self.stats.record(host, time.monotonic() - started)
+            yield
+
+
+# Глобальные ограничители запросов к хостам
+host_limiter = HostLimiter()
+async_host_limiter = AsyncHostLimiter()
+
+
+def polite_fetch_all(
+    urls: List[str],
+    fetch: Callable[[str], Any],
+    max_workers: int = MAX_FETCH_WORKERS,
+) -> Iterator[Tuple[int, str, Any]]:
+    """Загрузить URL параллельно в потоках, отдавая (индекс, url, результат) по готовности
+
+    Исключения fetch логируются, для такого URL результат — None.
+    """
+    if not urls:
+        return
+
+    def run(url: str) -> Any:
+        with host_limiter.slot(url):
+            return fetch(url)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as executor:
+        futures = {executor.submit(run, url): index for index, url in enumerate(urls)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Ошибка загрузки {urls[index]}: {e}")
+                result = None
+            yield index, urls[index], result
+
+
+async def async_polite_fetch_all(
+    urls: List[str], fetch: Callable[[str], Awaitable[Any]]
+) -> AsyncIterator[Tuple[int, str, Any]]:
+    """Асинхронно загрузить URL, отдавая (индекс, url, результат) по готовности
+
+    Исключения fetch логируются, для такого URL результат — None.
+    """
+
+    async def run(index: int, url: str) -> Tuple[int, str, Any]:
+        try:
+            async with async_host_limiter.slot(url):
+                return index, url, await fetch(url)
+        except Exception as e:
+            logger.error(f"Ошибка загрузки {url}: {e}")
+            return index, url, None
+
+    tasks = [asyncio.ensure_future(run(index, url)) for index, url in enumerate(urls)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def get_politeness_stats() -> Dict[str, Any]:
+    """Число запросов и время ожидания очереди по хостам"""
+    return {
+        "max_per_host": MAX_PER_HOST,
+        "min_interval_seconds": MIN_INTERVAL_SECONDS,
+        "sync": host_limiter.stats.get_stats(),
+        "async": async_host_limiter.stats.get_stats(),
+    }
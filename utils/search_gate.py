@@ -0,0 +1,237 @@
+"""
+Оценка необходимости веб-поиска для сообщения
+
+Вместо поиска почти на каждое сообщение решение принимается по оценке
+score в диапазоне [0, 1], которая складывается из дешевых признаков:
+явная просьба найти, слова о свежести данных, темы с живыми данными
+(курсы, погода, новости), фактические вопросы, именованные сущности и
+годы. Признаки самодостаточных задач (код, перевод, объяснение) оценку
+снижают. Поиск выполняется, если score >= SEARCH_GATE_THRESHOLD.
+
+Для каждого решения с поиском после ответа записывается, использовала ли
+модель найденное (ссылки на источники — домены или номера [n] из блока
+фрагментов utils.context_packer, числа и термины из результатов в ответе). Статистика по корзинам score позволяет подобрать порог.
+"""
+
+import logging
+import os
+import re
+from collections import deque
+from typing import Deque, Dict, Optional, Set
+
+from utils.intent_classifier import classify_intents
+
+logger = logging.getLogger(__name__)
+
+# Порог оценки; 0 — искать для всех сообщений, кроме исключений (прежнее поведение)
+SEARCH_GATE_THRESHOLD = float(os.getenv("SEARCH_GATE_THRESHOLD", "0.45"))
+# Доля новых терминов из результатов в ответе, начиная с которой контекст считается использованным
+USAGE_OVERLAP_THRESHOLD = float(os.getenv("SEARCH_GATE_USAGE_OVERLAP", "0.1"))
+
+BASE_SCORE = 0.2
+
+# Вклад намерений в оценку
+INTENT_WEIGHTS: Dict[str, float] = {
+    "explicit_search": 0.5,
+    "recency": 0.35,
+    "topic_crypto": 0.4,
+    "topic_exchange": 0.4,
+    "topic_weather": 0.4,
+    "topic_news": 0.3,
+    "query_price": 0.3,
+    "fact_question": 0.15,
+    "task": -0.25,
+    "create_website": -0.3,
+    "offline_task": -0.3,
+}
+ENTITY_WEIGHT = 0.1
+MAX_ENTITY_BONUS = 0.3
+YEAR_WEIGHT = 0.15
+
+YEAR_RE = re.compile(r"\b(?:19|20)\d{2}\b")
+WORD_RE = re.compile(r"\w+")
+SENTENCE_END_RE = re.compile(r"[.!?]\s*$")
+URL_RE = re.compile(r"https?://([^/\s)]+)")
+# Номера источников: в начале строки в контексте, где угодно в ответе
+SOURCE_NUMBER_RE = re.compile(r"^\[(\d+)\]", re.MULTILINE)
+CITATION_RE = re.compile(r"\[(\d+)\]")
+# Термины для оценки использования: числа и длинные слова
+TERM_RE = re.compile(r"\d[\d.,]*\d|\d|[^\W\d_]{6,}")
+
+
+def count_named_entities(message: str) -> int:
+    """Число слов с заглавной буквы не в начале предложения и аббревиатур"""
+    count = 0
+    sentence_start = True
+    for token in message.split():
+        word = WORD_RE.search(token)
+        if word:
+            text = word.group(0)
+            if text.isupper() and len(text) > 1:
+                count += 1
+            elif text[0].isupper() and not sentence_start:
+                count += 1
+            sentence_start = False
+        if SENTENCE_END_RE.search(token):
+            sentence_start = True
+    return count
+
+
+def extract_terms(text: str) -> Set[str]:
+    """Числа и содержательные слова текста"""
+    return {term.lower() for term in TERM_RE.findall(text)}
+
+
+class SearchDecision:
+    """Решение о веб-поиске для одного сообщения"""
+
+    def __init__(
+        self,
+        message: str,
+        score: float,
+        threshold: float,
+        features: Dict[str, float],
+        excluded: bool = False,
+    ):
+        self.message = message
+        self.score = score
+        self.threshold = threshold
+        self.features = features
+        self.excluded = excluded
+        self.should_search = not excluded and score >= threshold
+        self.search_seconds: Optional[float] = None
+        # Поиск выполнялся, но не дал контекста (все источники с ошибкой)
+        self.search_failed = False
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "score": self.score,
+            "should_search": self.should_search,
+            "excluded": self.excluded,
+            "features": self.features,
+            "search_seconds": self.search_seconds,
+            "search_failed": self.search_failed,
+        }
+
+
+class SearchGate:
+    """Оценка необходимости поиска и статистика полезности найденного"""
+
+    def __init__(self, threshold: float = SEARCH_GATE_THRESHOLD, max_records: int = 200):
+        self.threshold = threshold
+        self._records: Deque[Dict[str, object]] = deque(maxlen=max_records)
+        self.decisions = 0
+        self.excluded = 0
+        self.skipped = 0
+        self.searched = 0
+        self.used = 0
+        self.unused = 0
+        self.empty = 0
+        self.search_seconds_total = 0.0
+        # Корзины score по 0.1: решения, поиски и их полезность
+        self.buckets: Dict[str, Dict[str, int]] = {}
+
+    def evaluate(self, message: str) -> SearchDecision:
+        """Оценить сообщение без учета в статистике"""
+        intents = classify_intents(message)
+        if "no_search" in intents:
+            return SearchDecision(message, 0.0, self.threshold, {}, excluded=True)
+
+        features: Dict[str, float] = {}
+        for intent, weight in INTENT_WEIGHTS.items():
+            if intent in intents:
+                features[intent] = weight
+        entities = count_named_entities(message)
+        if entities:
+            features["entities"] = min(MAX_ENTITY_BONUS, entities * ENTITY_WEIGHT)
+        if YEAR_RE.search(message):
+            features["year"] = YEAR_WEIGHT
+
+        score = round(min(1.0, max(0.0, BASE_SCORE + sum(features.values()))), 3)
+        return SearchDecision(message, score, self.threshold, features)
+
+    def decide(self, message: str) -> SearchDecision:
+        """Оценить, нужен ли веб-поиск для сообщения, и учесть решение"""
+        decision = self.evaluate(message)
+        self.decisions += 1
+        if decision.excluded:
+            self.excluded += 1
+            return decision
+
+        self._bucket(decision.score)["decisions"] += 1
+        if decision.should_search:
+            self.searched += 1
+            self._bucket(decision.score)["searched"] += 1
+        else:
+            self.skipped += 1
+        return decision
+
+    def measure_usage(self, message: str, context: str, answer: str) -> Dict[str, object]:
+        """Оценить, опирается ли ответ на найденный контекст"""
+        cited = any(domain.lower() in answer.lower() for domain in set(URL_RE.findall(context)))
+        if not cited:
+            # Ссылки вида [1] на пронумерованные фрагменты контекста
+            cited = bool(set(CITATION_RE.findall(answer)) & set(SOURCE_NUMBER_RE.findall(context)))
+        # Учитываются только термины, которых не было в самом вопросе
+        novel = extract_terms(context) - extract_terms(message)
+        answer_terms = extract_terms(answer)
+        overlap = len(answer_terms & novel) / len(answer_terms) if answer_terms else 0.0
+        return {
+            "cited": cited,
+            "overlap": round(overlap, 3),
+            "used": cited or overlap >= USAGE_OVERLAP_THRESHOLD,
+        }
+
+    def record_outcome(self, decision: SearchDecision, context: str, answer: str) -> None:
+        """Записать, был ли использован найденный контекст"""
+        if not decision.should_search:
+            return
+        if decision.search_seconds is not None:
+            self.search_seconds_total += decision.search_seconds
+
+        record = decision.as_dict()
+        if not context:
+            self.empty += 1
+            record["used"] = False
+        else:
+            usage = self.measure_usage(decision.message, context, answer)
+            record.update(usage)
+            if usage["used"]:
+                self.used += 1
+                self._bucket(decision.score)["used"] += 1
+            else:
+                self.unused += 1
+                self._bucket(decision.score)["unused"] += 1
+        self._records.append(record)
+        logger.info(f"Веб-поиск: score={decision.score}, использован={record['used']}")
+
+    def get_stats(self) -> Dict[str, object]:
+        """Статистика решений и полезности поиска"""
+        judged = self.used + self.unused
+        return {
+            "threshold": self.threshold,
+            "decisions": self.decisions,
+            "excluded": self.excluded,
+            "skipped": self.skipped,
+            "searched": self.searched,
+            "used": self.used,
+            "unused": self.unused,
+            "empty_results": self.empty,
+            "usage_rate": round(self.used / judged, 3) if judged else None,
+            "avg_search_seconds": (
+                round(self.search_seconds_total / self.searched, 3) if self.searched else None
+            ),
+            "score_buckets": dict(sorted(self.buckets.items())),
+            "recent": list(self._records)[-10:],
+        }
+
+    def _bucket(self, score: float) -> Dict[str, int]:
+        low = min(int(score * 10), 9) / 10
+        key = f"{low:.1f}-{low + 0.1:.1f}"
+        return self.buckets.setdefault(
+            key, {"decisions": 0, "searched": 0, "used": 0, "unused": 0}
+        )
+
+
+# Глобальный экземпляр оценщика поиска
+search_gate = SearchGate()
@@ -0,0 +1,117 @@
+"""
+Объединение одинаковых одновременных запросов (singleflight)
+
+Если несколько обработчиков одновременно запрашивают одно и то же
+(например, популярный запрос «курс доллара»), выполняется только первый
+вызов, остальные ждут его результат. Ключ — уровень поиска (tier) и
+нормализованный запрос. Результат общий для всех ожидающих, поэтому его
+нельзя изменять на месте.
+"""
+
+import asyncio
+import functools
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def normalize_query(query: str) -> str:
+    """Нормализовать запрос для ключа: регистр и пробелы"""
+    return " ".join(query.lower().split())
+
+
+def _normalize_arg(value: Any) -> Hashable:
+    return normalize_query(value) if isinstance(value, str) else value
+
+
+class SingleFlight:
+    """Реестр выполняющихся запросов с общими результатами"""
+
+    def __init__(self):
+        self._inflight: Dict[Tuple[int, Hashable], asyncio.Future] = {}
+        self._waiters: Dict[Tuple[int, Hashable], int] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    async def do(self, tier: str, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """Выполнить func или дождаться уже выполняющегося вызова с тем же ключом"""
+        stats = self._stats.setdefault(tier, {"calls": 0, "executions": 0, "coalesced": 0})
+        stats["calls"] += 1
+
+        # Future привязаны к event loop, поэтому он входит в ключ
+        flight_key = (id(asyncio.get_running_loop()), (tier, key))
+        future = self._inflight.get(flight_key)
+        if future is not None:
+            stats["coalesced"] += 1
+            logger.debug(f"Запрос {tier}:{key} присоединен к выполняющемуся")
+        else:
+            stats["executions"] += 1
+            future = asyncio.ensure_future(func())
+            self._inflight[flight_key] = future
+            future.add_done_callback(functools.partial(self._forget, flight_key))
+
+        # Отмена одного ожидающего не должна отменять запрос для остальных,
+        # но если отменены все, запрос больше никому не нужен
+        self._waiters[flight_key] = self._waiters.get(flight_key, 0) + 1
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if self._waiters[flight_key] == 1 and not future.done():
+                future.cancel()
+            raise
+        finally:
+            self._waiters[flight_key] -= 1
+            if not self._waiters[flight_key]:
+                del self._waiters[flight_key]
+
+    def _forget(self, flight_key: Tuple[int, Hashable], future: asyncio.Future) -> None:
+        self._inflight.pop(flight_key, None)
+        # Ошибку получают ожидающие; если все они отменены, не логируем ее как потерянную
+        if not future.cancelled():
+            future.exception()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Доля объединенных вызовов по уровням поиска"""
+        tiers = {
+            tier: {
+                **stats,
+                "coalescing_ratio": round(stats["coalesced"] / stats["calls"], 3)
+                if stats["calls"]
+                else 0.0,
+            }
+            for tier, stats in self._stats.items()
+        }
+        calls = sum(stats["calls"] for stats in self._stats.values())
+        coalesced = sum(stats["coalesced"] for stats in self._stats.values())
+        return {
+            "in_flight": len(self._inflight),
+            "calls": calls,
+            "coalesced": coalesced,
+            "coalescing_ratio": round(coalesced / calls, 3) if calls else 0.0,
+            "tiers": tiers,
+        }
+
+
+# Глобальный реестр выполняющихся веб-запросов
+web_singleflight = SingleFlight()
+
+
+def coalesce(tier: str, group: SingleFlight = web_singleflight):
+    """Декоратор асинхронного метода: одинаковые одновременные вызовы объединяются
+
+    Ключ строится из экземпляра и аргументов метода, строки нормализуются.
+    """
+
+    def decorator(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            key = (id(self),) + tuple(_normalize_arg(arg) for arg in args) + tuple(
+                sorted((name, _normalize_arg(value)) for name, value in kwargs.items())
+            )
+            return await group.do(tier, key, lambda: func(self, *args, **kwargs))
+
+        return wrapper
+
+    return decorator
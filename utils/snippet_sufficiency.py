@@ -0,0 +1,79 @@
+"""
+Оценка, хватает ли сниппетов выдачи для ответа
+
+Раньше каждый поиск загружал и разбирал полные страницы результатов, даже
+когда сниппеты DuckDuckGo или Bing уже содержали ответ. Теперь поиск
+сначала получает выдачу и оценивает сниппеты:
+- покрытие: доля слов запроса (после стемминга utils.passage_retriever),
+  найденных в лучшем сниппете;
+- подтверждение: вторым источником считается сниппет, покрывающий
+  не меньше SUPPORT_COVERAGE слов запроса;
+- для вопросов, ответом на которые служит число или дата («сколько»,
+  «когда», курсы и цены), в подходящем сниппете должно быть число;
+- вопросы, требующие объяснения («почему», «как работает», «объясни»),
+  сниппетами не закрываются.
+
+Страницы загружаются, только если оценка ниже SNIPPET_SUFFICIENCY_THRESHOLD,
+поэтому простые фактические вопросы обходятся одним запросом к поисковику.
+"""
+
+import os
+import re
+from typing import Sequence
+
+from utils.intent_classifier import classify_intents
+from utils.passage_retriever import tokenize
+
+# Включение режима «сначала сниппеты»
+ADAPTIVE_SEARCH_DEPTH = os.getenv("ADAPTIVE_SEARCH_DEPTH", "true").lower() == "true"
+# Начиная с этой оценки страницы не загружаются
+SNIPPET_SUFFICIENCY_THRESHOLD = float(os.getenv("SNIPPET_SUFFICIENCY_THRESHOLD", "0.75"))
+# Сниппет с таким покрытием слов запроса подтверждает ответ
+SUPPORT_COVERAGE = 0.5
+
+# Вопросы, ответ на которые — число или дата
+NUMERIC_INTENTS = frozenset({"query_price", "query_rates"})
+NUMERIC_QUESTION_RE = re.compile(
+    r"\b(?:сколько|когда|какого числа|в каком году|какой год|how many|how much|how old|when)\b"
+)
+# Вопросы, требующие развернутого ответа
+EXPLANATION_RE = re.compile(r"\b(?:почему|зачем|как сделать|как работает|why|how to|how does)\b")
+NUMBER_RE = re.compile(r"\d")
+
+
+def expects_number(query: str) -> bool:
+    """Ждет ли вопрос числа или даты в ответе"""
+    return bool(
+        classify_intents(query) & NUMERIC_INTENTS or NUMERIC_QUESTION_RE.search(query.lower())
+    )
+
+
+def needs_explanation(query: str) -> bool:
+    """Требует ли вопрос развернутого объяснения"""
+    return bool("offline_task" in classify_intents(query) or EXPLANATION_RE.search(query.lower()))
+
+
+def snippet_sufficiency(query: str, snippets: Sequence[str]) -> float:
+    """Оценка от 0 до 1: насколько сниппеты отвечают на вопрос"""
+    terms = set(tokenize(query))
+    if not terms or not snippets or needs_explanation(query):
+        return 0.0
+
+    numeric = expects_number(query)
+    coverages = []
+    for snippet in snippets:
+        coverage = len(terms & set(tokenize(snippet))) / len(terms)
+        # Для числовых вопросов засчитываются только сниппеты с числами
+        if numeric and not NUMBER_RE.search(snippet):
+            coverage /= 2
+        coverages.append(coverage)
+
+    best = max(coverages)
+    supporting = sum(coverage >= SUPPORT_COVERAGE for coverage in coverages)
+    # Ответ, подтвержденный хотя бы двумя сниппетами, надежнее одиночного
+    return round(best * (1.0 if supporting >= 2 else 0.8), 3)
+
+
+def snippets_suffice(query: str, snippets: Sequence[str]) -> bool:
+    """Хватает ли сниппетов, чтобы не загружать страницы"""
+    return snippet_sufficiency(query, snippets) >= SNIPPET_SUFFICIENCY_THRESHOLD
@@ -0,0 +1,56 @@
+"""
+Подсчет токенов для бюджетов контекста
+
+Используется и сборщиком контекста беседы (utils.context_builder), и
+упаковщиком веб-контекста (utils.context_packer). Модуль не зависит от
+базы данных, поэтому его можно импортировать из кода, которому нужен
+только поиск.
+"""
+
+from collections import OrderedDict
+from typing import Dict
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    # tiktoken не обязателен: без него используется приблизительная оценка
+    _encoding = None
+
+# Служебные токены на каждое сообщение в формате chat completions
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+class TokenCounter:
+    """Подсчет токенов с LRU-кэшем по тексту"""
+
+    def __init__(self, max_entries: int = 10000):
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self._max_entries = max_entries
+
+    def count(self, text: str) -> int:
+        """Количество токенов в тексте"""
+        cached = self._cache.get(text)
+        if cached is not None:
+            self._cache.move_to_end(text)
+            return cached
+
+        if _encoding is not None:
+            tokens = len(_encoding.encode(text))
+        else:
+            # ~3 символа на токен для смеси кириллицы и латиницы
+            tokens = len(text) // 3 + 1
+
+        self._cache[text] = tokens
+        if len(self._cache) > self._max_entries:
+            self._cache.popitem(last=False)
+        return tokens
+
+    def count_message(self, message: Dict[str, str]) -> int:
+        """Количество токенов в сообщении с учетом служебных"""
+        return self.count(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+# Общий счетчик токенов
+token_counter = TokenCounter()
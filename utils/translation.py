@@ -0,0 +1,297 @@
+"""
+Перевод англоязычных ответов веб-поиска на русский язык
+
+Поддерживаются три режима (переменная окружения WEB_ANSWER_MODE):
+- pipeline — англоязычный поток режется на абзацы и блоки кода, абзацы
+  переводятся параллельно по мере готовности и выдаются по порядку;
+- direct — модель сразу пишет ответ на русском, без второго прохода;
+- sequential — прежнее поведение: полный английский ответ, затем перевод.
+
+Для каждого запроса замеряется время этапов, статистика доступна через
+translation_metrics.get_stats().
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from utils.openai_client import generate_response, stream_response
+
+logger = logging.getLogger(__name__)
+
+WEB_ANSWER_MODES = ("pipeline", "direct", "sequential")
+DEFAULT_WEB_ANSWER_MODE = os.getenv("WEB_ANSWER_MODE", "pipeline").lower()
+
+# Минимальный размер фрагмента для перевода: слишком мелкие абзацы
+# объединяются, чтобы не плодить запросы к модели
+MIN_CHUNK_CHARS = int(os.getenv("TRANSLATION_MIN_CHUNK_CHARS", "600"))
+MAX_CONCURRENT_TRANSLATIONS = int(os.getenv("TRANSLATION_MAX_CONCURRENCY", "4"))
+
+TRANSLATION_PROMPT = """
+You are a professional translator specializing in technical, analytical, and intellectual content.
+Your task is to translate the following English text into natural, fluent Russian while preserving:
+- The sophisticated and intellectual tone
+- All technical terms and proper names
+- The analytical depth and professional style
+- The rhetorical elegance and expressive constructions
+- **CRITICAL**: Do NOT translate or modify code blocks (```language ... ```), inline code (`code`), or technical commands. Leave them exactly as they are.
+
+Do not add any introductions, explanations, or modifications. Just provide the Russian translation with code blocks intact.
+
+Text to translate:
+{text}
+"""
+
+DIRECT_RUSSIAN_INSTRUCTION = """
+LANGUAGE: Write the entire answer directly in natural, fluent Russian, keeping the same depth and style.
+Do NOT translate code blocks (```language ... ```), inline code (`code`), or technical commands.
+"""
+
+
+def build_translation_messages(text: str) -> List[Dict[str, str]]:
+    """Сообщения для перевода англоязычного текста на русский"""
+    return [
+        {"role": "system", "content": "You are a professional translator."},
+        {"role": "user", "content": TRANSLATION_PROMPT.format(text=text)},
+    ]
+
+
+class TranslationChunker:
+    """Инкрементальная нарезка потока текста на фрагменты для перевода
+
+    Режет по границам абзацев (пустая строка) и блоков кода (```).
+    Блоки кода отдаются целиком с флагом is_code и не переводятся.
+    """
+
+    def __init__(self, min_chars: int = MIN_CHUNK_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+        self._paragraph: List[str] = []
+        self._pending: List[str] = []
+        self._pending_chars = 0
+        self._code: Optional[List[str]] = None
+
+    def feed(self, text: str) -> List[Tuple[str, bool]]:
+        """Добавить фрагмент потока, вернуть готовые чанки (text, is_code)"""
+        self._buffer += text
+        chunks: List[Tuple[str, bool]] = []
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            self._process_line(line, chunks)
+        return chunks
+
+    def flush(self) -> List[Tuple[str, bool]]:
+        """Завершить поток и вернуть оставшиеся чанки"""
+        chunks: List[Tuple[str, bool]] = []
+        if self._buffer:
+            line, self._buffer = self._buffer, ""
+            self._process_line(line, chunks)
+        if self._code is not None:
+            # Незакрытый блок кода отдаем как есть
+            chunks.append(("\n".join(self._code), True))
+            self._code = None
+        self._close_paragraph()
+        self._emit_prose(chunks)
+        return chunks
+
+    def _process_line(self, line: str, chunks: List[Tuple[str, bool]]) -> None:
+        if line.strip().startswith("```"):
+            if self._code is None:
+                self._close_paragraph()
+                self._emit_prose(chunks)
+                self._code = [line]
+            else:
+                self._code.append(line)
+                chunks.append(("\n".join(self._code), True))
+                self._code = None
+        elif self._code is not None:
+            self._code.append(line)
+        elif not line.strip():
+            self._close_paragraph()
+            if self._pending_chars >= self.min_chars:
+                self._emit_prose(chunks)
+        else:
+            self._paragraph.append(line)
+
+    def _close_paragraph(self) -> None:
+        if self._paragraph:
+            paragraph = "\n".join(self._paragraph)
+            self._pending.append(paragraph)
+            self._pending_chars += len(paragraph)
+            self._paragraph = []
+
+    def _emit_prose(self, chunks: List[Tuple[str, bool]]) -> None:
+        if self._pending:
+            chunks.append(("\n\n".join(self._pending), False))
+            self._pending = []
+            self._pending_chars = 0
+
+
+class StageTimer:
+    """Замер времени этапов одного запроса"""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self._started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def mark(self, stage: str) -> None:
+        """Зафиксировать этап (повторные отметки игнорируются)"""
+        if stage not in self.stages:
+            self.stages[stage] = round(time.perf_counter() - self._started, 3)
+
+    def as_dict(self) -> Dict[str, object]:
+        return {"mode": self.mode, **self.stages}
+
+
+class TranslationMetrics:
+    """Статистика времени этапов по режимам ответа"""
+
+    def __init__(self, max_records: int = 200):
+        self._records: Deque[Dict[str, object]] = deque(maxlen=max_records)
+
+    def record(self, timer: StageTimer) -> None:
+        record = timer.as_dict()
+        self._records.append(record)
+        logger.info(f"Тайминги ответа с веб-поиском: {record}")
+
+    def get_stats(self) -> Dict[str, object]:
+        """Средние значения этапов по каждому режиму"""
+        by_mode: Dict[str, Dict[str, List[float]]] = {}
+        for record in self._records:
+            stages = by_mode.setdefault(record["mode"], {})
+            for stage, value in record.items():
+                if stage != "mode":
+                    stages.setdefault(stage, []).append(value)
+
+        return {
+            "modes": {
+                mode: {
+                    "requests": max((len(v) for v in stages.values()), default=0),
+                    "avg_seconds": {
+                        stage: round(sum(values) / len(values), 3)
+                        for stage, values in stages.items()
+                    },
+                }
+                for mode, stages in by_mode.items()
+            },
+            "recent": list(self._records)[-10:],
+        }
+
+
+async def translate_text(text: str, model: str) -> str:
+    """Перевести фрагмент текста на русский (GenerationError при ошибке)"""
+    return await generate_response(build_translation_messages(text), model, raise_errors=True)
+
+
+async def pipelined_translation(
+    source: AsyncIterator[str],
+    model: str,
+    timer: Optional[StageTimer] = None,
+    max_concurrency: int = MAX_CONCURRENT_TRANSLATIONS,
+    min_chunk_chars: int = MIN_CHUNK_CHARS,
+) -> AsyncIterator[str]:
+    """Переводить поток по абзацам параллельно, выдавая результат по порядку"""
+    chunker = TranslationChunker(min_chunk_chars)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    queue: "asyncio.Queue[Optional[asyncio.Future]]" = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+
+    async def translate(text: str) -> str:
+        async with semaphore:
+            return await translate_text(text, model)
+
+    def schedule(chunks: List[Tuple[str, bool]]) -> None:
+        for text, is_code in chunks:
+            if is_code:
+                future = loop.create_future()
+                future.set_result(text)
+            else:
+                future = asyncio.ensure_future(translate(text))
+            queue.put_nowait(future)
+
+    async def produce() -> None:
+        try:
+            async for delta in source:
+                if timer:
+                    timer.mark("generation_first_token")
+                schedule(chunker.feed(delta))
+            schedule(chunker.flush())
+            if timer:
+                timer.mark("generation_done")
+        finally:
+            queue.put_nowait(None)
+
+    producer = asyncio.create_task(produce())
+    first_chunk = True
+    try:
+        while True:
+            future = await queue.get()
+            if future is None:
+                break
+            text = await future
+            if timer:
+                timer.mark("first_output_chunk")
+            yield text if first_chunk else "\n\n" + text
+            first_chunk = False
+        await producer
+    finally:
+        producer.cancel()
+        while not queue.empty():
+            future = queue.get_nowait()
+            if future is not None:
+                future.cancel()
+
+
+async def stream_web_answer(
+    messages: List[Dict[str, str]], model: str, mode: Optional[str] = None
+) -> AsyncIterator[str]:
+    """Стримить русскоязычный ответ по результатам веб-поиска
+
+    Ошибки генерации и перевода выбрасываются как GenerationError, чтобы
+    текст ошибки не ушел на перевод и не оказался внутри ответа.
+    """
+    mode = (mode or DEFAULT_WEB_ANSWER_MODE).lower()
+    if mode not in WEB_ANSWER_MODES:
+        mode = "pipeline"
+    timer = StageTimer(mode)
+
+    try:
+        if mode == "direct":
+            direct_messages = [
+                {
+                    "role": "system",
+                    "content": messages[0]["content"] + DIRECT_RUSSIAN_INSTRUCTION,
+                }
+            ] + messages[1:]
+            async for delta in stream_response(direct_messages, model, raise_errors=True):
+                timer.mark("generation_first_token")
+                timer.mark("first_output_chunk")
+                yield delta
+            timer.mark("generation_done")
+
+        elif mode == "sequential":
+            english_response = await generate_response(messages, model, raise_errors=True)
+            timer.mark("generation_done")
+            async for delta in stream_response(
+                build_translation_messages(english_response), model, raise_errors=True
+            ):
+                timer.mark("first_output_chunk")
+                yield delta
+
+        else:
+            async for text in pipelined_translation(
+                stream_response(messages, model, raise_errors=True), model, timer
+            ):
+                yield text
+
+        timer.mark("total")
+    finally:
+        translation_metrics.record(timer)
+
+
+# Глобальная статистика режимов перевода
+translation_metrics = TranslationMetrics()
@@ -2,17 +2,22 @@
 Универсальный парсер веб-страниц для извлечения структурированной информации
 """
 
-import requests
 from bs4 import BeautifulSoup
 import json
 import re
 from typing import Dict, List, Optional, Any, Union
 from datetime import datetime
-import time
 import logging
 from urllib.parse import urljoin, urlparse
 import html2text
 
+from utils.content_extractor import extract_main_text, make_soup
+from utils.cpu_pool import cpu_pool
+from utils.http_transport import (MAX_PAGE_BYTES, conditional_headers,
+                                  http_transport, response_validators)
+from utils.memory_cache import page_cache
+from utils.polite_fetch import polite_fetch_all
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -21,17 +26,10 @@ class UniversalWebParser:
     """Универсальный парсер веб-страниц"""
     
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'ru-RU,ru;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1'
-        })
-        self.cache = {}
-        self.cache_duration = 300  # 5 минут кэширования
+        # Общий пул соединений, прокси и заголовки из utils.http_transport
+        self.session = http_transport.session()
+        # Общий ограниченный кэш HTML страниц (LRU с TTL, по умолчанию 5 минут)
+        self.cache = page_cache
         
         # Инициализация html2text для конвертации в markdown
         self.h2t = html2text.HTML2Text()
@@ -43,20 +41,24 @@ class UniversalWebParser:
         """Получить содержимое страницы"""
         try:
             # Проверяем кэш
-            if url in self.cache:
-                cached_data, timestamp = self.cache[url]
-                if time.time() - timestamp < self.cache_duration:
-                    return cached_data
+            cached = self.cache.lookup(url)
+            if cached is not None and cached.fresh:
+                return cached.value
             
-            response = self.session.get(url, timeout=15)
+            # Устаревшую запись перепроверяем условным запросом
+            response = self.session.get(
+                url,
+                headers=conditional_headers(cached and cached.validators),
+                timeout=15,
+                max_bytes=MAX_PAGE_BYTES,
+            )
+            if cached is not None and response.status_code == 304:
+                self.cache.refresh(url, validators=response_validators(response))
+                return cached.value
             response.raise_for_status()
             
-            # Определяем кодировку
-            if response.encoding == 'ISO-8859-1':
-                response.encoding = response.apparent_encoding
-            
             # Кэшируем результат
-            self.cache[url] = (response.text, time.time())
+            self.cache.set(url, response.text, validators=response_validators(response))
             
             return response.text
         except Exception as e:
@@ -70,33 +72,36 @@ class UniversalWebParser:
             if not html_content:
                 return {"error": "Не удалось получить содержимое страницы"}
             
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Извлекаем основную информацию
-            result = {
-                "url": url,
-                "timestamp": datetime.now().isoformat(),
-                "title": self._extract_title(soup),
-                "description": self._extract_description(soup),
-                "keywords": self._extract_keywords(soup),
-                "headings": self._extract_headings(soup),
-                "paragraphs": self._extract_paragraphs(soup),
-                "links": self._extract_links(soup, url),
-                "images": self._extract_images(soup, url),
-                "tables": self._extract_tables(soup),
-                "lists": self._extract_lists(soup),
-                "metadata": self._extract_metadata(soup),
-                "structured_data": self._extract_structured_data(soup),
-                "text_content": self._extract_text_content(soup),
-                "markdown_content": self._convert_to_markdown(soup)
-            }
-            
-            return result
+            # Большие страницы разбираются в пуле процессов
+            return cpu_pool.run(parse_html_content, html_content, url, size=len(html_content))
             
         except Exception as e:
             logger.error(f"Ошибка при парсинге страницы {url}: {e}")
             return {"error": str(e)}
     
+    def parse_html(self, html_content: str, url: str) -> Dict[str, Any]:
+        """Извлечь структурированную информацию из HTML страницы"""
+        soup = make_soup(html_content)
+        
+        # Извлекаем основную информацию
+        return {
+            "url": url,
+            "timestamp": datetime.now().isoformat(),
+            "title": self._extract_title(soup),
+            "description": self._extract_description(soup),
+            "keywords": self._extract_keywords(soup),
+            "headings": self._extract_headings(soup),
+            "paragraphs": self._extract_paragraphs(soup),
+            "links": self._extract_links(soup, url),
+            "images": self._extract_images(soup, url),
+            "tables": self._extract_tables(soup),
+            "lists": self._extract_lists(soup),
+            "metadata": self._extract_metadata(soup),
+            "structured_data": self._extract_structured_data(soup),
+            "text_content": self._extract_text_content(html_content),
+            "markdown_content": self._convert_to_markdown(soup)
+        }
+    
     def _extract_title(self, soup: BeautifulSoup) -> str:
         """Извлечь заголовок страницы"""
         title_tag = soup.find('title')
@@ -305,25 +310,16 @@ class UniversalWebParser:
         
         return structured_data
     
-    def _extract_text_content(self, soup: BeautifulSoup) -> str:
-        """Извлечь весь текстовый контент"""
-        # Удаляем скрипты и стили
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # Получаем текст
-        text = soup.get_text()
-        
-        # Очищаем текст
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = ' '.join(chunk for chunk in chunks if chunk)
-        
-        return text
+    def _extract_text_content(self, html_content: str) -> str:
+        """Извлечь основной текст страницы без служебных блоков"""
+        return extract_main_text(html_content, separator=' ')
     
     def _convert_to_markdown(self, soup: BeautifulSoup) -> str:
         """Конвертировать HTML в Markdown"""
         try:
+            # Удаляем скрипты и стили
+            for script in soup(["script", "style"]):
+                script.decompose()
             return self.h2t.handle(str(soup))
         except Exception as e:
             logger.error(f"Ошибка при конвертации в markdown: {e}")
@@ -339,35 +335,16 @@ class UniversalWebParser:
             if not html_content:
                 return {"error": "Не удалось получить результаты поиска"}
             
-            soup = BeautifulSoup(html_content, 'html.parser')
-            results = []
-            
-            # Парсим результаты поиска
-            search_results = soup.find_all('div', class_='result', limit=num_results)
-            
-            for result in search_results:
-                try:
-                    title_elem = result.find('a', class_='result__a')
-                    snippet_elem = result.find('a', class_='result__snippet')
-                    
-                    if title_elem:
-                        title = title_elem.get_text().strip()
-                        url = title_elem.get('href', '')
-                        snippet = snippet_elem.get_text().strip() if snippet_elem else ""
-                        
-                        # Парсим найденную страницу
-                        parsed_page = self.parse_page(url) if url else {}
-                        
-                        results.append({
-                            "title": title,
-                            "url": url,
-                            "snippet": snippet,
-                            "parsed_content": parsed_page
-                        })
-                        
-                except Exception as e:
-                    logger.error(f"Ошибка при парсинге результата поиска: {e}")
-                    continue
+            hits = self.parse_search_results_html(html_content, num_results)
+            # Параллельно парсим найденные страницы
+            pages = [{} for _ in hits]
+            urls = [hit["url"] for hit in hits if hit["url"]]
+            positions = [index for index, hit in enumerate(hits) if hit["url"]]
+            for index, _, parsed_page in polite_fetch_all(urls, self.parse_page):
+                pages[positions[index]] = parsed_page or {
+                    "error": "Не удалось получить содержимое страницы"
+                }
+            results = [{**hit, "parsed_content": page} for hit, page in zip(hits, pages)]
             
             return {
                 "timestamp": datetime.now().isoformat(),
@@ -379,6 +356,32 @@ class UniversalWebParser:
             logger.error(f"Ошибка при поиске и парсинге: {e}")
             return {"error": str(e)}
     
+    def parse_search_results_html(self, html_content: str, num_results: int = 5) -> List[Dict[str, str]]:
+        """Разбор HTML выдачи DuckDuckGo: заголовок, ссылка и сниппет"""
+        soup = make_soup(html_content)
+        hits = []
+        
+        # Парсим результаты поиска
+        search_results = soup.find_all('div', class_='result', limit=num_results)
+        
+        for result in search_results:
+            try:
+                title_elem = result.find('a', class_='result__a')
+                snippet_elem = result.find('a', class_='result__snippet')
+                
+                if title_elem:
+                    hits.append({
+                        "title": title_elem.get_text().strip(),
+                        "url": title_elem.get('href', ''),
+                        "snippet": snippet_elem.get_text().strip() if snippet_elem else ""
+                    })
+                    
+            except Exception as e:
+                logger.error(f"Ошибка при парсинге результата поиска: {e}")
+                continue
+        
+        return hits
+    
     def extract_specific_info(self, url: str, selectors: Dict[str, str]) -> Dict[str, Any]:
         """Извлечь специфическую информацию по CSS селекторам"""
         try:
@@ -386,7 +389,7 @@ class UniversalWebParser:
             if not html_content:
                 return {"error": "Не удалось получить содержимое страницы"}
             
-            soup = BeautifulSoup(html_content, 'html.parser')
+            soup = make_soup(html_content)
             result = {}
             
             for key, selector in selectors.items():
@@ -408,6 +411,10 @@ class UniversalWebParser:
 # Глобальный экземпляр парсера
 universal_parser = UniversalWebParser()
 
+def parse_html_content(html_content: str, url: str) -> Dict[str, Any]:
+    """Разбор HTML глобальным парсером (задача для пула процессов)"""
+    return universal_parser.parse_html(html_content, url)
+
 def parse_web_page(url: str) -> Dict[str, Any]:
     """Парсинг веб-страницы"""
     return universal_parser.parse_page(url)
@@ -0,0 +1,266 @@
+"""
+Учет состояния поисковиков и хостов: автоматические выключатели и
+негативный кэш
+
+Когда DuckDuckGo начинает отдавать капчу или Bing перестает отвечать,
+каждый запрос заново ждал полный таймаут (10–15 с) и только потом
+переходил к следующему источнику. Здесь:
+- для каждого поисковика и хоста хранятся последние HEALTH_WINDOW исходов
+  запросов с задержками (доля ошибок и задержки в скользящем окне);
+- выключатель размыкается, когда в окне не меньше HEALTH_MIN_SAMPLES
+  исходов и доля ошибок достигает HEALTH_ERROR_RATE; пока он разомкнут,
+  источник пропускается без запроса;
+- через CIRCUIT_COOLDOWN_SECONDS пропускается один пробный запрос: успех
+  замыкает выключатель, ошибка размыкает его снова;
+- URL, загрузка которых окончательно не удалась (ответ 4xx, кроме 408 и
+  429, или неподходящий тип содержимого), на NEGATIVE_CACHE_SECONDS
+  попадают в негативный кэш, и повторная загрузка сразу завершается
+  ошибкой UpstreamUnavailable. Таймауты, 429 и 5xx временные: они
+  учитываются только выключателем хоста, иначе один сбой API курсов
+  (COINGECKO_URL, CBR_URL) ломал бы несколько фоновых обновлений подряд.
+
+Выключатели хостов и негативный кэш встроены в HTTP-транспорт
+(utils.http_transport), выключатели поисковиков — в WebSearchEngine,
+AdvancedWebSearch и асинхронный поиск.
+"""
+
+import os
+import statistics
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, NamedTuple, Optional
+
+HEALTH_WINDOW = int(os.getenv("HEALTH_WINDOW", "20"))
+HEALTH_MIN_SAMPLES = int(os.getenv("HEALTH_MIN_SAMPLES", "4"))
+HEALTH_ERROR_RATE = float(os.getenv("HEALTH_ERROR_RATE", "0.5"))
+CIRCUIT_COOLDOWN_SECONDS = float(os.getenv("CIRCUIT_COOLDOWN_SECONDS", "60"))
+NEGATIVE_CACHE_SECONDS = float(os.getenv("NEGATIVE_CACHE_SECONDS", "120"))
+NEGATIVE_CACHE_MAX_URLS = int(os.getenv("NEGATIVE_CACHE_MAX_URLS", "2048"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class UpstreamUnavailable(Exception):
+    """Источник пропущен: выключатель разомкнут или URL недавно не загрузился"""
+
+
+class EmptySearchResults(Exception):
+    """Поисковик ответил без результатов (капча или блокировка)"""
+
+
+class _Outcome(NamedTuple):
+    ok: bool
+    latency: float
+
+
+class CircuitBreaker:
+    """Скользящее окно исходов и состояние выключателя одного источника"""
+
+    def __init__(self):
+        self.outcomes: Deque[_Outcome] = deque(maxlen=HEALTH_WINDOW)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.requests = 0
+        self.failures = 0
+        self.skipped = 0
+        self.trips = 0
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return sum(not outcome.ok for outcome in self.outcomes) / len(self.outcomes)
+
+
+class UpstreamHealth:
+    """Выключатели для набора источников (поисковиков или хостов)"""
+
+    def __init__(
+        self,
+        min_samples: int = HEALTH_MIN_SAMPLES,
+        error_rate: float = HEALTH_ERROR_RATE,
+        cooldown: float = CIRCUIT_COOLDOWN_SECONDS,
+    ):
+        self.min_samples = min_samples
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def _breaker(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = self._breakers[name] = CircuitBreaker()
+        return breaker
+
+    def allow(self, name: str) -> bool:
+        """Можно ли обращаться к источнику; после паузы пропускает один пробный запрос"""
+        with self._lock:
+            breaker = self._breaker(name)
+            if breaker.state == CLOSED:
+                return True
+            if (
+                breaker.state == OPEN
+                and time.monotonic() - breaker.opened_at >= self.cooldown
+                and not breaker.probing
+            ):
+                breaker.state = HALF_OPEN
+                breaker.probing = True
+                return True
+            breaker.skipped += 1
+            return False
+
+    def record(self, name: str, ok: bool, latency: float) -> None:
+        """Учесть исход запроса к источнику"""
+        with self._lock:
+            breaker = self._breaker(name)
+            breaker.requests += 1
+            breaker.failures += int(not ok)
+            breaker.outcomes.append(_Outcome(ok, latency))
+            if breaker.state == HALF_OPEN:
+                breaker.probing = False
+                if ok:
+                    # Источник ожил — старые ошибки больше не учитываются
+                    breaker.state = CLOSED
+                    breaker.outcomes.clear()
+                else:
+                    self._trip(breaker)
+            elif (
+                breaker.state == CLOSED
+                and len(breaker.outcomes) >= self.min_samples
+                and breaker.error_rate() >= self.error_rate
+            ):
+                self._trip(breaker)
+
+    def cancel(self, name: str) -> None:
+        """Запрос отменен без исхода: пробный запрос можно повторить"""
+        with self._lock:
+            breaker = self._breaker(name)
+            if breaker.state == HALF_OPEN:
+                breaker.state = OPEN
+                breaker.probing = False
+
+    def _trip(self, breaker: CircuitBreaker) -> None:
+        breaker.state = OPEN
+        breaker.opened_at = time.monotonic()
+        breaker.trips += 1
+
+    @contextmanager
+    def guard(self, name: str) -> Iterator[None]:
+        """Запрос к источнику: UpstreamUnavailable без запроса, если выключатель разомкнут
+
+        Исключение внутри блока считается ошибкой источника.
+        """
+        if not self.allow(name):
+            raise UpstreamUnavailable(f"{name}: выключатель разомкнут")
+        started = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self.record(name, False, time.monotonic() - started)
+            raise
+        except BaseException:
+            self.cancel(name)
+            raise
+        self.record(name, True, time.monotonic() - started)
+
+    def state(self, name: str) -> str:
+        """Состояние выключателя источника"""
+        with self._lock:
+            breaker = self._breakers.get(name)
+            return breaker.state if breaker else CLOSED
+
+    def reset(self) -> None:
+        """Забыть историю всех источников"""
+        with self._lock:
+            self._breakers.clear()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Состояние, доля ошибок и задержки по источникам"""
+        now = time.monotonic()
+        with self._lock:
+            result = {}
+            for name, breaker in self._breakers.items():
+                latencies = [outcome.latency for outcome in breaker.outcomes]
+                result[name] = {
+                    "state": breaker.state,
+                    "error_rate": round(breaker.error_rate(), 3),
+                    "median_latency_seconds": round(statistics.median(latencies), 3) if latencies else None,
+                    "max_latency_seconds": round(max(latencies), 3) if latencies else None,
+                    "requests": breaker.requests,
+                    "failures": breaker.failures,
+                    "skipped": breaker.skipped,
+                    "trips": breaker.trips,
+                    "retry_in_seconds": (
+                        round(max(0.0, self.cooldown - (now - breaker.opened_at)), 1)
+                        if breaker.state == OPEN else None
+                    ),
+                }
+            return result
+
+
+class NegativeCache:
+    """Недавно не загрузившиеся URL с коротким сроком жизни"""
+
+    def __init__(self, ttl: float = NEGATIVE_CACHE_SECONDS, max_urls: int = NEGATIVE_CACHE_MAX_URLS):
+        self.ttl = ttl
+        self.max_urls = max_urls
+        self._lock = threading.Lock()
+        self._failed: "OrderedDict[str, float]" = OrderedDict()
+        self.hits = 0
+
+    def add(self, url: str) -> None:
+        """Запомнить неудачную загрузку URL"""
+        with self._lock:
+            self._failed.pop(url, None)
+            self._failed[url] = time.monotonic() + self.ttl
+            while len(self._failed) > self.max_urls:
+                self._failed.popitem(last=False)
+
+    def discard(self, url: str) -> None:
+        """Забыть URL после успешной загрузки"""
+        with self._lock:
+            self._failed.pop(url, None)
+
+    def check(self, url: str) -> None:
+        """UpstreamUnavailable, если URL недавно не загрузился"""
+        with self._lock:
+            expires = self._failed.get(url)
+            if expires is None:
+                return
+            if expires <= time.monotonic():
+                del self._failed[url]
+                return
+            self.hits += 1
+        raise UpstreamUnavailable(f"{url}: недавняя ошибка загрузки")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._failed.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "urls": sum(expires > now for expires in self._failed.values()),
+                "hits": self.hits,
+                "ttl_seconds": self.ttl,
+            }
+
+
+def is_upstream_failure(status_code: Optional[int]) -> bool:
+    """Ответ, говорящий о проблеме на стороне источника (перегрузка, сбой, блокировка)"""
+    return status_code is not None and (status_code >= 500 or status_code in (403, 429))
+
+
+def is_definitive_failure(status_code: Optional[int]) -> bool:
+    """Ответ, который не изменится при повторе вскоре (страницы нет или доступ закрыт)"""
+    return status_code is not None and 400 <= status_code < 500 and status_code not in (408, 429)
+
+
+# Выключатели поисковиков (DuckDuckGo, Bing, Google)
+engine_health = UpstreamHealth()
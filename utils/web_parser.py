@@ -2,47 +2,68 @@
 Универсальный веб-парсер для получения актуальной информации из интернета
 """
 
-import requests
 from bs4 import BeautifulSoup
 import json
 import re
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
-import time
 import logging
 
 from utils.universal_parser import parse_web_page, search_and_parse_web, extract_info_by_selectors
-from utils.advanced_web_search import get_advanced_web_search, format_advanced_search_results
+from utils.advanced_web_search import advanced_search, get_advanced_web_search, format_advanced_search_results
+from utils.content_extractor import make_soup
+from utils.http_transport import (MAX_PAGE_BYTES, conditional_headers,
+                                  http_transport, response_validators)
+from utils.memory_cache import page_cache
+from utils.intent_classifier import classify_intents
+from utils.live_data import live_data
+from utils.news_index import (NEWS_FEEDS, NEWS_PAGE_HEADLINES, ingest_news,
+                              news_index, news_result, parse_feed,
+                              parse_headlines_html)
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+COINGECKO_URL = "https://api.coingecko.com/api/v3/simple/price?ids=bitcoin,ethereum,binancecoin,cardano,solana&vs_currencies=usd,rub&include_24hr_change=true"
+CBR_URL = "https://www.cbr-xml-daily.ru/daily_json.js"
+
+# Главные страницы новостных сайтов (ленты — в utils.news_index)
+NEWS_SOURCES = [source.page_url for source in NEWS_FEEDS]
+
+SPECIALIZED_KEYS = ["crypto_prices", "exchange_rates", "news", "weather"]
+
 class WebParser:
     """Универсальный веб-парсер"""
     
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
-        self.cache = {}
-        self.cache_duration = 300  # 5 минут кэширования
+        # Общий пул соединений, прокси и заголовки из utils.http_transport
+        self.session = http_transport.session()
+        # Общий ограниченный кэш HTML страниц (LRU с TTL, по умолчанию 5 минут)
+        self.cache = page_cache
         
     def get_page_content(self, url: str) -> Optional[str]:
         """Получить содержимое страницы"""
         try:
             # Проверяем кэш
-            if url in self.cache:
-                cached_data, timestamp = self.cache[url]
-                if time.time() - timestamp < self.cache_duration:
-                    return cached_data
+            cached = self.cache.lookup(url)
+            if cached is not None and cached.fresh:
+                return cached.value
             
-            response = self.session.get(url, timeout=10)
+            # Устаревшую запись перепроверяем условным запросом
+            response = self.session.get(
+                url,
+                headers=conditional_headers(cached and cached.validators),
+                timeout=10,
+                max_bytes=MAX_PAGE_BYTES,
+            )
+            if cached is not None and response.status_code == 304:
+                self.cache.refresh(url, validators=response_validators(response))
+                return cached.value
             response.raise_for_status()
             
             # Кэшируем результат
-            self.cache[url] = (response.text, time.time())
+            self.cache.set(url, response.text, validators=response_validators(response))
             
             return response.text
         except Exception as e:
@@ -51,123 +72,134 @@ class WebParser:
     
     def parse_html(self, html: str) -> BeautifulSoup:
         """Парсинг HTML"""
-        return BeautifulSoup(html, 'html.parser')
+        return make_soup(html)
     
     def get_crypto_prices(self) -> Dict[str, Any]:
         """Получить курсы криптовалют"""
+        # Значение, которое фоновый планировщик держит в памяти
+        cached = live_data.snapshot("crypto")
+        if cached is not None:
+            return cached
+
         try:
             # Используем CoinGecko API для получения актуальных курсов
-            url = "https://api.coingecko.com/api/v3/simple/price?ids=bitcoin,ethereum,binancecoin,cardano,solana&vs_currencies=usd,rub&include_24hr_change=true"
+            url = COINGECKO_URL
             
             response = self.session.get(url, timeout=10)
             response.raise_for_status()
-            data = response.json()
-            
-            result = {
-                "timestamp": datetime.now().isoformat(),
-                "crypto_prices": {}
-            }
-            
-            crypto_names = {
-                "bitcoin": "Bitcoin (BTC)",
-                "ethereum": "Ethereum (ETH)", 
-                "binancecoin": "Binance Coin (BNB)",
-                "cardano": "Cardano (ADA)",
-                "solana": "Solana (SOL)"
-            }
-            
-            for crypto_id, name in crypto_names.items():
-                if crypto_id in data:
-                    crypto_data = data[crypto_id]
-                    result["crypto_prices"][name] = {
-                        "usd": crypto_data.get("usd", 0),
-                        "rub": crypto_data.get("rub", 0),
-                        "change_24h": crypto_data.get("usd_24h_change", 0)
-                    }
             
+            result = self.parse_crypto_prices(response.json())
+            live_data.store("crypto", result)
             return result
             
         except Exception as e:
             logger.error(f"Ошибка при получении курсов криптовалют: {e}")
             return {"error": str(e)}
     
+    def parse_crypto_prices(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Разбор ответа CoinGecko"""
+        result = {
+            "timestamp": datetime.now().isoformat(),
+            "crypto_prices": {}
+        }
+        
+        crypto_names = {
+            "bitcoin": "Bitcoin (BTC)",
+            "ethereum": "Ethereum (ETH)", 
+            "binancecoin": "Binance Coin (BNB)",
+            "cardano": "Cardano (ADA)",
+            "solana": "Solana (SOL)"
+        }
+        
+        for crypto_id, name in crypto_names.items():
+            if crypto_id in data:
+                crypto_data = data[crypto_id]
+                result["crypto_prices"][name] = {
+                    "usd": crypto_data.get("usd", 0),
+                    "rub": crypto_data.get("rub", 0),
+                    "change_24h": crypto_data.get("usd_24h_change", 0)
+                }
+        
+        return result
+    
     def get_exchange_rates(self) -> Dict[str, Any]:
         """Получить курсы валют"""
+        cached = live_data.snapshot("exchange")
+        if cached is not None:
+            return cached
+
         try:
             # Используем API Центробанка России
-            url = "https://www.cbr-xml-daily.ru/daily_json.js"
+            url = CBR_URL
             
             response = self.session.get(url, timeout=10)
             response.raise_for_status()
-            data = response.json()
-            
-            result = {
-                "timestamp": datetime.now().isoformat(),
-                "exchange_rates": {}
-            }
-            
-            # Основные валюты
-            currencies = ["USD", "EUR", "GBP", "CNY", "JPY"]
-            
-            for currency in currencies:
-                if currency in data["Valute"]:
-                    valute = data["Valute"][currency]
-                    result["exchange_rates"][currency] = {
-                        "name": valute["Name"],
-                        "value": valute["Value"],
-                        "previous": valute["Previous"],
-                        "change": round(valute["Value"] - valute["Previous"], 4)
-                    }
             
+            result = self.parse_exchange_rates(response.json())
+            live_data.store("exchange", result)
             return result
             
         except Exception as e:
             logger.error(f"Ошибка при получении курсов валют: {e}")
             return {"error": str(e)}
     
+    def parse_exchange_rates(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Разбор ответа ЦБ РФ"""
+        result = {
+            "timestamp": datetime.now().isoformat(),
+            "exchange_rates": {}
+        }
+        
+        # Основные валюты
+        currencies = ["USD", "EUR", "GBP", "CNY", "JPY"]
+        
+        for currency in currencies:
+            if currency in data["Valute"]:
+                valute = data["Valute"][currency]
+                result["exchange_rates"][currency] = {
+                    "name": valute["Name"],
+                    "value": valute["Value"],
+                    "previous": valute["Previous"],
+                    "change": round(valute["Value"] - valute["Previous"], 4)
+                }
+        
+        return result
+    
     def get_news(self, query: str = "", limit: int = 5) -> Dict[str, Any]:
-        """Получить новости"""
+        """Получить новости по теме вопроса из индекса новостей"""
         try:
-            # Используем NewsAPI (требует API ключ) или парсим новостные сайты
-            news_sources = [
-                "https://ria.ru",
-                "https://tass.ru", 
-                "https://lenta.ru"
-            ]
-            
-            result = {
-                "timestamp": datetime.now().isoformat(),
-                "news": []
-            }
-            
-            for source in news_sources[:1]:  # Ограничиваем одним источником для демо
-                try:
-                    html = self.get_page_content(source)
-                    if html:
-                        soup = self.parse_html(html)
-                        
-                        # Ищем заголовки новостей (упрощенный парсинг)
-                        headlines = soup.find_all(['h1', 'h2', 'h3'], limit=limit)
-                        
-                        for headline in headlines:
-                            text = headline.get_text().strip()
-                            if text and len(text) > 10:
-                                result["news"].append({
-                                    "title": text,
-                                    "source": source,
-                                    "url": headline.find('a')['href'] if headline.find('a') else None
-                                })
-                                
-                except Exception as e:
-                    logger.error(f"Ошибка при парсинге новостей с {source}: {e}")
-                    continue
-            
-            return result
+            # Индекс обновляется в фоне; без планировщика загружаем ленты сами
+            if live_data.snapshot("news") is None:
+                live_data.store("news", self.fetch_news())
+            return news_result(news_index, query, limit)
             
         except Exception as e:
             logger.error(f"Ошибка при получении новостей: {e}")
             return {"error": str(e)}
     
+    def fetch_news(self) -> Dict[str, Any]:
+        """Загрузить ленты новостей (или главные страницы) в индекс"""
+        batches = []
+        for source in NEWS_FEEDS:
+            news = []
+            try:
+                if source.feed_url:
+                    xml = self.get_page_content(source.feed_url)
+                    if xml:
+                        news = parse_feed(xml, source.page_url)
+                if not news:
+                    html = self.get_page_content(source.page_url)
+                    if html:
+                        news = self.parse_news_html(html, source.page_url, NEWS_PAGE_HEADLINES)
+            except Exception as e:
+                logger.error(f"Ошибка при парсинге новостей с {source.page_url}: {e}")
+            batches.append(news)
+        return ingest_news(news_index, NEWS_FEEDS, batches)
+    
+    def parse_news_html(self, html: str, source: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Извлечь заголовки новостей из HTML главной страницы"""
+        return parse_headlines_html(html, source, limit)
+    
     def get_weather(self, city: str = "Moscow") -> Dict[str, Any]:
         """Получить погоду"""
         try:
@@ -199,55 +231,69 @@ class WebParser:
             if not html:
                 return {"error": "Не удалось получить результаты поиска"}
             
-            soup = self.parse_html(html)
-            results = []
-            
-            # Парсим результаты поиска
-            search_results = soup.find_all('div', class_='result', limit=limit)
-            
-            for result in search_results:
-                try:
-                    title_elem = result.find('a', class_='result__a')
-                    snippet_elem = result.find('a', class_='result__snippet')
-                    
-                    if title_elem:
-                        title = title_elem.get_text().strip()
-                        url = title_elem.get('href', '')
-                        snippet = snippet_elem.get_text().strip() if snippet_elem else ""
-                        
-                        results.append({
-                            "title": title,
-                            "url": url,
-                            "snippet": snippet
-                        })
-                        
-                except Exception as e:
-                    logger.error(f"Ошибка при парсинге результата поиска: {e}")
-                    continue
-            
             return {
                 "timestamp": datetime.now().isoformat(),
                 "query": query,
-                "results": results
+                "results": self.parse_search_html(html, limit)
             }
             
         except Exception as e:
             logger.error(f"Ошибка при поиске в интернете: {e}")
             return {"error": str(e)}
     
+    def parse_search_html(self, html: str, limit: int = 5) -> List[Dict[str, str]]:
+        """Разбор HTML выдачи DuckDuckGo"""
+        soup = self.parse_html(html)
+        results = []
+        
+        # Парсим результаты поиска
+        search_results = soup.find_all('div', class_='result', limit=limit)
+        
+        for result in search_results:
+            try:
+                title_elem = result.find('a', class_='result__a')
+                snippet_elem = result.find('a', class_='result__snippet')
+                
+                if title_elem:
+                    title = title_elem.get_text().strip()
+                    url = title_elem.get('href', '')
+                    snippet = snippet_elem.get_text().strip() if snippet_elem else ""
+                    
+                    results.append({
+                        "title": title,
+                        "url": url,
+                        "snippet": snippet
+                    })
+                    
+            except Exception as e:
+                logger.error(f"Ошибка при парсинге результата поиска: {e}")
+                continue
+        
+        return results
+    
+    def classify_topic(self, topic: str) -> str:
+        """Определить тип запроса: crypto, exchange, news, weather или search"""
+        intents = classify_intents(topic)
+
+        # Порядок проверки тем сохраняет прежний приоритет
+        for topic_type in ("crypto", "exchange", "news", "weather"):
+            if f"topic_{topic_type}" in intents:
+                return topic_type
+        return "search"
+    
     def parse_general_info(self, topic: str) -> Dict[str, Any]:
         """Универсальный парсинг информации по теме"""
         try:
             # Определяем тип запроса и выбираем соответствующий метод
-            topic_lower = topic.lower()
+            topic_type = self.classify_topic(topic)
             
-            if any(word in topic_lower for word in ['биткоин', 'bitcoin', 'btc', 'криптовалют', 'крипто', 'ethereum', 'eth', 'solana', 'sol', 'cardano', 'ada', 'binance', 'bnb']):
+            if topic_type == "crypto":
                 return self.get_crypto_prices()
-            elif any(word in topic_lower for word in ['курс', 'валют', 'доллар', 'евро', 'рубль']):
+            elif topic_type == "exchange":
                 return self.get_exchange_rates()
-            elif any(word in topic_lower for word in ['новости', 'новость', 'news']):
+            elif topic_type == "news":
                 return self.get_news(topic)
-            elif any(word in topic_lower for word in ['погода', 'weather']):
+            elif topic_type == "weather":
                 return self.get_weather()
             else:
                 # Для общих запросов используем поиск
@@ -279,14 +325,28 @@ def extract_custom_info(url: str, selectors: Dict[str, str]) -> Dict[str, Any]:
 def get_comprehensive_web_info(topic: str) -> Dict[str, Any]:
     """Получить комплексную информацию из интернета с продвинутым поиском"""
     try:
+        # Общие вопросы сначала ищем среди уже загруженных страниц
+        if web_parser.classify_topic(topic) == "search":
+            local_result = advanced_search.search_local(topic)
+            if local_result:
+                return {
+                    "timestamp": datetime.now().isoformat(),
+                    "search_type": "advanced_search",
+                    "source": "local_index",
+                    "query": topic,
+                    "results": local_result["results"],
+                    "total_results": local_result["total_results"],
+                    "cache_hits": local_result["cache_hits"]
+                }
+        
         # Сначала пробуем специализированные методы
         specialized_result = web_parser.parse_general_info(topic)
         
         # Если получили специализированные данные, возвращаем их
-        if "error" not in specialized_result and any(key in specialized_result for key in ["crypto_prices", "exchange_rates", "news", "weather"]):
+        if "error" not in specialized_result and any(key in specialized_result for key in SPECIALIZED_KEYS):
             return specialized_result
         
-        # Иначе используем продвинутый поиск с TF-IDF ранжированием
+        # Иначе используем продвинутый поиск с BM25-поиском фрагментов
         logger.info(f"Используем продвинутый поиск для: {topic}")
         advanced_search_result = get_advanced_web_search(topic, max_results=5)
         
@@ -294,6 +354,7 @@ def get_comprehensive_web_info(topic: str) -> Dict[str, Any]:
             return {
                 "timestamp": datetime.now().isoformat(),
                 "search_type": "advanced_search",
+                "source": advanced_search_result.get("source", "web"),
                 "query": topic,
                 "results": advanced_search_result["results"],
                 "total_results": advanced_search_result["total_results"],
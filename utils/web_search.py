@@ -1,47 +1,41 @@
-import os
 import re
 import time
 from typing import Dict, List, Optional
 
-import requests
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 
+from utils.content_extractor import extract_main_text, make_soup
+from utils.cpu_pool import cpu_pool
+from utils.http_transport import (EARLY_STOP_TEXT_FACTOR, MAX_PAGE_BYTES,
+                                  TextBudget, http_transport)
+from utils.near_duplicates import drop_near_duplicates
+from utils.polite_fetch import polite_fetch_all
+from utils.snippet_sufficiency import ADAPTIVE_SEARCH_DEPTH, snippets_suffice
+from utils.upstream_health import engine_health
+
 load_dotenv()
 
 
+def extract_page_text(html: str, max_length: int = 2000) -> str:
+    """Основной текст страницы одной строкой, не длиннее max_length"""
+    # Основной текст без меню, рекламы и скриптов
+    text = extract_main_text(html, separator=" ")
+
+    # Ограничиваем длину
+    if len(text) > max_length:
+        text = text[:max_length] + "..."
+
+    return text
+
+
 class WebSearchEngine:
     """Веб-поисковик для получения актуальной информации из интернета"""
 
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update(
-            {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-                "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7",
-                "Cache-Control": "no-cache",
-            }
-        )
-        
-        # Configure proxy if enabled
-        proxy_enabled = os.getenv("PROXY_ENABLED", "false").lower() == "true"
-        if proxy_enabled:
-            proxy_host = os.getenv("PROXY_HOST")
-            proxy_port = os.getenv("PROXY_PORT")
-            proxy_username = os.getenv("PROXY_USERNAME")
-            proxy_password = os.getenv("PROXY_PASSWORD")
-            
-            if proxy_host and proxy_port:
-                if proxy_username and proxy_password:
-                    proxy_url = f"http://{proxy_username}:{proxy_password}@{proxy_host}:{proxy_port}"
-                else:
-                    proxy_url = f"http://{proxy_host}:{proxy_port}"
-                
-                self.session.proxies = {
-                    "http": proxy_url,
-                    "https": proxy_url,
-                }
-                print(f"🌐 WebSearchEngine: Proxy enabled {proxy_host}:{proxy_port}")
+    def __init__(self, adaptive_depth: bool = ADAPTIVE_SEARCH_DEPTH):
+        # Общий пул соединений, прокси и заголовки из utils.http_transport
+        self.session = http_transport.session()
+        # Страницы загружаются, только если сниппетов выдачи не хватает
+        self.adaptive_depth = adaptive_depth
 
     def search_google(self, query: str, num_results: int = 5) -> List[Dict[str, str]]:
         """Поиск через Google (без API)"""
@@ -52,43 +46,47 @@ class WebSearchEngine:
             response = self.session.get(search_url, timeout=10)
             response.raise_for_status()
 
-            soup = BeautifulSoup(response.text, "html.parser")
-            results = []
-
-            # Ищем результаты поиска
-            search_results = soup.find_all("div", class_="g")
+            return self.parse_google_results(response.text, num_results)
 
-            for result in search_results[:num_results]:
-                try:
-                    # Заголовок и ссылка
-                    title_elem = result.find("h3")
-                    link_elem = result.find("a")
+        except Exception as e:
+            return []
 
-                    if title_elem and link_elem:
-                        title = title_elem.get_text().strip()
-                        url = link_elem.get("href", "")
+    def parse_google_results(self, html: str, num_results: int = 5) -> List[Dict[str, str]]:
+        """Разбор HTML выдачи Google"""
+        soup = make_soup(html)
+        results = []
 
-                        # Очищаем URL от Google редиректов
-                        if url.startswith("/url?q="):
-                            url = url.split("/url?q=")[1].split("&")[0]
+        # Ищем результаты поиска
+        search_results = soup.find_all("div", class_="g")
 
-                        # Описание
-                        desc_elem = result.find("span", class_="aCOpRe") or result.find(
-                            "div", class_="VwiC3b"
+        for result in search_results[:num_results]:
+            try:
+                # Заголовок и ссылка
+                title_elem = result.find("h3")
+                link_elem = result.find("a")
+
+                if title_elem and link_elem:
+                    title = title_elem.get_text().strip()
+                    url = link_elem.get("href", "")
+
+                    # Очищаем URL от Google редиректов
+                    if url.startswith("/url?q="):
+                        url = url.split("/url?q=")[1].split("&")[0]
+
+                    # Описание
+                    desc_elem = result.find("span", class_="aCOpRe") or result.find(
+                        "div", class_="VwiC3b"
+                    )
+                    description = desc_elem.get_text().strip() if desc_elem else ""
+
+                    if title and url and url.startswith("http"):
+                        results.append(
+                            {"title": title, "url": url, "description": description}
                         )
-                        description = desc_elem.get_text().strip() if desc_elem else ""
-
-                        if title and url and url.startswith("http"):
-                            results.append(
-                                {"title": title, "url": url, "description": description}
-                            )
-                except Exception as e:
-                    continue
-
-            return results
+            except Exception as e:
+                continue
 
-        except Exception as e:
-            return []
+        return results
 
     def search_duckduckgo(
         self, query: str, num_results: int = 5
@@ -100,33 +98,39 @@ class WebSearchEngine:
             response = self.session.get(search_url, timeout=10)
             response.raise_for_status()
 
-            soup = BeautifulSoup(response.text, "html.parser")
-            results = []
+            return self.parse_duckduckgo_results(response.text, num_results)
+
+        except Exception as e:
+            return []
 
-            # Ищем результаты поиска
-            search_results = soup.find_all("div", class_="result")
+    def parse_duckduckgo_results(
+        self, html: str, num_results: int = 5
+    ) -> List[Dict[str, str]]:
+        """Разбор HTML выдачи DuckDuckGo"""
+        soup = make_soup(html)
+        results = []
 
-            for result in search_results[:num_results]:
-                try:
-                    title_elem = result.find("a", class_="result__a")
-                    desc_elem = result.find("a", class_="result__snippet")
+        # Ищем результаты поиска
+        search_results = soup.find_all("div", class_="result")
 
-                    if title_elem:
-                        title = title_elem.get_text().strip()
-                        url = title_elem.get("href", "")
-                        description = desc_elem.get_text().strip() if desc_elem else ""
+        for result in search_results[:num_results]:
+            try:
+                title_elem = result.find("a", class_="result__a")
+                desc_elem = result.find("a", class_="result__snippet")
 
-                        if title and url:
-                            results.append(
-                                {"title": title, "url": url, "description": description}
-                            )
-                except Exception as e:
-                    continue
+                if title_elem:
+                    title = title_elem.get_text().strip()
+                    url = title_elem.get("href", "")
+                    description = desc_elem.get_text().strip() if desc_elem else ""
 
-            return results
+                    if title and url:
+                        results.append(
+                            {"title": title, "url": url, "description": description}
+                        )
+            except Exception as e:
+                continue
 
-        except Exception as e:
-            return []
+        return results
 
     def search_bing(self, query: str, num_results: int = 5) -> List[Dict[str, str]]:
         """Поиск через Bing"""
@@ -136,92 +140,124 @@ class WebSearchEngine:
             response = self.session.get(search_url, timeout=10)
             response.raise_for_status()
 
-            soup = BeautifulSoup(response.text, "html.parser")
-            results = []
+            return self.parse_bing_results(response.text, num_results)
 
-            # Ищем результаты поиска
-            search_results = soup.find_all("li", class_="b_algo")
-
-            for result in search_results[:num_results]:
-                try:
-                    title_elem = result.find("h2")
-                    link_elem = result.find("a")
-                    desc_elem = result.find("p")
+        except Exception as e:
+            return []
 
-                    if title_elem and link_elem:
-                        title = title_elem.get_text().strip()
-                        url = link_elem.get("href", "")
-                        description = desc_elem.get_text().strip() if desc_elem else ""
+    def parse_bing_results(self, html: str, num_results: int = 5) -> List[Dict[str, str]]:
+        """Разбор HTML выдачи Bing"""
+        soup = make_soup(html)
+        results = []
 
-                        if title and url:
-                            results.append(
-                                {"title": title, "url": url, "description": description}
-                            )
-                except Exception as e:
-                    continue
+        # Ищем результаты поиска
+        search_results = soup.find_all("li", class_="b_algo")
 
-            return results
+        for result in search_results[:num_results]:
+            try:
+                title_elem = result.find("h2")
+                link_elem = result.find("a")
+                desc_elem = result.find("p")
+
+                if title_elem and link_elem:
+                    title = title_elem.get_text().strip()
+                    url = link_elem.get("href", "")
+                    description = desc_elem.get_text().strip() if desc_elem else ""
+
+                    if title and url:
+                        results.append(
+                            {"title": title, "url": url, "description": description}
+                        )
+            except Exception as e:
+                continue
 
-        except Exception as e:
-            return []
+        return results
 
     def search_web(self, query: str, num_results: int = 5) -> List[Dict[str, str]]:
         """Универсальный поиск по веб-источникам"""
 
         # Пробуем разные поисковики
-        search_engines = [self.search_duckduckgo, self.search_bing, self.search_google]
+        search_engines = [
+            ("duckduckgo", self.search_duckduckgo),
+            ("bing", self.search_bing),
+            ("google", self.search_google),
+        ]
 
         all_results = []
 
-        for search_func in search_engines:
+        for name, search_func in search_engines:
+            # Поисковик с разомкнутым выключателем пропускается без запроса
+            if not engine_health.allow(name):
+                continue
+            started = time.monotonic()
             try:
                 results = search_func(query, num_results)
-                if results:
-                    all_results.extend(results)
-                    break  # Если получили результаты, останавливаемся
             except Exception as e:
-                continue
-
-        # Убираем дубликаты по URL
+                results = []
+            # Пустая выдача (капча, блокировка) считается ошибкой поисковика
+            engine_health.record(name, bool(results), time.monotonic() - started)
+            if results:
+                all_results.extend(results)
+                break  # Если получили результаты, останавливаемся
+
+        return self.deduplicate_results(all_results)[:num_results]
+
+    @staticmethod
+    def deduplicate_results(results: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Убирает дубликаты результатов по URL и почти одинаковым заголовку и описанию"""
         unique_results = []
         seen_urls = set()
 
-        for result in all_results:
+        for result in results:
             if result["url"] not in seen_urls:
                 unique_results.append(result)
                 seen_urls.add(result["url"])
 
-        return unique_results[:num_results]
+        # Зеркала и перепечатки: другой URL, но тот же заголовок и сниппет
+        unique_results, _ = drop_near_duplicates(
+            unique_results, lambda result: f"{result['title']} {result['description']}"
+        )
+        return unique_results
+
+    @staticmethod
+    def drop_duplicate_pages(results: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Убирает результаты, содержимое страниц которых почти совпадает с более ранними"""
+        unique_results, _ = drop_near_duplicates(results, lambda result: result["content"])
+        return unique_results
 
     def fetch_page_content(self, url: str, max_length: int = 2000) -> str:
         """Получение содержимого веб-страницы"""
         try:
 
-            response = self.session.get(url, timeout=15)
+            # Загрузка обрывается, когда видимого текста заведомо хватает
+            response = self.session.get(
+                url,
+                timeout=15,
+                max_bytes=MAX_PAGE_BYTES,
+                enough=TextBudget(max_length * EARLY_STOP_TEXT_FACTOR),
+            )
             response.raise_for_status()
 
-            soup = BeautifulSoup(response.text, "html.parser")
-
-            # Удаляем скрипты и стили
-            for script in soup(["script", "style"]):
-                script.decompose()
+            return self.extract_page_text(response.text, max_length)
 
-            # Получаем текст
-            text = soup.get_text()
-
-            # Очищаем текст
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = " ".join(chunk for chunk in chunks if chunk)
+        except Exception as e:
+            return ""
 
-            # Ограничиваем длину
-            if len(text) > max_length:
-                text = text[:max_length] + "..."
+    def extract_page_text(self, html: str, max_length: int = 2000) -> str:
+        """Извлечение очищенного текста из HTML страницы"""
+        # Большие страницы разбираются в пуле процессов
+        return cpu_pool.run(extract_page_text, html, max_length, size=len(html))
 
-            return text
+    def snippets_answer(self, query: str, search_results: List[Dict[str, str]]) -> bool:
+        """Хватает ли сниппетов выдачи, чтобы не загружать страницы"""
+        return self.adaptive_depth and snippets_suffice(
+            query, [f"{result['title']} {result['description']}" for result in search_results]
+        )
 
-        except Exception as e:
-            return ""
+    @staticmethod
+    def snippet_results(search_results: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Результаты выдачи без содержимого страниц"""
+        return [{**result, "content": ""} for result in search_results]
 
     def search_and_fetch_content(
         self, query: str, num_results: int = 3
@@ -229,26 +265,25 @@ class WebSearchEngine:
         """Поиск и получение содержимого страниц"""
         # Сначала ищем
         search_results = self.search_web(query, num_results)
+        if self.snippets_answer(query, search_results):
+            return self.snippet_results(search_results)
 
-        # Затем получаем содержимое найденных страниц
-        enriched_results = []
-
-        for result in search_results:
-            content = self.fetch_page_content(result["url"])
-
-            enriched_results.append(
-                {
-                    "title": result["title"],
-                    "url": result["url"],
-                    "description": result["description"],
-                    "content": content,
-                }
-            )
+        # Затем параллельно получаем содержимое найденных страниц
+        contents = [""] * len(search_results)
+        for index, _, content in polite_fetch_all(
+            [result["url"] for result in search_results], self.fetch_page_content
+        ):
+            contents[index] = content or ""
 
-            # Небольшая пауза между запросами
-            time.sleep(1)
-
-        return enriched_results
+        return self.drop_duplicate_pages([
+            {
+                "title": result["title"],
+                "url": result["url"],
+                "description": result["description"],
+                "content": content,
+            }
+            for result, content in zip(search_results, contents)
+        ])
 
 
 # Глобальный экземпляр поисковика